@@ -1,9 +1,20 @@
 from django.contrib import admin
-from .models import CustomUser, Publisher, Article, Newsletter
+from .models import (
+    CustomUser,
+    Publisher,
+    Article,
+    ArchivedArticle,
+    Newsletter,
+    WebhookDelivery,
+    WebhookEndpoint,
+)
 
 # Register your models here.
 
 admin.site.register(CustomUser)
 admin.site.register(Publisher)
 admin.site.register(Article)
+admin.site.register(ArchivedArticle)
 admin.site.register(Newsletter)
+admin.site.register(WebhookEndpoint)
+admin.site.register(WebhookDelivery)
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import counters
+from .metrics import PUBLISHER_REQUESTS
+from .models import Counter, Publisher, PublisherRequest
+
+
+def _affiliation_key(journalist_id):
+    return f"affiliations:{journalist_id}"
+
+
+def affiliated_publisher_ids(journalist):
+    """
+    Return the IDs of the publishers a journalist belongs to, from the
+    cache when possible. Entries are dropped whenever the journalist's
+    memberships change.
+    """
+    key = _affiliation_key(journalist.pk)
+    publisher_ids = cache.get(key)
+    if publisher_ids is None:
+        publisher_ids = list(
+            Publisher.journalists.through.objects.filter(
+                customuser_id=journalist.pk
+            ).values_list("publisher_id", flat=True)
+        )
+        cache.set(key, publisher_ids, settings.AFFILIATION_CACHE_TIMEOUT)
+    return publisher_ids
+
+
+def invalidate_affiliations(journalist_ids):
+    """
+    Drop the cached affiliations of the given journalists now and again
+    once the current transaction commits, so a concurrent request cannot
+    cache memberships that are about to change.
+    """
+    keys = [_affiliation_key(pk) for pk in journalist_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def approve_requests(request_ids):
+    """
+    Approve the given pending affiliation requests in one transaction:
+    every journalist is added to their publisher with a single batched
+    insert and the requests are marked approved with a single UPDATE.
+
+    Returns the number of requests approved.
+    """
+    Membership = Publisher.journalists.through
+    with transaction.atomic():
+        pending = list(
+            PublisherRequest.objects.select_for_update()
+            .filter(pk__in=request_ids, approved=False)
+            .values_list("pk", "journalist_id", "publisher_id")
+        )
+        if not pending:
+            return 0
+
+        Membership.objects.bulk_create(
+            [
+                Membership(publisher_id=publisher_id, customuser_id=journalist_id)
+                for _, journalist_id, publisher_id in pending
+            ],
+            ignore_conflicts=True,
+        )
+        PublisherRequest.objects.filter(pk__in=[pk for pk, _, _ in pending]).update(
+            approved=True
+        )
+        counters.bump(Counter.PENDING_PUBLISHER_REQUESTS, -len(pending))
+        invalidate_affiliations({journalist_id for _, journalist_id, _ in pending})
+
+    PUBLISHER_REQUESTS.inc(len(pending), action="approved")
+    return len(pending)
+
+
+def reject_requests(request_ids):
+    """
+    Reject (delete) the given pending affiliation requests in one
+    transaction. Returns the number of requests rejected.
+    """
+    with transaction.atomic(), counters.deferred():
+        rejected, _ = PublisherRequest.objects.filter(
+            pk__in=request_ids, approved=False
+        ).delete()
+
+    PUBLISHER_REQUESTS.inc(rejected, action="rejected")
+    return rejected
@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+
+from .models import Article, ArchivedArticle, ArticleViewCount, Newsletter
+
+# True while articles are being moved to the archive, so delete signal
+# receivers can tell archival from deletion
+_archiving = ContextVar("news_archiving", default=False)
+
+
+def archiving():
+    return _archiving.get()
+
+
+@contextmanager
+def _moving():
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def archive_cutoff(now=None):
+    """Articles created before this are archived."""
+    return (now or timezone.now()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to ``batch_size`` of the oldest approved articles created
+    before ``cutoff`` to the archive in one transaction. Articles included
+    in a newsletter stay in the hot table. Returns the number moved.
+    """
+    newsletter_articles = Newsletter.articles.through.objects.values("article_id")
+    with transaction.atomic():
+        articles = list(
+            Article.objects.select_for_update()
+            .filter(approved=True, created_at__lt=cutoff)
+            .exclude(pk__in=newsletter_articles)
+            .order_by("created_at")[:batch_size]
+        )
+        if not articles:
+            return 0
+        views = dict(
+            ArticleViewCount.objects.filter(
+                article_id__in=[article.pk for article in articles]
+            ).values_list("article_id", "views")
+        )
+        ArchivedArticle.objects.bulk_create(
+            ArchivedArticle(
+                id=article.pk,
+                title=article.title,
+                content=article.content,
+                author_id=article.author_id,
+                publisher_id=article.publisher_id,
+                created_at=article.created_at,
+                version=article.version,
+                views=views.get(article.pk, 0),
+            )
+            for article in articles
+        )
+        with _moving():
+            Article.objects.filter(pk__in=[article.pk for article in articles]).delete()
+    return len(articles)
+
+
+def archive_articles(cutoff=None, batch_size=None):
+    """
+    Archive every eligible article, one short transaction per batch so
+    readers and writers are never blocked for long. Returns the number
+    moved.
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    moved = 0
+    while True:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            return moved
+        moved += count
+
+
+def get_article_or_404(pk, queryset=None):
+    """
+    Return the article with this ID from ``queryset`` (all articles by
+    default), or from the archive once it has been archived.
+    """
+    queryset = Article.objects.all() if queryset is None else queryset
+    article = queryset.filter(pk=pk).first()
+    if article is None:
+        article = ArchivedArticle.objects.filter(pk=pk).first()
+    if article is None:
+        raise Http404("No article matches the given query.")
+    return article
@@ -0,0 +1,158 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+from .utils import shared_cache
+
+ROLE_CLAIM = "role"
+
+
+def _role_key(user_id):
+    return f"jwt-role:{user_id}"
+
+
+def current_role(user_id):
+    """
+    Return the role tokens of a user must carry to be accepted: the user's
+    role, or "" for an inactive or deleted user.
+
+    The role is cached until the user is saved or deleted, and at most
+    ``ROLE_CLAIM_CACHE_TIMEOUT`` seconds. A per-process cache is only
+    cleared in the worker that saved the user, so there the role is kept
+    for ``ROLE_CLAIM_LOCAL_CACHE_TIMEOUT`` seconds, which bounds how long
+    other workers accept a revoked token.
+    """
+    key = _role_key(user_id)
+    role = cache.get(key)
+    if role is None:
+        role = _stored_role(user_id)
+        timeout = (
+            settings.ROLE_CLAIM_CACHE_TIMEOUT
+            if shared_cache()
+            else settings.ROLE_CLAIM_LOCAL_CACHE_TIMEOUT
+        )
+        cache.set(key, role, timeout=timeout)
+    return role
+
+
+def _stored_role(user_id):
+    row = CustomUser.objects.filter(pk=user_id).values_list("role", "is_active").first()
+    return row[0] if row and row[1] else ""
+
+
+def revoke_role_claims(user_id):
+    """
+    Forget the cached role of a user, so tokens issued for a different
+    role, or for a user who has since been deactivated, stop working.
+    Runs again on commit so a concurrent request cannot cache the old row.
+    """
+    key = _role_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issues tokens that carry the user's role."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[ROLE_CLAIM] = user.role
+        return token
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses to refresh tokens whose role claim is out of date."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs["refresh"])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        role = refresh.payload.get(ROLE_CLAIM)
+        if role is not None and role != current_role(user_id):
+            raise AuthenticationFailed(
+                "Token was revoked because the user's role changed.",
+                code="token_revoked",
+            )
+        return super().validate(attrs)
+
+
+class RoleTokenUser(TokenUser):
+    """
+    A user built from the claims of a validated token.
+
+    ``id``, ``pk`` and ``role`` come from the token, which is all the role
+    permission classes need. Reading any other attribute, such as a
+    subscription manager, loads the full ``CustomUser`` once.
+    """
+
+    @cached_property
+    def id(self):
+        # The claim may hold the ID as a string
+        return CustomUser._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def role(self):
+        return self.token[ROLE_CLAIM]
+
+    @cached_property
+    def db_user(self):
+        return CustomUser.objects.get(pk=self.id)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.db_user, attr)
+
+    def __eq__(self, other):
+        if isinstance(other, CustomUser):
+            return self.pk == other.pk
+        return super().__eq__(other)
+
+    __hash__ = TokenUser.__hash__
+
+
+class RoleClaimJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the role claim instead of loading the
+    user on every request.
+
+    The only per-request check is a lookup of the user's current role,
+    usually served from the cache: a token whose role no longer matches
+    (or whose user was deactivated or deleted) is rejected. Tokens issued
+    without a role claim are handled by the standard database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                "Token contained no recognizable user identification"
+            ) from e
+
+        if validated_token[ROLE_CLAIM] != current_role(user_id):
+            raise AuthenticationFailed(
+                "Token was revoked because the user's role changed.",
+                code="token_revoked",
+            )
+        return RoleTokenUser(validated_token)
@@ -0,0 +1,22 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import counters
+from .models import Counter
+
+
+def dashboard_counters(request):
+    """
+    Expose the pending article and affiliation request counts to editor
+    templates. The counters are only read when a template uses them.
+    """
+    user = getattr(request, "user", None)
+    if not (user and user.is_authenticated and user.role == "editor"):
+        return {}
+
+    return {
+        "dashboard_counts": SimpleLazyObject(
+            lambda: counters.read(
+                Counter.PENDING_ARTICLES, Counter.PENDING_PUBLISHER_REQUESTS
+            )
+        )
+    }
@@ -0,0 +1,158 @@
+from collections import Counter as Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F
+
+from .models import (
+    ArchivedArticle,
+    Article,
+    Counter,
+    CustomUser,
+    Newsletter,
+    Publisher,
+    PublisherRequest,
+)
+
+# Subscription relations whose rows are counted as followers:
+# through model -> (subscriber column, followed column, followed model)
+FOLLOW_RELATIONS = {
+    CustomUser.subscriptions_journalists.through: (
+        "from_customuser_id",
+        "to_customuser_id",
+        CustomUser,
+    ),
+    CustomUser.subscriptions_publishers.through: (
+        "customuser_id",
+        "publisher_id",
+        Publisher,
+    ),
+}
+
+
+# Site-wide counter changes held back inside deferred(), or None
+_deferred = ContextVar("news_deferred_counters", default=None)
+
+
+@contextmanager
+def deferred():
+    """
+    Collect site-wide counter changes made inside the block and apply them
+    with one UPDATE per counter when it exits, for bulk operations that
+    would otherwise bump a counter once per row.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+
+    pending = Tally()
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    for name, delta in pending.items():
+        bump(name, delta)
+
+
+def bump(name, delta):
+    """Atomically add ``delta`` to the site-wide counter ``name``."""
+    if not delta:
+        return
+    pending = _deferred.get()
+    if pending is not None:
+        pending[name] += delta
+        return
+    if not Counter.objects.filter(name=name).update(value=F("value") + delta):
+        Counter.objects.get_or_create(name=name)
+        Counter.objects.filter(name=name).update(value=F("value") + delta)
+
+
+def read(*names):
+    """Return a dict of the current values of the given counters."""
+    values = dict.fromkeys(names, 0)
+    values.update(Counter.objects.filter(name__in=names).values_list("name", "value"))
+    return values
+
+
+def adjust(model, field, increments, **values):
+    """
+    Apply per-object increments ``{pk: delta}`` to ``field`` of ``model``,
+    with one UPDATE per distinct delta. Columns in ``values`` are set on the
+    same rows.
+    """
+    by_delta = {}
+    for pk, delta in increments.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta}, **values)
+
+
+def adjust_followers(through, rows):
+    """
+    Count newly inserted subscription ``rows`` of ``through`` towards the
+    follower counts of the followed journalists or publishers.
+    """
+    _, target_column, target_model = FOLLOW_RELATIONS[through]
+    tally = Tally(getattr(row, target_column) for row in rows)
+    adjust(target_model, "follower_count", tally)
+
+
+def _tally(queryset, column):
+    return dict(queryset.values_list(column).annotate(n=Count("pk")).order_by())
+
+
+def _repair(model, field, actual, batch_size):
+    changed = []
+    for pk, stored in model.objects.values_list("pk", field).iterator(
+        chunk_size=batch_size
+    ):
+        if stored != actual.get(pk, 0):
+            changed.append(model(pk=pk, **{field: actual.get(pk, 0)}))
+    model.objects.bulk_update(changed, [field], batch_size=batch_size)
+    return len(changed)
+
+
+def reconcile(batch_size=1000):
+    """
+    Recount every counter from the underlying tables and fix any that
+    drifted. Returns the number of corrected values per counter.
+    """
+    journalist_through = CustomUser.subscriptions_journalists.through
+    publisher_through = CustomUser.subscriptions_publishers.through
+    fixed = {
+        "article_count": _repair(
+            CustomUser,
+            "article_count",
+            Tally(_tally(Article.objects, "author_id"))
+            + Tally(_tally(ArchivedArticle.objects, "author_id")),
+            batch_size,
+        ),
+        "journalist_follower_count": _repair(
+            CustomUser,
+            "follower_count",
+            _tally(journalist_through.objects, "to_customuser_id"),
+            batch_size,
+        ),
+        "publisher_follower_count": _repair(
+            Publisher,
+            "follower_count",
+            _tally(publisher_through.objects, "publisher_id"),
+            batch_size,
+        ),
+    }
+
+    totals = {
+        Counter.PENDING_ARTICLES: Article.objects.filter(approved=False).count(),
+        Counter.PENDING_PUBLISHER_REQUESTS: PublisherRequest.objects.filter(
+            approved=False
+        ).count(),
+        Counter.NEWSLETTERS: Newsletter.objects.count(),
+    }
+    for name, value in totals.items():
+        counter, _ = Counter.objects.get_or_create(name=name)
+        fixed[name] = int(counter.value != value)
+        if counter.value != value:
+            Counter.objects.filter(pk=counter.pk).update(value=value)
+    return fixed
@@ -0,0 +1,225 @@
+import re
+import zlib
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Article, ArticleSignature, LSHBand
+
+# Signatures are SIGNATURE_SIZE MinHash values split into BANDS bands of
+# ROWS values. Two articles share a band bucket with probability s ** ROWS
+# for Jaccard similarity s, so they become candidates with probability
+# 1 - (1 - s ** ROWS) ** BANDS: about 0.5 at s = 0.7 and over 0.99 at 0.85.
+SIGNATURE_SIZE = 128
+BANDS = 16
+ROWS = SIGNATURE_SIZE // BANDS
+
+# Articles are compared as sets of overlapping word n-grams
+SHINGLE_SIZE = 4
+
+TOKEN_RE = re.compile(r"\w+")
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+LOW_29 = np.uint64((1 << 29) - 1)
+
+# Fixed seeds, so stored signatures stay comparable across processes
+_random = np.random.default_rng(20240611)
+_A = _random.integers(1, MERSENNE_PRIME, size=SIGNATURE_SIZE, dtype=np.uint64)
+_B = _random.integers(0, MERSENNE_PRIME, size=SIGNATURE_SIZE, dtype=np.uint64)
+_BAND_MIX = _random.integers(1, 1 << 63, size=ROWS, dtype=np.uint64) | np.uint64(1)
+
+
+def shingles(text):
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) <= SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {
+        " ".join(tokens[i : i + SHINGLE_SIZE])
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+
+def _mod_prime(values):
+    """Reduce uint64 values modulo the Mersenne prime 2**61 - 1."""
+    values = (values & MERSENNE_PRIME) + (values >> np.uint64(61))
+    return np.where(values >= MERSENNE_PRIME, values - MERSENNE_PRIME, values)
+
+
+def _permute(hashes):
+    """
+    Return ``(a * x + b) mod p`` for every hash function and 32-bit hash,
+    exactly. ``a`` is split into 32-bit halves so no product overflows,
+    and ``a_hi * x * 2**32`` is reduced by rotating it within 61 bits,
+    since ``2**61`` is 1 modulo ``p``.
+    """
+    x = hashes[None, :]
+    high = _mod_prime((_A >> np.uint64(32))[:, None] * x)
+    high = ((high & LOW_29) << np.uint64(32)) + (high >> np.uint64(29))
+    low = _mod_prime((_A & MAX_HASH)[:, None] * x)
+    return _mod_prime(_mod_prime(high + low) + _B[:, None])
+
+
+def signature(title, content):
+    """
+    Return the MinHash signature of an article as ``SIGNATURE_SIZE``
+    uint32 values: for each of the hash functions ``(a * x + b) mod p``,
+    the smallest hash of any of its shingles. Texts with fewer than
+    ``SHINGLE_SIZE`` shingles have no signature (None): their signatures
+    would be near-identical and collide in every band.
+    """
+    text_shingles = shingles(f"{title} {content}")
+    if len(text_shingles) < SHINGLE_SIZE:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode()) for shingle in text_shingles),
+        dtype=np.uint64,
+    )
+    return (_permute(hashes) & MAX_HASH).min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signatures):
+    """
+    Hash each band of one or more signatures to a signed 64-bit bucket.
+    Returns an array of shape ``(..., BANDS)``.
+    """
+    bands = np.asarray(signatures, dtype=np.uint64).reshape(
+        *np.shape(signatures)[:-1], BANDS, ROWS
+    )
+    with np.errstate(over="ignore"):
+        buckets = (bands * _BAND_MIX).sum(axis=-1, dtype=np.uint64)
+    return buckets.view(np.int64)
+
+
+def similarity(signature, others):
+    """Estimated Jaccard similarity of a signature to each row of ``others``."""
+    return (np.asarray(others) == signature).mean(axis=-1)
+
+
+def index_article(article):
+    """
+    Store the signature and band buckets of an article, or drop them when
+    its text is too short to have a signature.
+    """
+    article_signature = signature(article.title, article.content)
+    LSHBand.objects.filter(article=article).delete()
+    if article_signature is None:
+        ArticleSignature.objects.filter(article=article).delete()
+        return
+    ArticleSignature.objects.update_or_create(
+        article=article, defaults={"signature": article_signature.tobytes()}
+    )
+    LSHBand.objects.bulk_create(
+        LSHBand(article=article, band=band, bucket=bucket)
+        for band, bucket in enumerate(band_buckets(article_signature).tolist())
+    )
+
+
+def index_articles(batch_size=1000):
+    """
+    Compute signatures for every article that has none. Returns the count
+    indexed; articles too short to have a signature are passed over.
+    """
+    indexed, last = 0, 0
+    while True:
+        batch = list(
+            Article.objects.filter(signature__isnull=True, pk__gt=last)
+            .order_by("pk")
+            .values_list("pk", "title", "content")[:batch_size]
+        )
+        if not batch:
+            return indexed
+        last = batch[-1][0]
+        signed = [
+            (pk, row)
+            for pk, row in (
+                (pk, signature(title, content)) for pk, title, content in batch
+            )
+            if row is not None
+        ]
+        if not signed:
+            continue
+        signatures = np.stack([row for _, row in signed])
+        ArticleSignature.objects.bulk_create(
+            ArticleSignature(article_id=pk, signature=row.tobytes())
+            for pk, row in signed
+        )
+        LSHBand.objects.bulk_create(
+            LSHBand(article_id=pk, band=band, bucket=bucket)
+            for (pk, _), buckets in zip(signed, band_buckets(signatures).tolist())
+            for band, bucket in enumerate(buckets)
+        )
+        indexed += len(signed)
+
+
+def _load_signatures(article_ids):
+    return {
+        pk: np.frombuffer(bytes(value), dtype=np.uint32)
+        for pk, value in ArticleSignature.objects.filter(
+            article_id__in=article_ids
+        ).values_list("article_id", "signature")
+    }
+
+
+def find_duplicates(articles, threshold=None):
+    """
+    Return ``{article_id: [(article, similarity), ...]}`` with the likely
+    near-duplicates of each given article, most similar first.
+
+    Candidates are only the articles sharing at least one band bucket,
+    found with one indexed query for the whole batch, so the cost does not
+    grow with the size of the corpus. Their signatures are then compared
+    to drop chance collisions below ``threshold``.
+    """
+    threshold = threshold or settings.DUPLICATE_THRESHOLD
+    article_ids = [article.pk for article in articles]
+    results = {pk: [] for pk in article_ids}
+    own_buckets = {}
+    for pk, band, bucket in LSHBand.objects.filter(
+        article_id__in=article_ids
+    ).values_list("article_id", "band", "bucket"):
+        own_buckets.setdefault(pk, []).append((band, bucket))
+    if not own_buckets:
+        return results
+
+    by_band = {}
+    for buckets in own_buckets.values():
+        for band, bucket in buckets:
+            by_band.setdefault(band, set()).add(bucket)
+    members = {}
+    for pk, band, bucket in LSHBand.objects.filter(
+        reduce(or_, (Q(band=band, bucket__in=keys) for band, keys in by_band.items()))
+    ).values_list("article_id", "band", "bucket"):
+        members.setdefault((band, bucket), set()).add(pk)
+
+    candidates = {
+        pk: set().union(*(members[key] for key in buckets)) - {pk}
+        for pk, buckets in own_buckets.items()
+    }
+    signatures = _load_signatures(set(article_ids).union(*candidates.values()))
+
+    matches = {}
+    for pk, others in candidates.items():
+        others = [other for other in others if other in signatures]
+        if pk not in signatures or not others:
+            continue
+        scores = similarity(
+            signatures[pk], np.stack([signatures[other] for other in others])
+        )
+        matches[pk] = sorted(
+            (
+                (other, score)
+                for other, score in zip(others, scores.tolist())
+                if score >= threshold
+            ),
+            key=lambda match: -match[1],
+        )
+
+    found = Article.objects.in_bulk(
+        {other for pairs in matches.values() for other, _ in pairs}
+    )
+    for pk, pairs in matches.items():
+        results[pk] = [(found[other], score) for other, score in pairs]
+    return results
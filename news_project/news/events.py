@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+# Event names sent to readers
+ARTICLE = "article"
+# Sent when events may have been missed; the client should reload
+# /api/articles/subscribed/ instead of relying on the stream
+RESYNC = "resync"
+
+
+def _now_id():
+    """Event IDs are microseconds since the epoch, so they survive restarts."""
+    return time.time_ns() // 1000
+
+
+class Subscription:
+    """
+    Events waiting for one stream. The broker adds events from any thread;
+    the stream reads them in its event loop.
+    """
+
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop is closed; the stream is gone
+            pass
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Return the next event, or None after ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """
+    Publishes events to the streams open in this process.
+
+    Events are ``(id, name, data)`` tuples. The last ``EVENT_BUFFER_SIZE``
+    events are kept so reconnecting clients can catch up from the last ID
+    they saw. IDs come from the clock of this process. Events published in
+    other processes are not seen, so deployments running several processes
+    should use ``RedisBroker``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=settings.EVENT_BUFFER_SIZE)
+        self.subscriptions = set()
+        self.last_id = 0
+        # Every event after this ID is still buffered
+        self.floor = _now_id()
+
+    def next_id(self):
+        with self.lock:
+            self.last_id = max(_now_id(), self.last_id + 1)
+            return self.last_id
+
+    def publish(self, name, data):
+        self.dispatch((self.next_id(), name, data))
+
+    def dispatch(self, event):
+        """Buffer an event and pass it to every open stream."""
+        with self.lock:
+            if len(self.events) == self.events.maxlen:
+                self.floor = max(self.floor or 0, self.events[0][0])
+            self.events.append(event)
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def subscribe(self):
+        subscription = Subscription(settings.EVENT_QUEUE_SIZE)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def replay(self, last_id):
+        """
+        Return the buffered events after ``last_id``, and whether they are
+        all the events published since.
+        """
+        with self.lock:
+            events = [event for event in self.events if event[0] > last_id]
+            return events, self.floor is not None and last_id >= self.floor
+
+    def position(self):
+        """
+        The ID of the newest event seen here, for events telling a client
+        to start over: it resumes after everything it may have missed.
+        """
+        with self.lock:
+            newest = self.events[-1][0] if self.events else 0
+            return max(newest, self.floor or 0)
+
+
+# Takes the next event ID from the shared sequence and publishes the event
+# under it in one step, so IDs reach every process in increasing order. The
+# sequence starts at the clock, above IDs handed out by the clock before.
+PUBLISH_SCRIPT = """
+redis.call("SETNX", KEYS[1], ARGV[3])
+local id = redis.call("INCR", KEYS[1])
+redis.call("PUBLISH", ARGV[1], id .. " " .. ARGV[2])
+return id
+"""
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Shares events between processes through a Redis pub/sub channel at
+    ``REDIS_URL``. Event IDs come from a sequence in Redis, so every process
+    gives an event the same ID. Each process buffers and fans out what it
+    receives.
+    """
+
+    channel = "news:events"
+    sequence = "news:events:last-id"
+
+    def __init__(self):
+        super().__init__()
+        import redis
+
+        self.redis = redis.Redis.from_url(settings.REDIS_URL)
+        self.publish_script = self.redis.register_script(PUBLISH_SCRIPT)
+        self.listener = None
+        # Unknown until the listener has subscribed
+        self.floor = None
+
+    def publish(self, name, data):
+        self.publish_script(
+            keys=[self.sequence],
+            args=[
+                self.channel,
+                json.dumps([name, data], separators=(",", ":")),
+                _now_id(),
+            ],
+        )
+
+    def subscribe(self):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen, name="event-listener", daemon=True
+                )
+                self.listener.start()
+        return super().subscribe()
+
+    def listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Every event after the current ID reaches this subscription
+                last_id = self.redis.get(self.sequence)
+                with self.lock:
+                    self.floor = max(self.floor or 0, int(last_id or 0))
+                for message in pubsub.listen():
+                    event_id, payload = message["data"].split(b" ", 1)
+                    name, data = json.loads(payload)
+                    self.dispatch((int(event_id), name, data))
+            except Exception:
+                logger.exception("Event listener lost its Redis connection")
+                # Anything published in the meantime is lost
+                with self.lock:
+                    self.floor = None
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    """The broker configured by ``EVENT_BROKER``, created on first use."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+
+def publish_approval(article):
+    """Tell the readers following its author or publisher about an article."""
+    broker().publish(
+        ARTICLE,
+        {
+            "id": article.pk,
+            "title": article.title,
+            "author": article.author_id,
+            "publisher": article.publisher_id,
+            "url": reverse("article-detail", args=[article.pk]),
+        },
+    )
+
+
+def followed_ids(user_id):
+    """The journalist and publisher IDs a reader is subscribed to."""
+    journalists = CustomUser.subscriptions_journalists.through.objects.filter(
+        from_customuser_id=user_id
+    ).values_list("to_customuser_id", flat=True)
+    publishers = CustomUser.subscriptions_publishers.through.objects.filter(
+        customuser_id=user_id
+    ).values_list("publisher_id", flat=True)
+    return set(journalists), set(publishers)
+
+
+def format_event(event):
+    event_id, name, data = event
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {name}\ndata: {payload}\n\n"
+
+
+async def stream_events(last_id, follows):
+    """
+    Yield server-sent events for the articles a reader follows.
+
+    Starts with the buffered events after ``last_id`` (a ``resync`` event
+    when some were dropped), then waits for new ones, sending a comment
+    every ``EVENT_HEARTBEAT`` seconds so proxies keep the connection open.
+    ``follows`` is an async callable returning the followed journalist and
+    publisher IDs; it is called again at every heartbeat.
+    """
+    subscription = broker().subscribe()
+    try:
+        async for chunk in _stream(subscription, last_id, follows):
+            yield chunk
+    finally:
+        broker().unsubscribe(subscription)
+
+
+async def _stream(subscription, last_id, follows):
+    journalists, publishers = await follows()
+
+    def wanted(data):
+        return data["author"] in journalists or data["publisher"] in publishers
+
+    yield f"retry: {settings.EVENT_RETRY_MS}\n\n"
+    sent = set()
+    if last_id is not None:
+        events, complete = broker().replay(last_id)
+        if not complete:
+            yield format_event((broker().position(), RESYNC, {}))
+        for event in events:
+            sent.add(event[0])
+            if wanted(event[2]):
+                yield format_event(event)
+
+    while True:
+        event = await subscription.get(settings.EVENT_HEARTBEAT)
+        if subscription.overflowed:
+            # The client reads too slowly to keep up; let it reconnect
+            yield format_event((broker().position(), RESYNC, {}))
+            return
+        if event is None:
+            yield ": keep-alive\n\n"
+            journalists, publishers = await follows()
+        elif event[0] not in sent and wanted(event[2]):
+            yield format_event(event)
@@ -0,0 +1,230 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from .models import Article, Counter, CustomUser, Publisher
+from .utils import shared_cache
+
+# Feeds are cached per scope: every approved article, one publisher's or
+# one journalist's. Each scope has a change stamp, the time its articles
+# last changed, which keys the cached feeds and their ETags. Stamps are
+# kept in the Counter table, in microseconds, so every worker agrees on
+# them, and copied into a shared cache so polls don't query the database.
+ALL = "all"
+
+
+def publisher_scope(pk):
+    return f"publisher:{pk}"
+
+
+def journalist_scope(pk):
+    return f"journalist:{pk}"
+
+
+def _stamp_name(scope):
+    return f"feed_stamp:{scope}"
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def feed_stamp(scope):
+    """
+    Return the change stamp of a scope, starting one if there is none.
+    It is read from the shared cache, and from the database on a miss or
+    when the cache is per-process.
+    """
+    name = _stamp_name(scope)
+    shared = shared_cache()
+    value = cache.get(name) if shared else None
+    if value is None:
+        value = (
+            Counter.objects.filter(name=name).values_list("value", flat=True).first()
+        )
+        if value is None:
+            counter, _ = Counter.objects.get_or_create(
+                name=name, defaults={"value": _now()}
+            )
+            value = counter.value
+        if shared:
+            cache.set(name, value, settings.FEED_CACHE_TIMEOUT)
+    return value / 1e6
+
+
+def invalidate_feeds(*scopes):
+    """
+    Give the scopes new change stamps, so their cached feeds are rebuilt
+    and clients holding an old copy download the new one. The stamps
+    change in the caller's transaction, so they become visible together
+    with the changed articles; the cached copies are dropped once it
+    commits.
+    """
+    names = [_stamp_name(scope) for scope in scopes]
+    now = _now()
+    # Never move backwards, whatever the clock of this host says
+    updated = Counter.objects.filter(name__in=names).update(
+        value=Greatest(F("value") + 1, Value(now))
+    )
+    if updated < len(names):
+        Counter.objects.bulk_create(
+            [Counter(name=name, value=now) for name in names], ignore_conflicts=True
+        )
+    if shared_cache():
+        transaction.on_commit(lambda: cache.delete_many(names))
+
+
+def article_scopes(article, previous=None):
+    """The scopes whose feeds show the article, before and after a change."""
+    scopes = {ALL, journalist_scope(article.author_id)}
+    if article.publisher_id is not None:
+        scopes.add(publisher_scope(article.publisher_id))
+    if previous:
+        scopes.add(journalist_scope(previous["author_id"]))
+        if previous["publisher_id"] is not None:
+            scopes.add(publisher_scope(previous["publisher_id"]))
+    return scopes
+
+
+class ArticleFeed(Feed):
+    """The latest approved articles, as RSS."""
+
+    title = "NewsApp: latest articles"
+    link = reverse_lazy("article-list")
+    description = "The latest approved articles."
+
+    def articles(self, obj):
+        return Article.objects.filter(approved=True)
+
+    def items(self, obj):
+        return (
+            self.articles(obj)
+            .select_related("author")
+            .order_by("-created_at")[: settings.FEED_SIZE]
+        )
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return Truncator(item.content).words(settings.FEED_SUMMARY_WORDS)
+
+    def item_link(self, item):
+        return reverse("article-detail", args=[item.pk])
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+
+class PublisherArticleFeed(ArticleFeed):
+    """The latest approved articles of a publisher, as RSS."""
+
+    link = reverse_lazy("publisher-list")
+
+    def get_object(self, request, pk):
+        return get_object_or_404(Publisher, pk=pk)
+
+    def title(self, obj):
+        return f"NewsApp: {obj.name}"
+
+    def description(self, obj):
+        return f"The latest approved articles published by {obj.name}."
+
+    def articles(self, obj):
+        return Article.objects.filter(publisher=obj, approved=True)
+
+
+class JournalistArticleFeed(ArticleFeed):
+    """The latest approved articles of a journalist, as RSS."""
+
+    def get_object(self, request, pk):
+        return get_object_or_404(CustomUser, pk=pk, role="journalist")
+
+    def title(self, obj):
+        return f"NewsApp: {obj.username}"
+
+    def description(self, obj):
+        return f"The latest approved articles written by {obj.username}."
+
+    def articles(self, obj):
+        return Article.objects.filter(author=obj, approved=True)
+
+
+class AtomArticleFeed(ArticleFeed):
+    feed_type = Atom1Feed
+    subtitle = ArticleFeed.description
+
+
+class AtomPublisherArticleFeed(PublisherArticleFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class AtomJournalistArticleFeed(JournalistArticleFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def cached_feed(feed, scope=None):
+    """
+    Serve ``feed`` from the cache, with an ETag and Last-Modified header
+    derived from the change stamp of its scope (``ALL`` without ``scope``,
+    else ``scope(pk)``).
+
+    A poll that repeats a previous ETag or date gets ``304 Not Modified``
+    and any other poll of an unchanged feed is answered from the cache.
+    With a shared cache neither touches the database.
+    """
+    name = type(feed).__name__
+
+    def stamp(request, **kwargs):
+        if not hasattr(request, "_feed_stamp"):
+            key = ALL if scope is None else scope(kwargs["pk"])
+            request._feed_stamp = feed_stamp(key)
+        return request._feed_stamp
+
+    def etag(request, **kwargs):
+        token = f"{name}:{sorted(kwargs.items())}:{stamp(request, **kwargs)!r}"
+        return hashlib.md5(token.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        return datetime.fromtimestamp(stamp(request, **kwargs), tz=timezone.utc)
+
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def view(request, **kwargs):
+        key = f"feed:{request.get_host()}:{etag(request, **kwargs)}"
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = feed(request, **kwargs)
+        # Replaced with the change stamp, which covers edits and removals
+        del response["Last-Modified"]
+        cache.set(
+            key,
+            (response.content, response["Content-Type"]),
+            settings.FEED_CACHE_TIMEOUT,
+        )
+        return response
+
+    return view
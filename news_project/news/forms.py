@@ -1,6 +1,56 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import CustomUser, Article, Publisher
+from django.urls import reverse
+from .models import CustomUser, Article, Newsletter, Publisher
+from .affiliations import affiliated_publisher_ids
+from .lookups import article_label, newsletter_articles
+
+
+# Search-as-you-type multi-select
+class LookupSelectMultiple(forms.SelectMultiple):
+    """
+    Multi-select that renders only the selected options. Further choices
+    are fetched on demand from ``lookup_url`` by news/lookup.js, so the
+    page never lists the whole queryset.
+    """
+
+    class Media:
+        js = ["news/lookup.js"]
+
+    def __init__(self, lookup_url="", attrs=None):
+        super().__init__(attrs)
+        self.lookup_url = lookup_url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-lookup-url"] = self.lookup_url
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        selected = [pk for pk in value if str(pk).isdigit()]
+        all_choices = self.choices
+        self.choices = [
+            (obj.pk, field.label_from_instance(obj))
+            for obj in field.queryset.filter(pk__in=selected)
+        ]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = all_choices
+
+
+def apply_membership_delta(manager, selected):
+    """
+    Update a many-to-many relation to ``selected`` by removing and adding
+    only the members that changed.
+    """
+    current = set(manager.values_list("pk", flat=True))
+    wanted = {obj.pk for obj in selected}
+    if current - wanted:
+        manager.remove(*(current - wanted))
+    if wanted - current:
+        manager.add(*(wanted - current))
 
 
 # Custom User Registration Form
@@ -39,9 +89,11 @@ class ArticleForm(forms.ModelForm):
         if user:
             # If user is a journalist, only show publishers they're linked to
             if user.role == "journalist":
-                publishers_qs = Publisher.objects.filter(journalists=user)
-                if publishers_qs.exists():
-                    self.fields["publisher"].queryset = publishers_qs
+                publisher_ids = affiliated_publisher_ids(user)
+                if publisher_ids:
+                    self.fields["publisher"].queryset = Publisher.objects.filter(
+                        pk__in=publisher_ids
+                    )
                 else:
                     # If no publishers, hide the field
                     self.fields["publisher"].widget = forms.HiddenInput()
@@ -57,15 +109,71 @@ class PublisherForm(forms.ModelForm):
         fields = ["name", "journalists", "editors"]
         widgets = {
             "name": forms.TextInput(attrs={"class": "form-control"}),
-            "journalists": forms.CheckboxSelectMultiple(),
-            "editors": forms.CheckboxSelectMultiple(),
+            "journalists": LookupSelectMultiple(),
+            "editors": LookupSelectMultiple(),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # Limit assignments by role
-        self.fields["journalists"].queryset = CustomUser.objects.filter(
-            role="journalist"
+        # Limit assignments by role, and search each role on demand
+        lookup_url = reverse("user-lookup")
+        for name, role in (("journalists", "journalist"), ("editors", "editor")):
+            field = self.fields[name]
+            field.queryset = CustomUser.objects.filter(role=role)
+            field.widget.lookup_url = f"{lookup_url}?role={role}"
+
+    def save(self, commit=True):
+        instance = super().save(commit=False)
+        if commit:
+            instance.save()
+            self.save_memberships()
+        else:
+            self.save_m2m = self.save_memberships
+        return instance
+
+    def save_memberships(self):
+        """Apply only the membership changes instead of rewriting both sets."""
+        apply_membership_delta(
+            self.instance.journalists, self.cleaned_data["journalists"]
         )
-        self.fields["editors"].queryset = CustomUser.objects.filter(role="editor")
+        apply_membership_delta(self.instance.editors, self.cleaned_data["editors"])
+
+
+# Newsletter Create / Update Form
+class NewsletterForm(forms.ModelForm):
+    class Meta:
+        model = Newsletter
+        fields = ["title", "description", "articles"]
+        widgets = {
+            "title": forms.TextInput(attrs={"class": "form-control"}),
+            "description": forms.Textarea(attrs={"class": "form-control", "rows": 4}),
+            "articles": LookupSelectMultiple(),
+        }
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop("user")
+        super().__init__(*args, **kwargs)
+
+        # Offer only articles the user may include, searched on demand.
+        # Articles already in the newsletter may stay.
+        field = self.fields["articles"]
+        allowed = newsletter_articles(user)
+        if self.instance.pk:
+            allowed = allowed | self.instance.articles.all()
+        field.queryset = allowed.select_related("author").distinct()
+        field.label_from_instance = article_label
+        field.widget.lookup_url = reverse("article-lookup")
+
+    def save(self, commit=True):
+        instance = super().save(commit=False)
+        if commit:
+            instance.save()
+            self.save_articles()
+        else:
+            self.save_m2m = self.save_articles
+        return instance
+
+    def save_articles(self):
+        """Apply only the article changes instead of rewriting the set."""
+        apply_membership_delta(self.instance.articles, self.cleaned_data["articles"])
@@ -0,0 +1,146 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+
+logger = logging.getLogger("news.timing")
+
+# Timings collected for the request currently being handled, or None
+# when code runs outside a request (management commands, shell, etc.).
+_current = ContextVar("news_request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Accumulates durations (in milliseconds) and call counts per metric
+    for a single request.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, duration_ms):
+        self.durations[name] = self.durations.get(name, 0.0) + duration_ms
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+
+@contextmanager
+def track(name):
+    """
+    Time the enclosed block and add it to the current request's timings
+    under ``name``. Does nothing when no request is being timed.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+def _query_timer(execute, sql, params, many, context):
+    """Database execute wrapper that times every query."""
+    with track("db"):
+        return execute(sql, params, many, context)
+
+
+class TimedTemplate(Template):
+    """Template wrapper that reports render time as ``tpl``."""
+
+    def render(self, context=None, request=None):
+        with track("tpl"):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend whose templates report their render time
+    to the request timings.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class ServerTimingMiddleware:
+    """
+    Records SQL time and query count, template render time and time spent
+    in external calls for each request.
+
+    The totals are sent back in a ``Server-Timing`` header and a sample of
+    requests is logged as a JSON line on the ``news.timing`` logger.
+    """
+
+    # Order in which metrics appear in the header
+    METRICS = ("db", "tpl", "mail", "tweet")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.emit_header = getattr(settings, "SERVER_TIMING_HEADER", True)
+        self.sample_rate = getattr(settings, "SERVER_TIMING_LOG_SAMPLE_RATE", 0.01)
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(_query_timer):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unresolved"
+        HTTP_REQUESTS.inc(view=view_name, status=f"{response.status_code // 100}xx")
+        HTTP_REQUEST_SECONDS.observe(total / 1000, view=view_name)
+
+        if self.emit_header:
+            response["Server-Timing"] = self.header_value(timings, total)
+
+        if self.sample_rate and random.random() < self.sample_rate:
+            self.log(request, response, timings, total)
+
+        return response
+
+    def header_value(self, timings, total):
+        parts = []
+        for name in self.METRICS:
+            if name not in timings.durations:
+                continue
+            part = f"{name};dur={timings.durations[name]:.1f}"
+            if name == "db":
+                part += f';desc="{timings.counts[name]} queries"'
+            parts.append(part)
+        parts.append(f"total;dur={total:.1f}")
+        return ", ".join(parts)
+
+    def log(self, request, response, timings, total):
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "view": match.view_name if match else None,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total, 1),
+            "queries": timings.counts.get("db", 0),
+        }
+        for name in self.METRICS:
+            record[f"{name}_ms"] = round(timings.durations.get(name, 0.0), 1)
+        logger.info(json.dumps(record))
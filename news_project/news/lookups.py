@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .affiliations import affiliated_publisher_ids
+from .models import Article, CustomUser
+
+
+def lookup_page(queryset, page, label=str):
+    """
+    Return one page of ``queryset`` as ``{"results": [...], "has_more": ...}``
+    for the search-as-you-type pickers. Fetches one extra row to tell
+    whether another page follows, instead of counting.
+    """
+    size = settings.LOOKUP_PAGE_SIZE
+    start = (max(page, 1) - 1) * size
+    rows = list(queryset[start : start + size + 1])
+    return {
+        "results": [{"id": obj.pk, "text": label(obj)} for obj in rows[:size]],
+        "has_more": len(rows) > size,
+    }
+
+
+def search_users(role, query, page=1):
+    """
+    Find users of ``role`` whose username starts with ``query``.
+
+    Matches come in username order, which puts an exact match first and
+    shorter, closer matches before longer ones. The prefix match and the
+    ordering are both served by the (role, username) index.
+    """
+    query = query.strip()
+    if not query:
+        return {"results": [], "has_more": False}
+    users = (
+        CustomUser.objects.filter(role=role, username__istartswith=query)
+        .order_by("username")
+        .only("pk", "username")
+    )
+    return lookup_page(users, page, label=lambda user: user.username)
+
+
+def newsletter_articles(user):
+    """
+    Articles ``user`` may put in a newsletter: any approved article for
+    editors; for journalists, approved articles they wrote or that were
+    published by one of their publishers.
+    """
+    articles = Article.objects.filter(approved=True)
+    if user.role == "editor":
+        return articles
+    return articles.filter(
+        Q(author=user) | Q(publisher_id__in=affiliated_publisher_ids(user))
+    )
+
+
+def article_label(article):
+    return (
+        f"{article.title} ({article.author.username}, {article.created_at:%b %d, %Y})"
+    )
+
+
+def search_articles(user, query, page=1):
+    """
+    Find articles ``user`` may include in a newsletter whose title starts
+    with ``query``, in title order. The prefix match and the ordering are
+    both served by the (approved, title) index, as in ``search_users``.
+    """
+    query = query.strip()
+    if not query:
+        return {"results": [], "has_more": False}
+    articles = (
+        newsletter_articles(user)
+        .filter(title__istartswith=query)
+        .select_related("author")
+        .only("pk", "title", "created_at", "author__username")
+        .order_by("title", "pk")
+    )
+    return lookup_page(articles, page, label=article_label)
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from news.archive import archive_articles
+
+
+class Command(BaseCommand):
+    help = (
+        "Move approved articles older than ARCHIVE_AFTER_DAYS to the archive "
+        "table, in small batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive articles created more than this many days ago.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+        moved = archive_articles(cutoff=cutoff, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{moved} articles archived."))
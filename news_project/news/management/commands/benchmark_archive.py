@@ -0,0 +1,130 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from news.archive import archive_articles, archive_cutoff
+from news.models import ArchivedArticle, Article, CustomUser
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def _explicit_created_at():
+    """Let bulk_create keep the given creation times."""
+    field = Article._meta.get_field("created_at")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure article list latency before and after archival on a "
+        "synthetic backlog. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=100_000)
+        parser.add_argument(
+            "--years", type=float, default=6, help="Age of the oldest article."
+        )
+        parser.add_argument("--journalists", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back the synthetic articles.")
+
+    def run(self, options):
+        rng = random.Random(options["seed"])
+        now = timezone.now()
+        journalists = CustomUser.objects.bulk_create(
+            CustomUser(username=f"bench-journalist-{i}", role="journalist")
+            for i in range(options["journalists"])
+        )
+        journalist_ids = list(
+            CustomUser.objects.filter(
+                username__startswith="bench-journalist-"
+            ).values_list("pk", flat=True)
+        )
+        span = timedelta(days=365 * options["years"]).total_seconds()
+        start = time.perf_counter()
+        with _explicit_created_at():
+            Article.objects.bulk_create(
+                (
+                    Article(
+                        title=f"Synthetic article {i}",
+                        content="Lorem ipsum dolor sit amet. " * 40,
+                        author_id=rng.choice(journalist_ids),
+                        approved=True,
+                        created_at=now - timedelta(seconds=rng.uniform(0, span)),
+                    )
+                    for i in range(options["articles"])
+                ),
+                batch_size=5000,
+            )
+        self.stdout.write(
+            f"Inserted {options['articles']} articles over {options['years']:g} "
+            f"years for {len(journalists)} journalists "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        author = journalist_ids[0]
+
+        queries = {
+            # The reader list, all approved articles newest first
+            "Article list": lambda: list(
+                Article.objects.filter(approved=True).order_by("-created_at")
+            ),
+            # A journalist's own list
+            "Journalist list": lambda: list(
+                Article.objects.filter(author_id=author).order_by("-created_at")
+            ),
+            "Latest 20": lambda: list(
+                Article.objects.filter(approved=True).order_by("-created_at")[:20]
+            ),
+            "Approved count": lambda: Article.objects.filter(approved=True).count(),
+        }
+
+        before = self.measure(queries, options["repeat"])
+        start = time.perf_counter()
+        moved = archive_articles(cutoff=archive_cutoff(now))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Archived {moved} articles in {elapsed:.1f}s "
+            f"({moved / elapsed:.0f} per second); "
+            f"{Article.objects.count()} left in the hot table, "
+            f"{ArchivedArticle.objects.count()} in the archive"
+        )
+        after = self.measure(queries, options["repeat"])
+
+        for name in queries:
+            self.stdout.write(
+                f"{name}: {before[name]:.2f} ms before, {after[name]:.2f} ms after "
+                f"({before[name] / max(after[name], 1e-6):.1f}x)"
+            )
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, query in queries.items():
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                times.append(time.perf_counter() - start)
+            results[name] = statistics.median(times) * 1000
+        return results
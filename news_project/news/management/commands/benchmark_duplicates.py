@@ -0,0 +1,168 @@
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news.duplicates import SIGNATURE_SIZE, band_buckets, find_duplicates, signature
+from news.models import Article, ArticleSignature, CustomUser, LSHBand
+
+
+class Rollback(Exception):
+    pass
+
+
+def _text(rng, vocabulary, words):
+    return " ".join(rng.choices(vocabulary, k=words))
+
+
+def _edit(rng, text, vocabulary, share):
+    """Replace a share of the words, as a rewrite of wire copy would."""
+    words = text.split()
+    for index in rng.sample(range(len(words)), int(len(words) * share)):
+        words[index] = rng.choice(vocabulary)
+    return " ".join(words)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure near-duplicate detection latency of find_duplicates against "
+        "a synthetic corpus seeded into the signature and LSH band tables. "
+        "Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--words", type=int, default=400)
+        parser.add_argument(
+            "--edit-share",
+            type=float,
+            default=0.01,
+            help="Share of words changed in each planted duplicate.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back the synthetic articles.")
+
+    def run(self, options):
+        size = options["articles"]
+        rng = random.Random(options["seed"])
+        vocabulary = [f"word{i}" for i in range(20_000)]
+
+        # Half of the queries are rewrites of an article in the corpus
+        queries, planted = [], {}
+        for number in range(options["queries"]):
+            text = _text(rng, vocabulary, options["words"])
+            original = None
+            if number % 2 == 0:
+                original = rng.randrange(size)
+                planted[original] = signature("", text)
+            queries.append(
+                (_edit(rng, text, vocabulary, options["edit_share"]), original)
+            )
+
+        # Corpus signatures are random, which is what MinHash values of
+        # unrelated texts look like, except for the planted originals
+        author = CustomUser.objects.create(
+            username="bench-duplicates", role="journalist"
+        )
+        numbers = np.random.default_rng(options["seed"])
+        corpus_ids = []
+        start = time.perf_counter()
+        for offset in range(0, size, options["batch_size"]):
+            rows = min(options["batch_size"], size - offset)
+            signatures = numbers.integers(
+                0, 1 << 32, size=(rows, SIGNATURE_SIZE), dtype=np.uint32
+            )
+            for number, planted_signature in planted.items():
+                if offset <= number < offset + rows:
+                    signatures[number - offset] = planted_signature
+            corpus_ids += self.insert(author, signatures, [""] * rows)
+        self.stdout.write(
+            f"Seeded {size} articles and their LSH bands "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+        query_ids = self.insert(
+            author,
+            np.stack([signature("", text) for text, _ in queries]),
+            [text for text, _ in queries],
+        )
+        articles = Article.objects.in_bulk(query_ids)
+
+        latencies = []
+        found = expected = false_positives = 0
+        for pk, (_, original) in zip(query_ids, queries):
+            start = time.perf_counter()
+            matches = find_duplicates([articles[pk]])[pk]
+            latencies.append(time.perf_counter() - start)
+
+            matched = {article.pk for article, _ in matches}
+            original_id = corpus_ids[original] if original is not None else None
+            expected += original is not None
+            found += original_id in matched
+            false_positives += len(matched - {original_id})
+
+        # Reading every stored signature, as a scan without the bands must,
+        # timed on one batch and scaled up
+        sample = corpus_ids[: options["batch_size"]]
+        start = time.perf_counter()
+        list(
+            ArticleSignature.objects.filter(article_id__in=sample).values_list(
+                "signature", flat=True
+            )
+        )
+        scan = (time.perf_counter() - start) * size / len(sample)
+
+        p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist()
+        self.stdout.write(
+            f"Queries: {len(queries)} against {size} articles "
+            f"(threshold {settings.DUPLICATE_THRESHOLD})"
+        )
+        self.stdout.write(
+            f"Latency per query: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms"
+        )
+        self.stdout.write(
+            f"Duplicates found: {found}/{expected}, "
+            f"false positives: {false_positives}"
+        )
+        self.stdout.write(f"Reading all signatures: ~{scan * 1000:.0f} ms")
+
+    def insert(self, author, signatures, contents):
+        """
+        Insert articles with the given signatures and their band buckets,
+        returning their IDs in order.
+        """
+        Article.objects.bulk_create(
+            Article(title="Synthetic article", content=content, author=author)
+            for content in contents
+        )
+        # Not every backend returns primary keys from bulk_create
+        ids = list(
+            Article.objects.filter(author=author)
+            .order_by("-pk")
+            .values_list("pk", flat=True)[: len(contents)]
+        )[::-1]
+        ArticleSignature.objects.bulk_create(
+            ArticleSignature(article_id=pk, signature=row.tobytes())
+            for pk, row in zip(ids, signatures)
+        )
+        LSHBand.objects.bulk_create(
+            (
+                LSHBand(article_id=pk, band=band, bucket=bucket)
+                for pk, buckets in zip(ids, band_buckets(signatures).tolist())
+                for band, bucket in enumerate(buckets)
+            ),
+            batch_size=10_000,
+        )
+        return ids
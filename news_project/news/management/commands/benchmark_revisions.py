@@ -0,0 +1,106 @@
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from news.revisions import encode_revision, make_snapshot, rebuild
+
+
+def _sentence(rng, vocabulary):
+    words = rng.choices(vocabulary, k=rng.randint(6, 25))
+    return " ".join(words).capitalize() + "."
+
+
+def _article(rng, vocabulary, words):
+    paragraphs, count = [], 0
+    while count < words:
+        paragraph = [_sentence(rng, vocabulary) for _ in range(rng.randint(3, 6))]
+        count += sum(len(sentence.split()) for sentence in paragraph)
+        paragraphs.append(" ".join(paragraph))
+    return "\n\n".join(paragraphs)
+
+
+def _edit(rng, text, vocabulary):
+    """Rewrite, add or remove a sentence or two, as an editing pass would."""
+    sentences = text.split(". ")
+    index = rng.randrange(len(sentences))
+    action = rng.random()
+    if action < 0.6:
+        sentences[index] = _sentence(rng, vocabulary).rstrip(".")
+    elif action < 0.85:
+        sentences.insert(index, _sentence(rng, vocabulary).rstrip("."))
+    elif len(sentences) > 1:
+        del sentences[index]
+    return ". ".join(sentences)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the storage and rebuild cost of article revisions for "
+        "synthetic articles with hundreds of edits, without touching the "
+        "database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=10)
+        parser.add_argument("--edits", type=int, default=500)
+        parser.add_argument("--words", type=int, default=1500)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        vocabulary = [f"word{i}" for i in range(5_000)]
+
+        stored = full = compressed = snapshots = 0
+        write_times, rebuild_times, chain_lengths = [], [], []
+        for _ in range(options["articles"]):
+            text = _article(rng, vocabulary, options["words"])
+            versions, revisions, chain = [], [], []
+            for _ in range(options["edits"] + 1):
+                # Same steps as record_revision: rebuild the latest, encode
+                start = time.perf_counter()
+                previous = rebuild(chain) if chain else None
+                snapshot, data = encode_revision(previous, text, len(chain))
+                write_times.append(time.perf_counter() - start)
+
+                chain = [(snapshot, data)] if snapshot else chain + [(snapshot, data)]
+                revisions.append(list(chain))
+                versions.append(text)
+                stored += len(data)
+                full += len(text.encode())
+                compressed += len(make_snapshot(text))
+                snapshots += snapshot
+                text = _edit(rng, text, vocabulary)
+
+            for expected, revision_chain in zip(versions, revisions):
+                start = time.perf_counter()
+                rebuilt = rebuild(revision_chain)
+                rebuild_times.append(time.perf_counter() - start)
+                chain_lengths.append(len(revision_chain))
+                if rebuilt != expected:
+                    raise AssertionError("A revision did not rebuild to its text")
+
+        count = len(write_times)
+        self.stdout.write(
+            f"Revisions: {count} of {options['articles']} articles, "
+            f"{snapshots} full copies "
+            f"(every {settings.REVISION_SNAPSHOT_INTERVAL})"
+        )
+        self.stdout.write(
+            f"Stored: {stored / 1024:.0f} KiB, against {full / 1024:.0f} KiB "
+            f"as plain copies ({full / stored:.1f}x) and "
+            f"{compressed / 1024:.0f} KiB as compressed copies "
+            f"({compressed / stored:.1f}x)"
+        )
+        for label, times in (("Save", write_times), ("Rebuild", rebuild_times)):
+            p50, p99, worst = (np.percentile(times, [50, 99, 100]) * 1000).tolist()
+            self.stdout.write(
+                f"{label} per revision: p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+                f"max {worst:.2f} ms"
+            )
+        self.stdout.write(
+            f"Deltas applied per rebuild: mean {np.mean(chain_lengths) - 1:.1f}"
+        )
+        self.stdout.write(self.style.SUCCESS("All revisions rebuilt exactly."))
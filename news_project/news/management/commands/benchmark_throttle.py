@@ -0,0 +1,39 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from news.throttling import RoleRateThrottle
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request overhead of the API rate limiter against "
+        "the configured cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100_000)
+        parser.add_argument("--clients", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count, clients = options["requests"], options["clients"]
+        view = SimpleNamespace(throttle_scope="articles")
+        requests = []
+        for pk in range(clients):
+            request = RequestFactory().get("/api/articles/")
+            request.user = SimpleNamespace(pk=pk, role="reader", is_authenticated=True)
+            requests.append(request)
+
+        throttle = RoleRateThrottle()
+        allowed = 0
+        start = time.perf_counter()
+        for number in range(count):
+            allowed += throttle.allow_request(requests[number % clients], view)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{count} requests from {clients} clients: "
+            f"{elapsed / count * 1e6:.1f} µs per request, {allowed} allowed"
+        )
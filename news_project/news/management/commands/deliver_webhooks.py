@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from news.models import WebhookDelivery
+from news.webhooks import dispatcher, due_deliveries
+
+
+class Command(BaseCommand):
+    help = (
+        "Send webhook deliveries that are due for a retry or were interrupted, "
+        "and wait for the attempts to finish."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--requeue-dead",
+            action="store_true",
+            help="Give dead-lettered deliveries another round of attempts.",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_dead"]:
+            requeued = WebhookDelivery.objects.filter(
+                status=WebhookDelivery.DEAD
+            ).update(status=WebhookDelivery.PENDING, attempts=0)
+            self.stdout.write(f"{requeued} dead deliveries requeued")
+
+        sent = 0
+        while True:
+            batch = due_deliveries(limit=options["batch_size"])
+            if not batch:
+                break
+            dispatcher.submit(batch)
+            dispatcher.join()
+            sent += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"{sent} webhook attempts made."))
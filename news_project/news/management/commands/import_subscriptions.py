@@ -0,0 +1,116 @@
+import csv
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.models import CustomUser, Publisher
+from news.subscriptions import (
+    JOURNALISTS,
+    PUBLISHERS,
+    replace_subscriptions,
+    subscribe,
+)
+
+
+def _split(value):
+    return [item.strip() for item in (value or "").split(";") if item.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Subscribe readers to journalists and publishers from a CSV file, "
+        "applying each batch with one insert (and, with --replace, one "
+        "DELETE) per relation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help=(
+                "CSV file with columns username,journalists,publishers: a "
+                "reader's username, journalist usernames and publisher IDs "
+                "(lists separated by ';')."
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help=(
+                "Make the listed journalists and publishers each reader's "
+                "complete subscriptions, removing any others."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        summary = {"added": 0, "removed": 0, "skipped": 0}
+        try:
+            with open(options["path"], newline="") as handle:
+                rows = csv.DictReader(handle)
+                while batch := list(islice(rows, options["batch_size"])):
+                    self.import_batch(batch, options["replace"], summary)
+        except (OSError, KeyError, ValueError) as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Added {summary['added']} subscriptions, removed "
+                f"{summary['removed']}, skipped {summary['skipped']} unknown "
+                "readers, journalists or publishers."
+            )
+        )
+
+    def import_batch(self, batch, replace, summary):
+        # Every name and ID of the batch is resolved with one query per kind
+        readers = dict(
+            CustomUser.objects.filter(
+                username__in=[row["username"] for row in batch], role="reader"
+            ).values_list("username", "pk")
+        )
+        journalists = dict(
+            CustomUser.objects.filter(
+                username__in={
+                    name for row in batch for name in _split(row.get("journalists"))
+                },
+                role="journalist",
+            ).values_list("username", "pk")
+        )
+        publishers = set(
+            Publisher.objects.filter(
+                pk__in={
+                    int(pk) for row in batch for pk in _split(row.get("publishers"))
+                }
+            ).values_list("pk", flat=True)
+        )
+
+        wanted = {JOURNALISTS: {}, PUBLISHERS: {}}
+        for row in batch:
+            names = _split(row.get("journalists"))
+            ids = [int(pk) for pk in _split(row.get("publishers"))]
+            reader_id = readers.get(row["username"])
+            if reader_id is None:
+                summary["skipped"] += 1
+                continue
+            summary["skipped"] += sum(name not in journalists for name in names)
+            summary["skipped"] += sum(pk not in publishers for pk in ids)
+            wanted[JOURNALISTS].setdefault(reader_id, set()).update(
+                journalists[name] for name in names if name in journalists
+            )
+            wanted[PUBLISHERS].setdefault(reader_id, set()).update(
+                pk for pk in ids if pk in publishers
+            )
+
+        for kind, targets in wanted.items():
+            if replace:
+                added, removed = replace_subscriptions(kind, targets)
+                summary["removed"] += removed
+            else:
+                added = subscribe(
+                    kind,
+                    {
+                        (reader, target)
+                        for reader, ids in targets.items()
+                        for target in ids
+                    },
+                )
+            summary["added"] += added
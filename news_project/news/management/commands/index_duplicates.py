@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from news.duplicates import index_articles
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the MinHash signatures and LSH buckets of articles saved "
+        "before near-duplicate detection was enabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = index_articles(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} articles."))
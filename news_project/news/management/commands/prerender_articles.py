@@ -0,0 +1,62 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from news.models import ArchivedArticle, Article
+from news.prerender import prerender_directory, remove_article, write_article
+from news.utils import process_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the pre-rendered static pages of all approved articles in "
+        "parallel and remove pages of articles that are no longer approved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes used to render pages (default: all cores).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        articles = Article.objects.filter(approved=True).select_related("author")
+        # Archived articles keep the page written while they were approved
+        approved_ids = set(articles.values_list("pk", flat=True))
+        approved_ids.update(ArchivedArticle.objects.values_list("pk", flat=True))
+
+        # Drop pages left behind by deleted or unapproved articles
+        directory = prerender_directory()
+        stale = set()
+        if directory.is_dir():
+            for name in os.listdir(directory):
+                stem = name.split(".", 1)[0]
+                if stem.isdigit() and int(stem) not in approved_ids:
+                    stale.add(int(stem))
+        for pk in stale:
+            remove_article(pk)
+
+        workers = options["workers"] or os.cpu_count() or 1
+        chunk_size = options["chunk_size"]
+        rendered = 0
+        if workers > 1:
+            with process_pool(workers) as pool:
+                for _ in pool.map(
+                    write_article,
+                    articles.iterator(chunk_size=chunk_size),
+                    chunksize=chunk_size,
+                ):
+                    rendered += 1
+        else:
+            for article in articles.iterator(chunk_size=chunk_size):
+                write_article(article)
+                rendered += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {rendered} articles, removed {len(stale)} stale pages."
+            )
+        )
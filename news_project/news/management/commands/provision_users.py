@@ -0,0 +1,70 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.provisioning import provision_users
+
+
+def _split(value):
+    return [item.strip() for item in (value or "").split(";") if item.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from a CSV or JSON Lines file, assigning role "
+        "groups and seeding subscriptions in batched inserts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help=(
+                "CSV file with columns username,email,role,password,journalists,"
+                "publishers (lists separated by ';'), or a .jsonl file with one "
+                "object per line using the same keys."
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes used to hash passwords (default: all cores).",
+        )
+
+    def read_rows(self, handle, path):
+        if path.endswith(".jsonl"):
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        for row in csv.DictReader(handle):
+            yield {
+                "username": row["username"],
+                "email": row.get("email", ""),
+                "role": row["role"],
+                "password": row["password"],
+                "journalists": _split(row.get("journalists")),
+                "publishers": [int(pk) for pk in _split(row.get("publishers"))],
+            }
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            with open(path, newline="") as handle:
+                summary = provision_users(
+                    self.read_rows(handle, path),
+                    batch_size=options["batch_size"],
+                    workers=options["workers"],
+                )
+        except (OSError, KeyError, ValueError) as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {summary['created']} users, "
+                f"skipped {summary['skipped']} existing or repeated usernames."
+            )
+        )
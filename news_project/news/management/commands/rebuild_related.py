@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from news.models import Article
+from news.prerender import write_article
+from news.related import rebuild, refresh_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the TF-IDF index and the related articles of every "
+        "approved article, or with --pending only of the articles approved "
+        "or edited since the last run, and re-render the pages whose "
+        "related articles changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help=(
+                "Refresh only the queued articles (a full rebuild when there "
+                "is no index yet)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["pending"]:
+            changed = refresh_pending(limit=options["batch_size"])
+        else:
+            changed = rebuild(batch_size=options["batch_size"])
+
+        # Pages show the related articles, so re-render the changed ones
+        for article in Article.objects.filter(pk__in=changed, approved=True).iterator():
+            write_article(article)
+        self.stdout.write(
+            self.style.SUCCESS(f"Related articles changed for {len(changed)} articles.")
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from news.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount article, follower and pending counters from the underlying "
+        "tables and repair any that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile(batch_size=options["batch_size"])
+        for name, count in fixed.items():
+            self.stdout.write(f"{name}: {count} corrected")
+        self.stdout.write(self.style.SUCCESS("Counters reconciled."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from news.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold article reads since the last run into the time-decayed trending "
+        "scores. Run it periodically, e.g. every few minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        summary = update_trending(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Trending updated: {summary['added']} added, "
+                f"{summary['updated']} updated."
+            )
+        )
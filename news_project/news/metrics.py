@@ -0,0 +1,367 @@
+import atexit
+import hmac
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Buckets for counts of recipients / items
+SIZE_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+# Worker files (and their temporary files) in METRICS_DIR, by PID
+WORKER_FILE = re.compile(r"^metrics-(\d+)[.-]")
+
+logger = logging.getLogger(__name__)
+
+
+def _label_key(labels):
+    """Return a hashable, ordered representation of a label dict."""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """
+    A monotonically increasing value, optionally split by labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, registry, name, documentation):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+
+    def inc(self, amount=1, **labels):
+        self.registry.add_counter(self.name, _label_key(labels), amount)
+
+
+class Histogram:
+    """
+    Counts observations into cumulative buckets, keeping their sum.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        self.registry.add_observation(self, _label_key(labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the enclosed block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    """
+    In-process store of counters and histograms.
+
+    When ``METRICS_DIR`` is set, every worker process periodically writes its
+    samples to its own file in that directory, and the exposition merges the
+    files of all workers so a scrape of any worker sees the whole deployment.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.metrics = {}
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.pid = os.getpid()
+        atexit.register(self.flush)
+
+    def counter(self, name, documentation):
+        metric = Counter(self, name, documentation)
+        self.metrics[name] = metric
+        return metric
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, name, documentation, buckets)
+        self.metrics[name] = metric
+        return metric
+
+    def add_counter(self, name, label_key, amount):
+        with self.lock:
+            self._check_fork()
+            key = (name, label_key)
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    def add_observation(self, histogram, label_key, value):
+        with self.lock:
+            self._check_fork()
+            key = (histogram.name, label_key)
+            sample = self.histograms.get(key)
+            if sample is None:
+                sample = self.histograms[key] = {
+                    "buckets": [0] * len(histogram.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for index, bound in enumerate(histogram.buckets):
+                if value <= bound:
+                    sample["buckets"][index] += 1
+            sample["sum"] += value
+            sample["count"] += 1
+        self._maybe_flush()
+
+    def _check_fork(self):
+        """Start from empty samples in a freshly forked worker."""
+        if os.getpid() != self.pid:
+            self.pid = os.getpid()
+            self.counters = {}
+            self.histograms = {}
+
+    # Multi-process support
+
+    def _directory(self):
+        return getattr(settings, "METRICS_DIR", None)
+
+    def _maybe_flush(self):
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+        if not self._directory() or time.monotonic() - self.last_flush < interval:
+            return
+        # Another thread already writing the file covers this interval
+        if self.flush_lock.acquire(blocking=False):
+            try:
+                self._write()
+            finally:
+                self.flush_lock.release()
+
+    def _snapshot(self):
+        with self.lock:
+            return {
+                "counters": [
+                    [name, list(map(list, labels)), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    [
+                        name,
+                        list(map(list, labels)),
+                        dict(sample, buckets=list(sample["buckets"])),
+                    ]
+                    for (name, labels), sample in self.histograms.items()
+                ],
+            }
+
+    def flush(self):
+        """Write this process's samples to its file in ``METRICS_DIR``."""
+        if not self._directory():
+            return
+        with self.flush_lock:
+            self._write()
+
+    def _write(self):
+        """
+        Replace this process's file with a fresh snapshot. Called with
+        ``flush_lock`` held; a failed write is logged and retried at the next
+        interval rather than raised into the request that triggered it.
+        """
+        directory = self._directory()
+        self.last_flush = time.monotonic()
+        pid = os.getpid()
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f"metrics-{pid}-", suffix=".tmp", dir=directory
+            )
+            with os.fdopen(fd, "w") as handle:
+                json.dump(self._snapshot(), handle)
+            os.replace(tmp_path, os.path.join(directory, f"metrics-{pid}.json"))
+        except OSError:
+            logger.warning("Could not write metrics to %s", directory, exc_info=True)
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def collect(self):
+        """
+        Return merged ``(counters, histograms)`` for this process and, in
+        multi-process mode, every other worker that has written a file.
+        """
+        snapshots = [self._snapshot()]
+        directory = self._directory()
+        if directory and os.path.isdir(directory):
+            own_pid = os.getpid()
+            for filename in os.listdir(directory):
+                match = WORKER_FILE.match(filename)
+                if match and int(match.group(1)) == own_pid:
+                    continue
+                if match and not _pid_alive(int(match.group(1))):
+                    # Left behind by a worker that has exited
+                    try:
+                        os.remove(os.path.join(directory, filename))
+                    except OSError:
+                        pass
+                    continue
+                if not filename.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(directory, filename)) as handle:
+                        snapshots.append(json.load(handle))
+                except (OSError, ValueError):
+                    continue
+
+        counters = {}
+        histograms = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, sample in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = dict(sample, buckets=list(sample["buckets"]))
+                    continue
+                merged["buckets"] = [
+                    a + b for a, b in zip(merged["buckets"], sample["buckets"])
+                ]
+                merged["sum"] += sample["sum"]
+                merged["count"] += sample["count"]
+        return counters, histograms
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == "counter":
+                for (sample_name, labels), value in sorted(counters.items()):
+                    if sample_name == name:
+                        lines.append(
+                            f"{name}{_format_labels(labels)} {_format_number(value)}"
+                        )
+                continue
+
+            for (sample_name, labels), sample in sorted(histograms.items()):
+                if sample_name != name:
+                    continue
+                for bound, count in zip(metric.buckets, sample["buckets"]):
+                    le = (("le", _format_number(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {count}")
+                inf = (("le", "+Inf"),)
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, inf)} {sample['count']}"
+                )
+                lines.append(
+                    f"{name}_sum{_format_labels(labels)} {_format_number(sample['sum'])}"
+                )
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# Publishing pipeline metrics
+
+ARTICLES_SUBMITTED = registry.counter(
+    "news_articles_submitted_total", "Articles submitted for review, by channel."
+)
+ARTICLES_APPROVED = registry.counter(
+    "news_articles_approved_total", "Articles approved by editors, by channel."
+)
+NOTIFICATION_RECIPIENTS = registry.histogram(
+    "news_notification_recipients",
+    "Number of subscribers notified per approved article.",
+    buckets=SIZE_BUCKETS,
+)
+EMAIL_SECONDS = registry.histogram(
+    "news_email_send_seconds", "Time spent sending notification email."
+)
+EMAIL_FAILURES = registry.counter(
+    "news_email_failures_total", "Notification emails that raised an error."
+)
+TWEETS = registry.counter(
+    "news_tweets_total", "Attempts to post approved articles to X, by result."
+)
+SUBSCRIPTION_CHANGES = registry.counter(
+    "news_subscription_changes_total",
+    "Subscribe and unsubscribe actions, by target type.",
+)
+PUBLISHER_REQUESTS = registry.counter(
+    "news_publisher_requests_total", "Publisher affiliation requests, by action."
+)
+ARTICLE_ROW_CACHE = registry.counter(
+    "news_article_row_cache_total",
+    "Article list rows served from the fragment cache, by result.",
+)
+HTTP_REQUESTS = registry.counter(
+    "news_http_requests_total", "HTTP requests handled, by view and status class."
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "news_http_request_seconds", "Time spent handling HTTP requests, by view."
+)
+
+
+def metrics_view(request):
+    """
+    Expose all metrics in the Prometheus text format at ``/metrics``, to
+    requests bearing ``METRICS_TOKEN`` and to staff users.
+    """
+    token = settings.METRICS_TOKEN
+    sent = request.headers.get("Authorization", "")
+    authorized = bool(token) and hmac.compare_digest(
+        sent.encode(), f"Bearer {token}".encode()
+    )
+    if not (authorized or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
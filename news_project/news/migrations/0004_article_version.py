@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0003_publisherrequest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("news", "0005_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                fields=["role", "username"], name="user_role_username_idx"
+            ),
+        ),
+    ]
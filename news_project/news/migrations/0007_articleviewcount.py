@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0006_user_role_username_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArticleViewCount",
+            fields=[
+                (
+                    "article",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="view_counter",
+                        serialize=False,
+                        to="news.article",
+                    ),
+                ),
+                ("views", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0007_articleviewcount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingEntry",
+            fields=[
+                (
+                    "article",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="trending",
+                        serialize=False,
+                        to="news.article",
+                    ),
+                ),
+                ("score", models.FloatField(default=0)),
+                ("views_seen", models.BigIntegerField(default=0)),
+                (
+                    "publisher",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="news.publisher",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-score"], name="trending_score_idx"),
+                    models.Index(
+                        fields=["publisher", "-score"],
+                        name="trending_publisher_score_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
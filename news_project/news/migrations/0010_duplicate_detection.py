@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0009_relatedarticle"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArticleSignature",
+            fields=[
+                (
+                    "article",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="news.article",
+                    ),
+                ),
+                ("signature", models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LSHBand",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("band", models.PositiveSmallIntegerField()),
+                ("bucket", models.BigIntegerField()),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lsh_bands",
+                        to="news.article",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["band", "bucket"], name="lsh_band_bucket_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0011_webhooks"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["approved", "-created_at"], name="article_approved_new_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["publisher", "approved", "-created_at"],
+                name="article_publisher_new_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["author", "approved", "-created_at"],
+                name="article_author_new_idx",
+            ),
+        ),
+    ]
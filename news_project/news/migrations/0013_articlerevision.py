@@ -0,0 +1,78 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:25
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def snapshot_articles(apps, schema_editor):
+    """Start the history of every existing article with a full copy."""
+    Article = apps.get_model("news", "Article")
+    ArticleRevision = apps.get_model("news", "ArticleRevision")
+    batch = []
+    for pk, version, title, content in Article.objects.values_list(
+        "pk", "version", "title", "content"
+    ).iterator(chunk_size=1000):
+        batch.append(
+            ArticleRevision(
+                article_id=pk,
+                version=version,
+                base=version,
+                snapshot=True,
+                title=title,
+                data=zlib.compress(content.encode()),
+                size=len(content),
+            )
+        )
+        if len(batch) == 1000:
+            ArticleRevision.objects.bulk_create(batch)
+            batch = []
+    ArticleRevision.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0012_article_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArticleRevision",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField()),
+                ("base", models.PositiveIntegerField()),
+                ("snapshot", models.BooleanField(default=False)),
+                ("title", models.CharField(max_length=200)),
+                ("data", models.BinaryField()),
+                ("size", models.PositiveIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="revisions",
+                        to="news.article",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("article", "version"), name="unique_article_revision"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(snapshot_articles, migrations.RunPython.noop),
+    ]
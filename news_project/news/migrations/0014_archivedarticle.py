@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0013_articlerevision"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="articlerevision",
+            name="article",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="revisions",
+                to="news.article",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedArticle",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=200)),
+                ("content", models.TextField()),
+                ("created_at", models.DateTimeField()),
+                ("version", models.PositiveIntegerField()),
+                ("views", models.BigIntegerField(default=0)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_articles",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "publisher",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="news.publisher",
+                    ),
+                ),
+            ],
+        ),
+    ]
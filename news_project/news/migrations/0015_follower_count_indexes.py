@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("news", "0014_archivedarticle"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                fields=["role", "-follower_count", "id"], name="user_role_followers_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="publisher",
+            index=models.Index(
+                fields=["-follower_count", "id"], name="publisher_followers_idx"
+            ),
+        ),
+    ]
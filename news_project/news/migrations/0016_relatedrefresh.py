@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0015_follower_count_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedRefresh",
+            fields=[
+                (
+                    "article",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="news.article",
+                    ),
+                ),
+                ("queued_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
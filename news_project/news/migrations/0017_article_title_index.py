@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0016_relatedrefresh"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["approved", "title"], name="article_approved_title_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-19 08:10
+
+from django.db import migrations
+
+
+def recompute_signatures(apps, schema_editor):
+    """
+    Signatures from the earlier MinHash permutation are not comparable
+    with new ones, so compute every article's again, dropping those whose
+    text is too short to have one.
+    """
+    from news.duplicates import band_buckets, signature
+
+    Article = apps.get_model("news", "Article")
+    ArticleSignature = apps.get_model("news", "ArticleSignature")
+    LSHBand = apps.get_model("news", "LSHBand")
+    LSHBand.objects.all().delete()
+    ArticleSignature.objects.all().delete()
+
+    signatures, bands = [], []
+    for pk, title, content in Article.objects.values_list(
+        "pk", "title", "content"
+    ).iterator(chunk_size=1000):
+        row = signature(title, content)
+        if row is None:
+            continue
+        signatures.append(ArticleSignature(article_id=pk, signature=row.tobytes()))
+        bands.extend(
+            LSHBand(article_id=pk, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_buckets(row).tolist())
+        )
+        if len(signatures) == 1000:
+            ArticleSignature.objects.bulk_create(signatures)
+            LSHBand.objects.bulk_create(bands)
+            signatures, bands = [], []
+    ArticleSignature.objects.bulk_create(signatures)
+    LSHBand.objects.bulk_create(bands)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0017_article_title_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_signatures, migrations.RunPython.noop),
+    ]
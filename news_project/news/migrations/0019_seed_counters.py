@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:30
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def _tally(queryset, column):
+    return dict(queryset.values_list(column).annotate(n=Count("pk")).order_by())
+
+
+def _store(model, field, counts):
+    rows = []
+    for pk, stored in model.objects.values_list("pk", field).iterator(chunk_size=1000):
+        if stored != counts.get(pk, 0):
+            rows.append(model(pk=pk, **{field: counts.get(pk, 0)}))
+    model.objects.bulk_update(rows, [field], batch_size=1000)
+
+
+def seed_counters(apps, schema_editor):
+    """
+    Count what the counter columns and rows added in 0005 should hold.
+    They started at zero, so existing rows were never counted.
+    """
+    Article = apps.get_model("news", "Article")
+    ArchivedArticle = apps.get_model("news", "ArchivedArticle")
+    Counter = apps.get_model("news", "Counter")
+    CustomUser = apps.get_model("news", "CustomUser")
+    Newsletter = apps.get_model("news", "Newsletter")
+    Publisher = apps.get_model("news", "Publisher")
+    PublisherRequest = apps.get_model("news", "PublisherRequest")
+
+    articles = _tally(Article.objects, "author_id")
+    for author_id, count in _tally(ArchivedArticle.objects, "author_id").items():
+        articles[author_id] = articles.get(author_id, 0) + count
+    _store(CustomUser, "article_count", articles)
+    _store(
+        CustomUser,
+        "follower_count",
+        _tally(
+            CustomUser.subscriptions_journalists.through.objects, "to_customuser_id"
+        ),
+    )
+    _store(
+        Publisher,
+        "follower_count",
+        _tally(CustomUser.subscriptions_publishers.through.objects, "publisher_id"),
+    )
+
+    totals = {
+        "pending_articles": Article.objects.filter(approved=False).count(),
+        "pending_publisher_requests": PublisherRequest.objects.filter(
+            approved=False
+        ).count(),
+        "newsletters": Newsletter.objects.count(),
+    }
+    for name, value in totals.items():
+        Counter.objects.update_or_create(name=name, defaults={"value": value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0018_recompute_signatures"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0019_seed_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="articleviewcount",
+            name="updated_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+    ]
@@ -1,11 +1,123 @@
-from django.db import models
+import secrets
+
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 # Create your models here.
 
 
+class PreserveCountersMixin:
+    """
+    Leaves the columns in ``counter_fields`` out of updates, so saving an
+    instance loaded before a count changed never overwrites the count
+    maintained in the database.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class DirtyFieldsMixin:
+    """
+    Tracks the field values loaded from the database, so saving an
+    existing instance writes only the columns that changed since (and
+    nothing at all when none did). Signal receivers see the changed
+    fields in ``update_fields``, and ``loaded_values()`` gives the
+    previous values without a query.
+
+    Instances without loaded values, such as those returned by
+    ``bulk_create``, are saved in full.
+    """
+
+    _loaded = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember()
+        return instance
+
+    def _tracked_fields(self):
+        return [
+            field
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+        ]
+
+    def _remember(self, names=None):
+        loaded = {} if names is None or self._loaded is None else self._loaded
+        for field in self._tracked_fields():
+            if names is None or field.name in names or field.attname in names:
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded = loaded
+
+    def changed_fields(self):
+        """
+        Names of the fields changed since they were loaded or saved, or
+        None when the loaded values are unknown.
+        """
+        if self._loaded is None:
+            return None
+        changed = [
+            field.name
+            for field in self._tracked_fields()
+            if field.attname not in self._loaded
+            or self._loaded[field.attname] != getattr(self, field.attname)
+        ]
+        if changed:
+            # Their values are only set while saving
+            changed += [
+                field.name
+                for field in self._tracked_fields()
+                if getattr(field, "auto_now", False) and field.name not in changed
+            ]
+        return changed
+
+    def loaded_values(self, *attnames):
+        """
+        The values of ``attnames`` as loaded or last saved, or None when
+        any of them is unknown.
+        """
+        if self._loaded is None or any(name not in self._loaded for name in attnames):
+            return None
+        return {name: self._loaded[name] for name in attnames}
+
+    def with_changed_fields(self, kwargs):
+        """Limit the ``save()`` arguments in ``kwargs`` to the changed fields."""
+        if (
+            self._state.adding
+            or kwargs.get("update_fields") is not None
+            or kwargs.get("force_insert")
+        ):
+            return kwargs
+        changed = self.changed_fields()
+        return kwargs if changed is None else {**kwargs, "update_fields": changed}
+
+    def save(self, *args, **kwargs):
+        kwargs = self.with_changed_fields(kwargs)
+        super().save(*args, **kwargs)
+        self._remember(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        self._remember(fields)
+
+
 # Custom User Model
-class CustomUser(AbstractUser):
+class CustomUser(PreserveCountersMixin, AbstractUser):
     """
     Adds a role field to distinguish between readers, journalists,
     and editors within the system.
@@ -16,6 +128,8 @@ class CustomUser(AbstractUser):
         ("journalist", "Journalist"),
         ("editor", "Editor"),
     ]
+    counter_fields = ("article_count", "follower_count")
+
     # Role assigned at registration
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     subscriptions_publishers = models.ManyToManyField("Publisher", blank=True)
@@ -23,13 +137,30 @@ class CustomUser(AbstractUser):
         "self", blank=True, symmetrical=False
     )
 
+    # Denormalized counters, kept up to date by signals (see news/counters.py)
+    article_count = models.IntegerField(default=0, editable=False)
+    follower_count = models.IntegerField(default=0, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Role-filtered username search in the user pickers
+            models.Index(fields=["role", "username"], name="user_role_username_idx"),
+            # Most followed journalists, ranked without counting subscriptions
+            models.Index(
+                fields=["role", "-follower_count", "id"],
+                name="user_role_followers_idx",
+            ),
+        ]
+
 
 # Publisher Model
-class Publisher(models.Model):
+class Publisher(PreserveCountersMixin, models.Model):
     """
     Represents a publisher.
     """
 
+    counter_fields = ("follower_count",)
+
     name = models.CharField(max_length=100)
 
     # Editors who manage content for this publisher
@@ -42,12 +173,23 @@ class Publisher(models.Model):
         CustomUser, related_name="publisher_journalists", blank=True
     )
 
+    # Denormalized subscriber count, kept up to date by signals
+    follower_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Most followed publishers, ranked without counting subscriptions
+            models.Index(
+                fields=["-follower_count", "id"], name="publisher_followers_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
 # Publisher affiliation requests
-class PublisherRequest(models.Model):
+class PublisherRequest(DirtyFieldsMixin, models.Model):
     """
     Represents a request made by a journalist to be affiliated
     with a publisher.
@@ -73,9 +215,14 @@ class PublisherRequest(models.Model):
     def __str__(self):
         return f"{self.journalist.username} → {self.publisher.name}"
 
+    def save(self, *args, **kwargs):
+        # Counter updates in post_save commit or roll back with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 # Article Model
-class Article(models.Model):
+class Article(DirtyFieldsMixin, models.Model):
     """
     Represents a news article written by journalist.
     """
@@ -91,10 +238,297 @@ class Article(models.Model):
     )
     approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Incremented on every update; used to key cached renderings
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # Newest approved articles, overall and per publisher or author,
+            # read by the syndication feeds
+            models.Index(
+                fields=["approved", "-created_at"], name="article_approved_new_idx"
+            ),
+            models.Index(
+                fields=["publisher", "approved", "-created_at"],
+                name="article_publisher_new_idx",
+            ),
+            models.Index(
+                fields=["author", "approved", "-created_at"],
+                name="article_author_new_idx",
+            ),
+            # Title prefix search in the newsletter article picker
+            models.Index(
+                fields=["approved", "title"], name="article_approved_title_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        kwargs = self.with_changed_fields(kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not update_fields:
+            # Nothing changed: nothing is written and the version stays
+            return
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+        # Counter updates in post_save commit or roll back with the row
+        with transaction.atomic():
+            if not self._state.adding:
+                # Read the stored version under a row lock, so concurrent
+                # saves take consecutive versions instead of the same one
+                stored = (
+                    Article.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("version", flat=True)
+                    .first()
+                )
+                self.version = (self.version if stored is None else stored) + 1
+            super().save(*args, **kwargs)
+
+
+# Archived articles
+class ArchivedArticle(models.Model):
+    """
+    An approved article moved out of the Article table once it is older
+    than ARCHIVE_AFTER_DAYS (news/archive.py), so the hot table and its
+    indexes only hold recent articles. Keeps the article's ID and can be
+    read like an Article, but not edited.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    content = models.TextField()
+    author = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="archived_articles"
+    )
+    publisher = models.ForeignKey(
+        Publisher, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    created_at = models.DateTimeField()
+    version = models.PositiveIntegerField()
+    # Reads, including those made after archival
+    views = models.BigIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Only approved articles are archived
+    approved = True
+
+
+# Article read counts
+class ArticleViewCount(models.Model):
+    """
+    Total reads of an article. Written in batches by the view counter
+    buffer in news/view_counts.py rather than on every read.
+    """
+
+    article = models.OneToOneField(
+        Article,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="view_counter",
+    )
+    views = models.BigIntegerField(default=0)
+    # Last flush that added reads, so the trending update reads only these
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+# Trending ranking
+class TrendingEntry(models.Model):
+    """
+    Time-decayed popularity of an approved article, maintained
+    incrementally by the ``update_trending`` command (news/trending.py).
+    """
+
+    article = models.OneToOneField(
+        Article,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="trending",
+    )
+    # Copied from the article so per-publisher rankings use one index
+    publisher = models.ForeignKey(
+        Publisher, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    # Forward-decayed score, relative to the TRENDING_LANDMARK counter
+    score = models.FloatField(default=0)
+    # Article reads already counted into the score
+    views_seen = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score"], name="trending_score_idx"),
+            models.Index(
+                fields=["publisher", "-score"], name="trending_publisher_score_idx"
+            ),
+        ]
+
+
+# Related articles
+class RelatedArticle(models.Model):
+    """
+    A precomputed neighbour of an approved article by TF-IDF cosine
+    similarity, maintained by news/related.py.
+    """
+
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="related_entries"
+    )
+    related = models.ForeignKey(Article, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["article", "related"], name="unique_related_article"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["article", "-score"], name="related_article_score_idx")
+        ]
+
+
+class RelatedRefresh(models.Model):
+    """
+    An article whose related articles are waiting to be recomputed by
+    ``rebuild_related --pending``, so saves never touch the index.
+    """
+
+    article = models.OneToOneField(
+        Article, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    queued_at = models.DateTimeField(default=timezone.now)
+
+
+# Near-duplicate detection
+class ArticleSignature(models.Model):
+    """
+    MinHash signature of an article's text, used to confirm candidate
+    near-duplicates found through its LSH bands (news/duplicates.py).
+    """
+
+    article = models.OneToOneField(
+        Article,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="signature",
+    )
+    # uint32 MinHash values as raw bytes
+    signature = models.BinaryField()
+
+
+class LSHBand(models.Model):
+    """
+    The bucket one band of an article's signature hashes to. Articles that
+    share a bucket in any band are candidate near-duplicates.
+    """
+
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="lsh_bands"
+    )
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["band", "bucket"], name="lsh_band_bucket_idx")]
+
+
+# Article revision history
+class ArticleRevision(models.Model):
+    """
+    The title and content of an article at one version. Content is stored
+    as a compressed full copy every REVISION_SNAPSHOT_INTERVAL revisions
+    and as a compressed delta against the previous revision in between
+    (news/revisions.py).
+    """
+
+    # Revisions outlive archival, so the article may be in ArchivedArticle;
+    # they are removed by a signal when the article is deleted
+    article = models.ForeignKey(
+        Article,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="revisions",
+    )
+    # Article.version the revision was saved as
+    version = models.PositiveIntegerField()
+    # Version of the snapshot this revision is rebuilt from
+    base = models.PositiveIntegerField()
+    snapshot = models.BooleanField(default=False)
+    title = models.CharField(max_length=200)
+    data = models.BinaryField()
+    # Characters of content, shown in the history
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["article", "version"], name="unique_article_revision"
+            )
+        ]
+
+
+# Partner webhooks
+def _webhook_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """
+    A partner URL notified when an article of the publisher is approved
+    or updated. Payloads are signed with ``secret`` (news/webhooks.py).
+    """
+
+    publisher = models.ForeignKey(
+        Publisher, on_delete=models.CASCADE, related_name="webhooks"
+    )
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=_webhook_secret)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.publisher} -> {self.url}"
+
+
+class WebhookDelivery(models.Model):
+    """
+    One event to deliver to one endpoint, retried with backoff until it
+    succeeds or runs out of attempts and is dead-lettered.
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    DELIVERED = "delivered"
+    DEAD = "dead"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (DELIVERED, "Delivered"),
+        (DEAD, "Dead"),
+    ]
+
+    endpoint = models.ForeignKey(
+        WebhookEndpoint, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    event = models.CharField(max_length=50)
+    # Exact JSON body sent on every attempt, so the signature is stable
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="webhook_due_idx")
+        ]
 
 
 # Newsletter Model
-class Newsletter(models.Model):
+class Newsletter(DirtyFieldsMixin, models.Model):
     """
     Represents a newsletter by a journalist or editor.
     It includes multiple articles.
@@ -108,3 +542,28 @@ class Newsletter(models.Model):
         CustomUser, on_delete=models.CASCADE, related_name="newsletters"
     )
     articles = models.ManyToManyField(Article, related_name="newsletters")
+
+
+# Site-wide counters
+class Counter(models.Model):
+    """
+    A named site-wide count, such as the number of pending articles,
+    kept up to date by signals so dashboards can read it in O(1).
+    """
+
+    PENDING_ARTICLES = "pending_articles"
+    PENDING_PUBLISHER_REQUESTS = "pending_publisher_requests"
+    # Newsletters, for paginating them without a COUNT query
+    NEWSLETTERS = "newsletters"
+    # Unix time that stored trending scores are relative to
+    TRENDING_LANDMARK = "trending_landmark"
+    # Unix time the last trending update started reading view counts
+    TRENDING_READ_AT = "trending_read_at"
+    # Bumped whenever the related-articles index file is rewritten
+    RELATED_INDEX_VERSION = "related_index_version"
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+from . import counters
+from .models import Counter
+
+
+class NewsletterPaginator(Paginator):
+    """
+    Takes the number of newsletters from their stored counter instead of
+    a ``COUNT(*)`` over the table on every page.
+    """
+
+    @cached_property
+    def count(self):
+        return counters.read(Counter.NEWSLETTERS)[Counter.NEWSLETTERS]
+
+
+class NewsletterPagination(PageNumberPagination):
+    """
+    ``NEWSLETTER_PAGE_SIZE`` newsletters per page; clients may ask for up
+    to ``NEWSLETTER_MAX_PAGE_SIZE`` with ``?page_size=<n>``.
+    """
+
+    django_paginator_class = NewsletterPaginator
+    page_size_query_param = "page_size"
+
+    @property
+    def page_size(self):
+        return settings.NEWSLETTER_PAGE_SIZE
+
+    @property
+    def max_page_size(self):
+        return settings.NEWSLETTER_MAX_PAGE_SIZE
@@ -0,0 +1,81 @@
+import gzip
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse
+from django.template.loader import render_to_string
+
+from .related import related_articles
+
+
+def prerender_directory():
+    return Path(settings.PRERENDERED_ARTICLES_DIR)
+
+
+def article_paths(pk):
+    """Return the paths of the HTML page and its gzip variant."""
+    html_path = prerender_directory() / f"{pk}.html"
+    return html_path, html_path.with_name(f"{pk}.html.gz")
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def render_article_page(article):
+    """Render the article detail page as an anonymous reader sees it."""
+    return render_to_string(
+        "article_detail.html",
+        {
+            "article": article,
+            "related": related_articles(article),
+            "user": AnonymousUser(),
+        },
+    )
+
+
+def write_article(article):
+    """
+    Write the static page and its precompressed gzip variant for an
+    approved article.
+    """
+    html_path, gz_path = article_paths(article.pk)
+    html_path.parent.mkdir(parents=True, exist_ok=True)
+    data = render_article_page(article).encode("utf-8")
+    _write_atomic(html_path, data)
+    _write_atomic(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+
+
+def remove_article(pk):
+    """Remove the static pages of an article, if any."""
+    for path in article_paths(pk):
+        path.unlink(missing_ok=True)
+
+
+def serve_prerendered(request, pk):
+    """
+    Return a response serving the pre-rendered page of article ``pk``
+    from disk, or None when there is none.
+    """
+    html_path, gz_path = article_paths(pk)
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        try:
+            response = FileResponse(
+                open(gz_path, "rb"), content_type="text/html; charset=utf-8"
+            )
+        except FileNotFoundError:
+            return None
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        try:
+            response = FileResponse(
+                open(html_path, "rb"), content_type="text/html; charset=utf-8"
+            )
+        except FileNotFoundError:
+            return None
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
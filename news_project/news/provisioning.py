@@ -0,0 +1,180 @@
+import os
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import IntegrityError, transaction
+
+from . import counters
+from .models import CustomUser, Publisher
+from .utils import process_pool
+
+ROLES = [role for role, _ in CustomUser.ROLE_CHOICES]
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def role_group_ids():
+    """
+    Resolve the group for every role once, creating missing groups.
+    Mirrors the names used by the ``assign_group`` signal.
+    """
+    return {
+        role: Group.objects.get_or_create(name=role.capitalize())[0].pk
+        for role in ROLES
+    }
+
+
+def provision_users(rows, batch_size=1000, workers=None):
+    """
+    Create users in bulk, assign their role groups and seed their
+    subscriptions.
+
+    Each row is a dict with ``username``, ``email``, ``role`` and
+    ``password``, and optionally ``journalists`` (usernames to subscribe to)
+    and ``publishers`` (publisher IDs to subscribe to).
+
+    Users are inserted with ``bulk_create`` one batch per transaction, so
+    the per-user ``assign_group`` signal does not run; group memberships and
+    subscriptions are inserted in batches instead. Passwords are hashed in
+    parallel across ``workers`` processes (all cores by default, ``1`` hashes
+    in this process). Usernames that already exist, or that repeat an
+    earlier row of the same batch, are skipped.
+
+    Returns a dict with the number of users ``created`` and ``skipped``.
+    """
+    group_ids = role_group_ids()
+    summary = {"created": 0, "skipped": 0}
+    workers = workers or os.cpu_count() or 1
+    pool = process_pool(workers) if workers > 1 else None
+
+    try:
+        for batch in _batches(rows, batch_size):
+            for row in batch:
+                if row["role"] not in group_ids:
+                    raise ValueError(
+                        f"Unknown role {row['role']!r} for {row['username']!r}."
+                    )
+
+            # Only the first row of a username is used, and usernames that
+            # already exist are skipped
+            first_rows = {}
+            for row in batch:
+                first_rows.setdefault(row["username"], row)
+            existing = _existing_usernames(first_rows)
+            pending = [row for name, row in first_rows.items() if name not in existing]
+            summary["skipped"] += len(batch) - len(pending)
+            if not pending:
+                continue
+
+            passwords = [row["password"] for row in pending]
+            if pool:
+                chunksize = max(1, len(passwords) // (workers * 4))
+                hashed = list(pool.map(make_password, passwords, chunksize=chunksize))
+            else:
+                hashed = [make_password(password) for password in passwords]
+
+            while pending:
+                try:
+                    with transaction.atomic():
+                        _create_batch(pending, hashed, group_ids)
+                except IntegrityError:
+                    # Some usernames were taken by another process since the
+                    # check; skip them and insert the rest
+                    taken = _existing_usernames(row["username"] for row in pending)
+                    if not taken:
+                        raise
+                    kept = [
+                        (row, password)
+                        for row, password in zip(pending, hashed)
+                        if row["username"] not in taken
+                    ]
+                    summary["skipped"] += len(pending) - len(kept)
+                    pending = [row for row, _ in kept]
+                    hashed = [password for _, password in kept]
+                else:
+                    summary["created"] += len(pending)
+                    break
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return summary
+
+
+def _existing_usernames(usernames):
+    return set(
+        CustomUser.objects.filter(username__in=list(usernames)).values_list(
+            "username", flat=True
+        )
+    )
+
+
+def _create_batch(batch, hashed_passwords, group_ids):
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                username=row["username"],
+                email=row.get("email", ""),
+                role=row["role"],
+                password=password,
+            )
+            for row, password in zip(batch, hashed_passwords)
+        ]
+    )
+
+    # Not every backend returns primary keys from bulk_create (MySQL does
+    # not), so look them up in one query.
+    user_ids = dict(
+        CustomUser.objects.filter(
+            username__in=[row["username"] for row in batch]
+        ).values_list("username", "pk")
+    )
+
+    GroupMembership = CustomUser.groups.through
+    GroupMembership.objects.bulk_create(
+        [
+            GroupMembership(
+                customuser_id=user_ids[row["username"]], group_id=group_ids[row["role"]]
+            )
+            for row in batch
+        ]
+    )
+
+    journalist_names = {name for row in batch for name in row.get("journalists", ())}
+    journalist_ids = dict(
+        CustomUser.objects.filter(
+            username__in=journalist_names, role="journalist"
+        ).values_list("username", "pk")
+    )
+    JournalistSubscription = CustomUser.subscriptions_journalists.through
+    subscriptions = [
+        JournalistSubscription(
+            from_customuser_id=user_ids[row["username"]],
+            to_customuser_id=journalist_ids[name],
+        )
+        for row in batch
+        for name in set(row.get("journalists", ()))
+        if name in journalist_ids
+    ]
+    JournalistSubscription.objects.bulk_create(subscriptions)
+    counters.adjust_followers(JournalistSubscription, subscriptions)
+
+    publisher_ids = set(
+        Publisher.objects.filter(
+            pk__in={pk for row in batch for pk in row.get("publishers", ())}
+        ).values_list("pk", flat=True)
+    )
+    PublisherSubscription = CustomUser.subscriptions_publishers.through
+    subscriptions = [
+        PublisherSubscription(customuser_id=user_ids[row["username"]], publisher_id=pk)
+        for row in batch
+        for pk in set(row.get("publishers", ()))
+        if pk in publisher_ids
+    ]
+    PublisherSubscription.objects.bulk_create(subscriptions)
+    counters.adjust_followers(PublisherSubscription, subscriptions)
@@ -0,0 +1,538 @@
+import os
+import re
+from collections import Counter as Tally
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Article, Counter, RelatedArticle, RelatedRefresh
+
+TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+
+STOP_WORDS = frozenset("""
+    about after all also an and any are as at be been but by can could did do
+    does for from had has have he her his how if in into is it its just more
+    most no not of on or our out over she so some such than that the their
+    them then there these they this those to under up was we were what when
+    which who will with would you your
+    """.split())
+
+# Upper bounds on the cells of one block of the similarity matrix, and on
+# the (query term, posting) pairs summed into it, so memory stays flat
+# however many articles there are.
+BLOCK_CELLS = 1 << 22
+BLOCK_PAIRS = 1 << 23
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS
+    ]
+
+
+def term_counts(title, content):
+    """Term frequencies of an article; title words count twice."""
+    title_tokens = tokenize(title)
+    return Tally(title_tokens + title_tokens + tokenize(content))
+
+
+class RelatedIndex:
+    """
+    TF-IDF vectors of approved articles as a sparse row matrix.
+
+    Rows are stored in CSR form (``indptr``, ``indices``, ``data``) and are
+    L2-normalized, so the dot product of two rows is their cosine
+    similarity. A term-major copy of the matrix is kept alongside so that
+    similarities against every article are computed by walking only the
+    posting lists of the query's terms.
+    """
+
+    def __init__(self, ids, indptr, indices, data, terms, idf, version=0):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.float32)
+        self.terms = np.asarray(terms, dtype=str)
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.version = version
+        self.vocabulary = {term: index for index, term in enumerate(self.terms)}
+        self.positions = {pk: row for row, pk in enumerate(self.ids.tolist())}
+        self._index_postings()
+
+    def _index_postings(self):
+        rows = np.repeat(np.arange(len(self.ids), dtype=np.int64), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        self.posting_rows = rows[order]
+        self.posting_data = self.data[order]
+        self.posting_ptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.indices, minlength=len(self.terms)),
+            out=self.posting_ptr[1:],
+        )
+
+    # Building
+
+    @classmethod
+    def build(cls, articles, max_features=None, max_df=None):
+        """
+        Build an index from ``(pk, title, content)`` tuples.
+
+        Terms found in more than ``max_df`` of the articles carry little
+        signal and make every article a neighbour of every other, so they
+        are dropped, as is everything past the ``max_features`` most
+        common remaining terms.
+        """
+        max_features = max_features or settings.RELATED_MAX_FEATURES
+        max_df = max_df or settings.RELATED_MAX_DF
+
+        ids, documents, df = [], [], Tally()
+        for pk, title, content in articles:
+            counts = term_counts(title, content)
+            ids.append(pk)
+            documents.append(counts)
+            df.update(counts.keys())
+
+        limit = max(2, int(max_df * len(ids)))
+        kept = [term for term, count in df.most_common() if count <= limit]
+        terms = sorted(kept[:max_features])
+        frequencies = np.array([df[term] for term in terms], dtype=np.float64)
+        # Smoothed inverse document frequency
+        idf = np.log((1 + len(ids)) / (1 + frequencies)) + 1
+
+        index = cls(ids, [0] * (len(ids) + 1), [], [], terms, idf)
+        indptr, indices, data = index.vectorize(documents)
+        index.indptr, index.indices, index.data = indptr, indices, data
+        index._index_postings()
+        return index
+
+    def vectorize(self, documents):
+        """
+        Return the normalized TF-IDF rows of term-count dicts as CSR arrays.
+        Terms outside the vocabulary are ignored.
+        """
+        lengths, indices, counts = [], [], []
+        for document in documents:
+            known = [
+                (self.vocabulary[term], count)
+                for term, count in document.items()
+                if term in self.vocabulary
+            ]
+            known.sort()
+            lengths.append(len(known))
+            for term, count in known:
+                indices.append(term)
+                counts.append(count)
+
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.array(indices, dtype=np.int32)
+        # Sublinear term frequency, so repeated words don't dominate
+        weights = (1 + np.log(np.array(counts, dtype=np.float64))) * self.idf[indices]
+
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        norms = np.sqrt(np.bincount(rows, weights**2, minlength=len(lengths)))
+        norms[norms == 0] = 1
+        return indptr, indices, (weights / norms[rows]).astype(np.float32)
+
+    # Querying
+
+    def similarities(self, indptr, indices, data):
+        """
+        Return the dense ``(queries, articles)`` cosine similarity matrix of
+        a block of CSR query rows against every indexed article.
+        """
+        n_queries = len(indptr) - 1
+        n_docs = len(self.ids)
+        query_rows = np.repeat(np.arange(n_queries, dtype=np.int64), np.diff(indptr))
+
+        # Pair every query term with every posting of that term
+        starts = self.posting_ptr[indices]
+        lengths = self.posting_ptr[indices + 1] - starts
+        pair_term = np.repeat(np.arange(len(indices)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        postings = np.repeat(starts, lengths) + offsets
+
+        cells = query_rows[pair_term] * n_docs + self.posting_rows[postings]
+        products = data[pair_term] * self.posting_data[postings]
+        return np.bincount(
+            cells, products.astype(np.float64), minlength=n_queries * n_docs
+        ).reshape(n_queries, n_docs)
+
+    def neighbours(self, indptr, indices, data, k, exclude=None):
+        """
+        Return ``(ids, scores)`` arrays of the ``k`` most similar articles
+        for each query row, best first. ``exclude`` gives, per query, a row
+        of the index to leave out (the query itself), or -1.
+        """
+        scores = self.similarities(indptr, indices, data)
+        if exclude is not None:
+            queries = np.nonzero(exclude >= 0)[0]
+            scores[queries, exclude[queries]] = 0
+        k = min(k, scores.shape[1])
+        if k == 0:
+            empty = np.empty((scores.shape[0], 0))
+            return empty.astype(np.int64), empty
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        return self.ids[top], np.take_along_axis(top_scores, order, axis=1)
+
+    def all_neighbours(self, k):
+        """
+        Yield ``(pk, neighbour_ids, scores)`` for every indexed article,
+        computing the similarity matrix one block of rows at a time.
+        """
+        for start, stop in self._blocks():
+            indptr = self.indptr[start : stop + 1] - self.indptr[start]
+            span = slice(self.indptr[start], self.indptr[stop])
+            ids, scores = self.neighbours(
+                indptr,
+                self.indices[span],
+                self.data[span],
+                k,
+                exclude=np.arange(start, stop),
+            )
+            yield from zip(self.ids[start:stop].tolist(), ids, scores)
+
+    def _blocks(self):
+        """Split the rows into ``(start, stop)`` ranges within the block limits."""
+        n_docs = len(self.ids)
+        max_rows = max(1, BLOCK_CELLS // max(n_docs, 1))
+        # Pairs each row produces: the document frequency of each of its terms
+        document_frequency = np.diff(self.posting_ptr)[self.indices]
+        pairs = np.add.reduceat(np.append(document_frequency, 0), self.indptr[:-1]) * (
+            np.diff(self.indptr) > 0
+        )
+
+        start, total = 0, 0
+        for row, row_pairs in enumerate(pairs.tolist()):
+            if row > start and (
+                row - start >= max_rows or total + row_pairs > BLOCK_PAIRS
+            ):
+                yield start, row
+                start, total = row, 0
+            total += row_pairs
+        if start < n_docs:
+            yield start, n_docs
+
+    # Updating
+
+    def rows(self, positions):
+        """Return the CSR arrays of the rows at ``positions``."""
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.indptr[positions]
+        lengths = self.indptr[positions + 1] - starts
+        indptr = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        take = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return indptr, self.indices[take], self.data[take]
+
+    def upsert(self, pks, indptr, indices, data):
+        """
+        Return a copy of the index with the rows of articles ``pks``
+        replaced by the given CSR rows, in the same order.
+        """
+        keep = ~np.isin(self.ids, pks)
+        lengths = np.diff(self.indptr)[keep]
+        nnz_keep = np.repeat(keep, np.diff(self.indptr))
+        return RelatedIndex(
+            np.append(self.ids[keep], pks),
+            np.concatenate([[0], np.cumsum(np.append(lengths, np.diff(indptr)))]),
+            np.concatenate([self.indices[nnz_keep], indices]),
+            np.concatenate([self.data[nnz_keep], data]),
+            self.terms,
+            self.idf,
+            self.version,
+        )
+
+    # Storage
+
+    def save(self, path):
+        path = str(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            ids=self.ids,
+            indptr=self.indptr,
+            indices=self.indices,
+            data=self.data,
+            terms=self.terms,
+            idf=self.idf,
+            version=self.version,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(
+                arrays["ids"],
+                arrays["indptr"],
+                arrays["indices"],
+                arrays["data"],
+                arrays["terms"],
+                arrays["idf"],
+                int(arrays["version"]),
+            )
+
+
+# The index as last loaded by this process
+_loaded = None
+
+
+def _lock_version():
+    """
+    Return the counter holding the index version, locked until the end of
+    the transaction so that only one process rewrites the index at a time.
+    """
+    counter, _ = Counter.objects.select_for_update().get_or_create(
+        name=Counter.RELATED_INDEX_VERSION
+    )
+    return counter
+
+
+def load_index(version):
+    """Return the stored index, reusing this process's copy when current."""
+    global _loaded
+    if _loaded is None or _loaded.version != version:
+        try:
+            _loaded = RelatedIndex.load(settings.RELATED_INDEX_PATH)
+        except FileNotFoundError:
+            return None
+    return _loaded
+
+
+def _store(index, counter):
+    global _loaded
+    counter.value += 1
+    counter.save(update_fields=["value"])
+    index.version = counter.value
+    index.save(settings.RELATED_INDEX_PATH)
+    _loaded = index
+
+
+def _approved_articles():
+    return (
+        Article.objects.filter(approved=True)
+        .order_by("pk")
+        .values_list("pk", "title", "content")
+        .iterator()
+    )
+
+
+def _stored_lists(article_ids=None):
+    """The stored neighbour lists, as ``{pk: (related_id, ...)}``, best first."""
+    entries = RelatedArticle.objects.order_by("article_id", "-score", "related_id")
+    if article_ids is not None:
+        entries = entries.filter(article_id__in=article_ids)
+    lists = {}
+    for pk, related_id in entries.values_list("article_id", "related_id").iterator():
+        lists.setdefault(pk, []).append(related_id)
+    return {pk: tuple(related_ids) for pk, related_ids in lists.items()}
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute the vocabulary, every vector and every neighbour list from
+    the approved articles. Returns the IDs of the articles whose neighbour
+    lists changed, so their pages can be rendered again.
+    """
+    k = settings.RELATED_ARTICLES_COUNT
+    with transaction.atomic():
+        counter = _lock_version()
+        index = RelatedIndex.build(_approved_articles())
+        before = _stored_lists()
+        RelatedArticle.objects.all().delete()
+        rows = [
+            RelatedArticle(article_id=pk, related_id=related_id, score=score)
+            for pk, related_ids, scores in index.all_neighbours(k)
+            for related_id, score in zip(related_ids.tolist(), scores.tolist())
+            if score > 0
+        ]
+        RelatedArticle.objects.bulk_create(rows, batch_size=batch_size)
+        RelatedRefresh.objects.all().delete()
+        _store(index, counter)
+
+    after = {}
+    for row in sorted(
+        rows, key=lambda row: (row.article_id, -row.score, row.related_id)
+    ):
+        after.setdefault(row.article_id, []).append(row.related_id)
+    return {
+        pk
+        for pk in before.keys() | after.keys()
+        if before.get(pk) != tuple(after.get(pk, ()))
+    }
+
+
+def _neighbour_lists(index, pks, k):
+    """
+    Return ``{pk: [(related_id, score), ...]}`` with the approved
+    neighbours of the indexed articles ``pks``, best first, computed a
+    block of rows at a time.
+    """
+    max_rows = max(1, BLOCK_CELLS // max(len(index.ids), 1))
+    candidates = {}
+    for start in range(0, len(pks), max_rows):
+        block = pks[start : start + max_rows]
+        positions = np.array([index.positions[pk] for pk in block])
+        # Over-fetch, since some neighbours may have been unapproved
+        ids, scores = index.neighbours(*index.rows(positions), k * 2, exclude=positions)
+        for pk, row_ids, row_scores in zip(block, ids.tolist(), scores.tolist()):
+            candidates[pk] = [
+                (related_id, score)
+                for related_id, score in zip(row_ids, row_scores)
+                if score > 0
+            ]
+    approved = set(
+        Article.objects.filter(
+            pk__in={
+                related_id for pairs in candidates.values() for related_id, _ in pairs
+            },
+            approved=True,
+        ).values_list("pk", flat=True)
+    )
+    return {
+        pk: [
+            (related_id, score) for related_id, score in pairs if related_id in approved
+        ][:k]
+        for pk, pairs in candidates.items()
+    }
+
+
+def refresh_articles(pks):
+    """
+    Index newly approved (or edited) articles, store their neighbours and
+    add them to the lists of articles they now outrank a neighbour of.
+    Lists that held one of them before are recomputed, since its old
+    score there no longer holds. The index file is written once.
+
+    The vocabulary and IDF weights stay as they were at the last rebuild,
+    so words first seen since then are ignored until the next one.
+    Returns the IDs of the articles whose neighbour lists changed, or None
+    when there is no index yet.
+    """
+    k = settings.RELATED_ARTICLES_COUNT
+    articles = list(
+        Article.objects.filter(pk__in=pks, approved=True)
+        .order_by("pk")
+        .values_list("pk", "title", "content")
+    )
+    if not articles:
+        return set()
+
+    with transaction.atomic():
+        counter = _lock_version()
+        index = load_index(counter.value)
+        if index is None:
+            return None
+
+        ids = [pk for pk, _, _ in articles]
+        rows = index.vectorize(
+            [term_counts(title, content) for _, title, content in articles]
+        )
+        index = index.upsert(ids, *rows)
+
+        holders = (
+            RelatedArticle.objects.filter(related_id__in=ids)
+            .exclude(article_id__in=ids)
+            .values_list("article_id", flat=True)
+            .distinct()
+        )
+        sources = ids + sorted(pk for pk in holders if pk in index.positions)
+        before = _stored_lists(sources)
+        lists = _neighbour_lists(index, sources, k)
+        RelatedArticle.objects.filter(article_id__in=sources).delete()
+        RelatedArticle.objects.bulk_create(
+            RelatedArticle(article_id=pk, related_id=related_id, score=score)
+            for pk, neighbours in lists.items()
+            for related_id, score in neighbours
+        )
+
+        changed = {
+            pk
+            for pk, neighbours in lists.items()
+            if before.get(pk, ()) != tuple(related_id for related_id, _ in neighbours)
+        }
+        for pk in ids:
+            changed |= _offer_to_neighbours(pk, lists[pk], k)
+        _store(index, counter)
+    return changed
+
+
+def queue_refresh(pk):
+    """Queue an article for ``refresh_pending``, or move it to the back."""
+    RelatedRefresh.objects.update_or_create(
+        article_id=pk, defaults={"queued_at": timezone.now()}
+    )
+
+
+def refresh_pending(limit=None):
+    """
+    Refresh the queued articles, oldest first, in one pass, or rebuild
+    everything when there is no index yet. An article queued again while
+    it was refreshed stays queued. Returns the IDs of the articles whose
+    neighbour lists changed.
+    """
+    queued = RelatedRefresh.objects.order_by("queued_at").values_list(
+        "article_id", "queued_at"
+    )
+    queued = list(queued[:limit] if limit else queued)
+    if not queued:
+        return set()
+    changed = refresh_articles([pk for pk, _ in queued])
+    if changed is None:
+        return rebuild()
+    RelatedRefresh.objects.filter(
+        reduce(or_, (Q(article_id=pk, queued_at=queued_at) for pk, queued_at in queued))
+    ).delete()
+    return changed
+
+
+def _offer_to_neighbours(pk, neighbours, k):
+    """
+    Add article ``pk`` to the lists of its neighbours where it beats their
+    weakest entry, dropping that entry when a list is full.
+    """
+    scores = dict(neighbours)
+    lists = {}
+    for entry in RelatedArticle.objects.filter(article_id__in=scores).exclude(
+        related_id=pk
+    ):
+        lists.setdefault(entry.article_id, []).append(entry)
+
+    changed, dropped, added = set(), [], []
+    for source, score in scores.items():
+        entries = sorted(lists.get(source, []), key=lambda entry: entry.score)
+        if len(entries) >= k:
+            if entries[0].score >= score:
+                continue
+            dropped.append(entries[0].pk)
+        added.append(RelatedArticle(article_id=source, related_id=pk, score=score))
+        changed.add(source)
+
+    # Entries from before an edit are replaced, not kept alongside
+    RelatedArticle.objects.filter(article_id__in=scores, related_id=pk).delete()
+    RelatedArticle.objects.filter(pk__in=dropped).delete()
+    RelatedArticle.objects.bulk_create(added)
+    return changed
+
+
+def related_articles(article, limit=None):
+    """Return the stored related articles of ``article``, best first."""
+    return [
+        entry.related
+        for entry in RelatedArticle.objects.filter(
+            article=article, related__approved=True
+        )
+        .select_related("related__author", "related__publisher")
+        .order_by("-score")[: limit or settings.RELATED_ARTICLES_COUNT]
+    ]
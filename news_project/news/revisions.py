@@ -0,0 +1,148 @@
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from django.conf import settings
+
+from .models import ArticleRevision
+
+# Content is diffed as words with their trailing whitespace, so a delta
+# can copy untouched runs of words from the previous revision
+TOKEN_RE = re.compile(r"\s+|\S+\s*")
+
+
+def tokens(text):
+    return TOKEN_RE.findall(text)
+
+
+def make_delta(old, new):
+    """
+    Encode ``new`` as a compressed list of operations on ``old``: a
+    ``[start, end]`` pair copies that range of old tokens and a string is
+    inserted as is.
+    """
+    a, b = tokens(old), tokens(new)
+    ops = []
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode())
+
+
+def apply_delta(old, delta):
+    a = tokens(old)
+    return "".join(
+        "".join(a[op[0] : op[1]]) if isinstance(op, list) else op
+        for op in json.loads(zlib.decompress(delta))
+    )
+
+
+def make_snapshot(text):
+    return zlib.compress(text.encode())
+
+
+def encode_revision(previous, text, chain_length):
+    """
+    Return ``(snapshot, data)`` for a revision following ``previous``, the
+    content of the latest revision, whose chain from its snapshot holds
+    ``chain_length`` revisions. A full copy is stored when the chain is
+    long enough, when there is no previous revision, or when the delta
+    would be no smaller.
+    """
+    snapshot = make_snapshot(text)
+    if previous is None or chain_length >= settings.REVISION_SNAPSHOT_INTERVAL:
+        return True, snapshot
+    delta = make_delta(previous, text)
+    if len(delta) >= len(snapshot):
+        return True, snapshot
+    return False, delta
+
+
+def rebuild(chain):
+    """
+    Rebuild content from ``(snapshot, data)`` pairs in version order,
+    starting with a snapshot.
+    """
+    text = None
+    for snapshot, data in chain:
+        text = zlib.decompress(data).decode() if snapshot else apply_delta(text, data)
+    return text
+
+
+def _chain(article_id, version=None):
+    """
+    The latest revision of an article at or before ``version`` and the
+    ``(snapshot, data)`` chain it is rebuilt from.
+    """
+    revisions = ArticleRevision.objects.filter(article_id=article_id)
+    if version is not None:
+        revisions = revisions.filter(version__lte=version)
+    target = revisions.order_by("-version").values("version", "base", "title").first()
+    if target is None:
+        return None, []
+    chain = (
+        ArticleRevision.objects.filter(
+            article_id=article_id,
+            version__gte=target["base"],
+            version__lte=target["version"],
+        )
+        .order_by("version")
+        .values_list("snapshot", "data")
+    )
+    return target, [(snapshot, bytes(data)) for snapshot, data in chain]
+
+
+def revision(article_id, version=None):
+    """
+    Return ``(version, title, content)`` of the article as it was at
+    ``version`` (the latest revision when None), or None if there is no
+    revision that old.
+    """
+    target, chain = _chain(article_id, version)
+    if target is None:
+        return None
+    return target["version"], target["title"], rebuild(chain)
+
+
+def record_revision(article):
+    """
+    Store the article's current title and content as a revision, unless
+    they are unchanged since the latest one.
+    """
+    target, chain = _chain(article.pk)
+    previous = rebuild(chain) if chain else None
+    if target and target["title"] == article.title and previous == article.content:
+        return None
+    snapshot, data = encode_revision(previous, article.content, len(chain))
+    return ArticleRevision.objects.create(
+        article=article,
+        version=article.version,
+        base=article.version if snapshot else target["base"],
+        snapshot=snapshot,
+        title=article.title,
+        data=data,
+        size=len(article.content),
+    )
+
+
+def diff_segments(old, new):
+    """
+    Split two texts into ``(tag, text)`` segments for display, where tag
+    is ``"equal"``, ``"delete"`` (only in ``old``) or ``"insert"``.
+    """
+    a, b = tokens(old), tokens(new)
+    segments = []
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            segments.append(("equal", "".join(a[i1:i2])))
+            continue
+        if i2 > i1:
+            segments.append(("delete", "".join(a[i1:i2])))
+        if j2 > j1:
+            segments.append(("insert", "".join(b[j1:j2])))
+    return segments
@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework import serializers
-from .models import Article, Newsletter, Publisher, CustomUser
+from .models import Article, ArchivedArticle, Newsletter, Publisher, CustomUser
+from .subscriptions import JOURNALISTS, PUBLISHERS, unknown_targets
 
 
 # Article Serializer
@@ -8,22 +11,75 @@ class ArticleSerializer(serializers.ModelSerializer):
     Serializer for Article model.
     """
 
+    # Flushed read count; select_related("view_counter") avoids a query per row
+    view_count = serializers.SerializerMethodField()
+
     class Meta:
         model = Article
         fields = "__all__"
         read_only_fields = ["author", "approved"]
 
+    def get_view_count(self, article):
+        if isinstance(article, ArchivedArticle):
+            return article.views
+        counter = getattr(article, "view_counter", None)
+        return counter.views if counter else 0
+
+
+# Trending Serializer
+class TrendingEntrySerializer(serializers.Serializer):
+    """
+    Serializer for a ranked trending entry and its article.
+    """
+
+    article = ArticleSerializer(read_only=True)
+    score = serializers.FloatField(source="current_score", read_only=True)
+
+
+# Related Article Serializer
+class RelatedArticleSerializer(serializers.Serializer):
+    """
+    Serializer for a precomputed related article and its similarity.
+    """
+
+    article = ArticleSerializer(source="related", read_only=True)
+    score = serializers.FloatField(read_only=True)
+
+
+# Article Summary Serializer
+class ArticleSummarySerializer(serializers.ModelSerializer):
+    """
+    Serializer for the article fields embedded in other resources.
+    """
+
+    author_username = serializers.CharField(source="author.username", read_only=True)
+
+    class Meta:
+        model = Article
+        fields = ["id", "title", "author", "author_username", "publisher", "created_at"]
+
 
 # Newsletter Serializer
 class NewsletterSerializer(serializers.ModelSerializer):
     """
     Serializer for Newsletter model.
+
+    Articles are listed by ID, or as summaries when ``"articles"`` is in
+    the ``expand`` context. Writes always take article IDs.
     """
 
     class Meta:
         model = Newsletter
         fields = "__all__"
 
+    def to_representation(self, newsletter):
+        data = super().to_representation(newsletter)
+        if "articles" in self.context.get("expand", ()):
+            data["articles"] = ArticleSummarySerializer(
+                newsletter.articles.all(), many=True
+            ).data
+        return data
+
 
 # Publisher Serializer
 class PublisherSerializer(serializers.ModelSerializer):
@@ -51,3 +107,92 @@ class UserSerializer(serializers.ModelSerializer):
             "subscriptions_publishers",
             "subscriptions_journalists",
         ]
+
+
+# Bulk Subscription Serializer
+class SubscriptionSetSerializer(serializers.Serializer):
+    """
+    Serializer for a set of journalist and publisher IDs to subscribe to
+    or unsubscribe from at once. Each list is checked with one query.
+    """
+
+    journalists = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+    publishers = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+
+    def validate(self, attrs):
+        total = len(attrs["journalists"]) + len(attrs["publishers"])
+        if total > settings.SUBSCRIPTION_BULK_LIMIT:
+            raise serializers.ValidationError(
+                f"At most {settings.SUBSCRIPTION_BULK_LIMIT} IDs per request."
+            )
+        errors = {}
+        for kind, label in ((JOURNALISTS, "journalist"), (PUBLISHERS, "publisher")):
+            unknown = unknown_targets(kind, attrs[kind])
+            if unknown:
+                errors[kind] = [
+                    f"Not a {label}: {', '.join(map(str, sorted(unknown)))}."
+                ]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+# Bulk Provisioning Serializers
+class ProvisionedUserSerializer(serializers.Serializer):
+    """
+    Serializer for one user to create in bulk, with the journalist
+    usernames and publisher IDs to subscribe them to.
+    """
+
+    username = serializers.CharField(
+        max_length=150, validators=[UnicodeUsernameValidator()]
+    )
+    email = serializers.EmailField(required=False, default="", allow_blank=True)
+    role = serializers.ChoiceField(choices=CustomUser.ROLE_CHOICES)
+    password = serializers.CharField(write_only=True)
+    journalists = serializers.ListField(
+        child=serializers.CharField(), required=False, default=list
+    )
+    publishers = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+
+
+class ProvisionSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of users to create at once.
+    """
+
+    users = ProvisionedUserSerializer(many=True, allow_empty=False)
+
+    def validate_users(self, users):
+        if len(users) > settings.PROVISION_BULK_LIMIT:
+            raise serializers.ValidationError(
+                f"At most {settings.PROVISION_BULK_LIMIT} users per request."
+            )
+        return users
+
+
+# Most Followed Serializers
+class FollowedJournalistSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a journalist ranked by followers.
+    """
+
+    class Meta:
+        model = CustomUser
+        fields = ["id", "username", "follower_count"]
+
+
+class FollowedPublisherSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a publisher ranked by followers.
+    """
+
+    class Meta:
+        model = Publisher
+        fields = ["id", "name", "follower_count"]
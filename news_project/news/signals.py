@@ -1,9 +1,51 @@
-from django.db.models.signals import post_save
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
-from .models import CustomUser, Article
+from .models import (
+    CustomUser,
+    Article,
+    ArchivedArticle,
+    ArticleRevision,
+    Counter,
+    Newsletter,
+    Publisher,
+    PublisherRequest,
+    RelatedArticle,
+    TrendingEntry,
+)
+from . import counters
+from .affiliations import invalidate_affiliations
+from .authentication import revoke_role_claims
 from django.core.mail import send_mail
 from .utils import Tweet
+from .prerender import remove_article, write_article
+from .related import queue_refresh
+from .duplicates import index_article
+from .revisions import record_revision
+from .archive import archiving
+from .feeds import (
+    ALL,
+    article_scopes,
+    invalidate_feeds,
+    journalist_scope,
+    publisher_scope,
+)
+from .events import publish_approval
+from .webhooks import APPROVED, UPDATED, enqueue_article_event
+from .instrumentation import track
+from .metrics import EMAIL_FAILURES, EMAIL_SECONDS, NOTIFICATION_RECIPIENTS, TWEETS
+
+logger = logging.getLogger(__name__)
 
 
 # Assign group to new users
@@ -17,6 +59,17 @@ def assign_group(sender, instance, created, **kwargs):
         instance.groups.add(group)
 
 
+# Revoke API tokens that carry an outdated role
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    """
+    Drop the cached role of a saved or deleted user, so tokens issued for
+    a role the user no longer has are rejected.
+    """
+    revoke_role_claims(instance.pk)
+
+
 # Handle article approval
 @receiver(post_save, sender=Article)
 def article_approval_handler(sender, instance, created, **kwargs):
@@ -32,18 +85,343 @@ def article_approval_handler(sender, instance, created, **kwargs):
             subscriptions_journalists=instance.author
         )
         recipient_list = [user.email for user in subscribers if user.email]
+        NOTIFICATION_RECIPIENTS.observe(len(recipient_list))
 
         if recipient_list:
-            send_mail(
-                subject=f"New Article: {instance.title}",
-                message=instance.content,
-                from_email="news@app.com",
-                recipient_list=recipient_list,
-                fail_silently=False,
-            )
+            try:
+                with track("mail"), EMAIL_SECONDS.time():
+                    send_mail(
+                        subject=f"New Article: {instance.title}",
+                        message=instance.content,
+                        from_email="news@app.com",
+                        recipient_list=recipient_list,
+                        fail_silently=False,
+                    )
+            except Exception:
+                EMAIL_FAILURES.inc()
+                raise
 
         # Post to X (Twitter) using the Tweet class
         try:
             Tweet().make_tweet(instance.title)
         except Exception:
-            pass
+            TWEETS.inc(result="failure")
+            logger.warning("Tweet for article %s failed", instance.pk, exc_info=True)
+        else:
+            TWEETS.inc(result="success")
+
+
+# Keep pre-rendered article pages in sync
+@receiver(post_save, sender=Article)
+def prerender_article(sender, instance, **kwargs):
+    """
+    Write the static page of an approved article once the save commits,
+    or remove it when the article is not (or no longer) approved.
+    """
+    if instance.approved:
+        transaction.on_commit(lambda: write_article(instance))
+    else:
+        transaction.on_commit(lambda: remove_article(instance.pk))
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=ArchivedArticle)
+def remove_prerendered_article(sender, instance, **kwargs):
+    """
+    Remove the static page of a deleted article. Archived articles keep
+    theirs.
+    """
+    if archiving():
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: remove_article(pk))
+
+
+# Keep trending entries in step with their article
+@receiver(post_save, sender=Article)
+def sync_trending_entry(sender, instance, created, **kwargs):
+    """
+    Drop the trending entry of an article that is no longer approved and
+    follow publisher changes. New entries are added by ``update_trending``.
+    """
+    if created:
+        return
+    entries = TrendingEntry.objects.filter(article=instance)
+    if instance.approved:
+        entries.exclude(publisher_id=instance.publisher_id).update(
+            publisher_id=instance.publisher_id
+        )
+    else:
+        entries.delete()
+
+
+# Keep related-article lists up to date
+@receiver(post_save, sender=Article)
+def refresh_related_articles(sender, instance, created, update_fields, **kwargs):
+    """
+    Queue an approved article for ``rebuild_related --pending`` when its
+    text or approval changed. An unapproved article is taken out of every
+    list straight away.
+    """
+    if instance.approved:
+        if text_changed(update_fields) or "approved" in update_fields:
+            queue_refresh(instance.pk)
+    elif not created:
+        RelatedArticle.objects.filter(
+            Q(article=instance) | Q(related=instance)
+        ).delete()
+
+
+def text_changed(update_fields):
+    """Whether a save wrote the article's title or content."""
+    return update_fields is None or not update_fields.isdisjoint({"title", "content"})
+
+
+# Near-duplicate index
+@receiver(post_save, sender=Article)
+def index_article_signature(sender, instance, update_fields, **kwargs):
+    """
+    Store the MinHash signature and LSH buckets of the article's current
+    text, unless the save left the text alone.
+    """
+    if text_changed(update_fields):
+        index_article(instance)
+
+
+# Revision history
+@receiver(post_save, sender=Article)
+def record_article_revision(sender, instance, update_fields, **kwargs):
+    """
+    Keep a revision of every version of the article's title and content.
+    """
+    if text_changed(update_fields):
+        record_revision(instance)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=ArchivedArticle)
+def delete_article_revisions(sender, instance, **kwargs):
+    """
+    Delete the history of a deleted article. It is kept when the article
+    is moved to the archive.
+    """
+    if not archiving():
+        ArticleRevision.objects.filter(article_id=instance.pk).delete()
+
+
+# Partner webhooks
+@receiver(post_save, sender=Article)
+def queue_article_webhooks(sender, instance, created, **kwargs):
+    """
+    Queue webhook deliveries to the publisher's partners when an article
+    is approved, or when an approved article is edited. They are sent in
+    the background after the save commits.
+    """
+    if not instance.approved:
+        return
+    previous = getattr(instance, "_counted_state", None)
+    if created or previous is None or not previous["approved"]:
+        enqueue_article_event(APPROVED, instance)
+        transaction.on_commit(lambda: publish_approval(instance))
+    else:
+        enqueue_article_event(UPDATED, instance)
+
+
+# Syndication feeds
+@receiver(post_save, sender=Article)
+def invalidate_article_feeds(sender, instance, created, update_fields, **kwargs):
+    """
+    Expire the cached feeds that show the article, or showed it before
+    the save, when the save changed what they show: its approval, or the
+    text, author or publisher of an approved article.
+    """
+    previous = getattr(instance, "_counted_state", None)
+    if created or previous is None:
+        changed = instance.approved
+    elif previous["approved"] != instance.approved:
+        changed = True
+    else:
+        changed = instance.approved and (
+            text_changed(update_fields)
+            or previous["author_id"] != instance.author_id
+            or previous["publisher_id"] != instance.publisher_id
+        )
+    if changed:
+        invalidate_feeds(*article_scopes(instance, previous))
+
+
+@receiver(post_delete, sender=Article)
+def invalidate_deleted_article_feeds(sender, instance, **kwargs):
+    if instance.approved:
+        invalidate_feeds(*article_scopes(instance))
+
+
+@receiver(post_save, sender=Publisher)
+@receiver(post_save, sender=CustomUser)
+def invalidate_owner_feeds(sender, instance, created, update_fields, **kwargs):
+    """
+    Expire the feeds of a renamed publisher or journalist. A journalist's
+    name is also shown on their articles in the feed of every approved
+    article and in the feeds of the publishers of those articles.
+    """
+    name = "name" if sender is Publisher else "username"
+    if created or (update_fields is not None and name not in update_fields):
+        return
+    if sender is Publisher:
+        invalidate_feeds(publisher_scope(instance.pk))
+    elif instance.role == "journalist":
+        publisher_ids = (
+            Article.objects.filter(author=instance, approved=True)
+            .exclude(publisher=None)
+            .values_list("publisher_id", flat=True)
+            .distinct()
+        )
+        invalidate_feeds(
+            ALL,
+            journalist_scope(instance.pk),
+            *(publisher_scope(pk) for pk in publisher_ids),
+        )
+
+
+# Denormalized counters
+@receiver(pre_save, sender=Article)
+@receiver(pre_save, sender=PublisherRequest)
+def remember_counted_state(sender, instance, **kwargs):
+    """
+    Remember the stored values that counters depend on, so post_save
+    can tell what changed.
+    """
+    instance._counted_state = None
+    if not instance._state.adding:
+        fields = (
+            ("approved", "author_id", "publisher_id")
+            if sender is Article
+            else ("approved",)
+        )
+        # Loaded instances know their stored values; others are looked up
+        instance._counted_state = instance.loaded_values(*fields)
+        if instance._counted_state is None:
+            instance._counted_state = (
+                sender.objects.filter(pk=instance.pk).values(*fields).first()
+            )
+
+
+@receiver(post_save, sender=Article)
+def count_article_save(sender, instance, created, **kwargs):
+    """
+    Keep per-journalist article counts and the pending article count
+    in step with the article.
+    """
+    previous = getattr(instance, "_counted_state", None)
+    if created or previous is None:
+        counters.adjust(CustomUser, "article_count", {instance.author_id: 1})
+        if not instance.approved:
+            counters.bump(Counter.PENDING_ARTICLES, 1)
+        return
+
+    if previous["author_id"] != instance.author_id:
+        counters.adjust(
+            CustomUser,
+            "article_count",
+            {previous["author_id"]: -1, instance.author_id: 1},
+        )
+    if previous["approved"] != instance.approved:
+        counters.bump(Counter.PENDING_ARTICLES, -1 if instance.approved else 1)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=ArchivedArticle)
+def count_article_delete(sender, instance, **kwargs):
+    # Archived articles still count towards their author
+    if archiving():
+        return
+    counters.adjust(CustomUser, "article_count", {instance.author_id: -1})
+    if not instance.approved:
+        counters.bump(Counter.PENDING_ARTICLES, -1)
+
+
+@receiver(post_save, sender=PublisherRequest)
+def count_publisher_request_save(sender, instance, created, **kwargs):
+    """
+    Keep the pending affiliation request count in step with the request.
+    """
+    previous = getattr(instance, "_counted_state", None)
+    if created or previous is None:
+        if not instance.approved:
+            counters.bump(Counter.PENDING_PUBLISHER_REQUESTS, 1)
+    elif previous["approved"] != instance.approved:
+        counters.bump(
+            Counter.PENDING_PUBLISHER_REQUESTS, -1 if instance.approved else 1
+        )
+
+
+@receiver(post_delete, sender=PublisherRequest)
+def count_publisher_request_delete(sender, instance, **kwargs):
+    if not instance.approved:
+        counters.bump(Counter.PENDING_PUBLISHER_REQUESTS, -1)
+
+
+@receiver(post_save, sender=Newsletter)
+def count_newsletter_save(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(Counter.NEWSLETTERS, 1)
+
+
+@receiver(post_delete, sender=Newsletter)
+def count_newsletter_delete(sender, instance, **kwargs):
+    counters.bump(Counter.NEWSLETTERS, -1)
+
+
+@receiver(m2m_changed, sender=CustomUser.subscriptions_journalists.through)
+@receiver(m2m_changed, sender=CustomUser.subscriptions_publishers.through)
+def count_followers(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep follower counts of journalists and publishers in step with
+    subscriptions. Removals are counted against the rows that actually
+    exist, which are looked up before they are deleted.
+    """
+    source, target, target_model = counters.FOLLOW_RELATIONS[sender]
+    rows = sender.objects.filter(**{target if reverse else source: instance.pk})
+    stash = f"_removed_followers_{sender._meta.model_name}"
+
+    if action == "post_add":
+        if reverse:
+            counters.adjust(target_model, "follower_count", {instance.pk: len(pk_set)})
+        else:
+            counters.adjust(target_model, "follower_count", dict.fromkeys(pk_set, 1))
+
+    elif action in ("pre_remove", "pre_clear"):
+        if pk_set is not None:
+            rows = rows.filter(**{f"{source if reverse else target}__in": pk_set})
+        if reverse:
+            setattr(instance, stash, {instance.pk: -rows.count()})
+        else:
+            ids = rows.values_list(target, flat=True)
+            setattr(instance, stash, dict.fromkeys(ids, -1))
+
+    elif action in ("post_remove", "post_clear"):
+        counters.adjust(target_model, "follower_count", getattr(instance, stash, {}))
+
+
+# Cached journalist affiliations
+@receiver(m2m_changed, sender=Publisher.journalists.through)
+def affiliations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached affiliations of journalists added to or removed from
+    a publisher.
+    """
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_affiliations([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        invalidate_affiliations(pk_set)
+    elif action == "pre_clear":
+        invalidate_affiliations(instance.journalists.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Publisher)
+def publisher_deleted(sender, instance, **kwargs):
+    """
+    Drop cached affiliations of a deleted publisher's journalists.
+    """
+    invalidate_affiliations(list(instance.journalists.values_list("pk", flat=True)))
@@ -0,0 +1,92 @@
+// Search-as-you-type picker for <select multiple data-lookup-url="...">.
+// The select only holds the chosen options; matches are fetched from the
+// lookup URL as the user types.
+document.addEventListener("DOMContentLoaded", function () {
+  document.querySelectorAll("select[data-lookup-url]").forEach(function (select) {
+    select.style.display = "none";
+
+    const chips = document.createElement("div");
+    chips.className = "d-flex flex-wrap gap-1 mb-2";
+    const input = document.createElement("input");
+    input.type = "search";
+    input.className = "form-control form-control-sm";
+    input.placeholder = "Type to search…";
+    const results = document.createElement("div");
+    results.className = "list-group mt-1";
+    select.after(chips, input, results);
+
+    function renderChips() {
+      chips.replaceChildren();
+      Array.from(select.options).forEach(function (option) {
+        const chip = document.createElement("span");
+        chip.className = "badge bg-secondary d-flex align-items-center gap-1";
+        chip.textContent = option.text;
+        const remove = document.createElement("button");
+        remove.type = "button";
+        remove.className = "btn-close btn-close-white btn-sm";
+        remove.setAttribute("aria-label", "Remove");
+        remove.addEventListener("click", function () {
+          option.remove();
+          renderChips();
+        });
+        chip.append(remove);
+        chips.append(chip);
+      });
+    }
+
+    function addOption(id, text) {
+      const exists = Array.from(select.options).some((option) => option.value === String(id));
+      if (!exists) {
+        select.append(new Option(text, id, true, true));
+        renderChips();
+      }
+    }
+
+    function search(page) {
+      const query = input.value.trim();
+      if (page === 1) {
+        results.replaceChildren();
+      }
+      if (!query) {
+        return;
+      }
+      const url = new URL(select.dataset.lookupUrl, window.location.origin);
+      url.searchParams.set("q", query);
+      url.searchParams.set("page", page);
+      fetch(url, { credentials: "same-origin" })
+        .then((response) => response.json())
+        .then(function (data) {
+          if (input.value.trim() !== query) {
+            return;
+          }
+          data.results.forEach(function (item) {
+            const button = document.createElement("button");
+            button.type = "button";
+            button.className = "list-group-item list-group-item-action py-1";
+            button.textContent = item.text;
+            button.addEventListener("click", () => addOption(item.id, item.text));
+            results.append(button);
+          });
+          if (data.has_more) {
+            const more = document.createElement("button");
+            more.type = "button";
+            more.className = "list-group-item list-group-item-action py-1 text-muted";
+            more.textContent = "More results…";
+            more.addEventListener("click", function () {
+              more.remove();
+              search(page + 1);
+            });
+            results.append(more);
+          }
+        });
+    }
+
+    let timer;
+    input.addEventListener("input", function () {
+      clearTimeout(timer);
+      timer = setTimeout(() => search(1), 250);
+    });
+
+    renderChips();
+  });
+});
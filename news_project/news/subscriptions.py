@@ -0,0 +1,168 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import counters
+from .metrics import SUBSCRIPTION_CHANGES
+from .models import CustomUser, Publisher
+
+JOURNALISTS = "journalists"
+PUBLISHERS = "publishers"
+
+# Subscription kind -> through model of the relation
+RELATIONS = {
+    JOURNALISTS: CustomUser.subscriptions_journalists.through,
+    PUBLISHERS: CustomUser.subscriptions_publishers.through,
+}
+
+# Metric label of each kind
+TARGETS = {JOURNALISTS: "journalist", PUBLISHERS: "publisher"}
+
+
+def unknown_targets(kind, ids):
+    """
+    The IDs in ``ids`` that are not journalists (or publishers), checked
+    with one query.
+    """
+    ids = set(ids)
+    if kind == JOURNALISTS:
+        found = CustomUser.objects.filter(pk__in=ids, role="journalist")
+    else:
+        found = Publisher.objects.filter(pk__in=ids)
+    return ids - set(found.values_list("pk", flat=True))
+
+
+def _pairs_filter(source, target, pairs):
+    """A filter matching ``(reader, target)`` pairs, grouped by reader."""
+    by_reader = defaultdict(set)
+    for reader_id, target_id in pairs:
+        by_reader[reader_id].add(target_id)
+    condition = Q(pk__in=[])
+    for reader_id, target_ids in by_reader.items():
+        condition |= Q(**{source: reader_id, f"{target}__in": target_ids})
+    return condition
+
+
+def _existing(kind, pairs=None, reader_ids=None):
+    """
+    The stored ``(reader, target)`` pairs among ``pairs``, or all pairs of
+    the readers in ``reader_ids``.
+    """
+    through = RELATIONS[kind]
+    source, target, _ = counters.FOLLOW_RELATIONS[through]
+    if pairs is not None:
+        rows = through.objects.filter(_pairs_filter(source, target, pairs))
+    else:
+        rows = through.objects.filter(**{f"{source}__in": reader_ids})
+    return set(rows.values_list(source, target))
+
+
+def _lock_readers(reader_ids):
+    """
+    Lock the readers' rows for the rest of the transaction, so concurrent
+    changes to the same readers' subscriptions apply one after another and
+    each diffs against the rows the previous one committed. Without it two
+    requests could both find a pair missing (or present) and count it twice.
+    """
+    list(
+        CustomUser.objects.select_for_update()
+        .filter(pk__in=reader_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def _insert(kind, pairs):
+    through = RELATIONS[kind]
+    source, target, _ = counters.FOLLOW_RELATIONS[through]
+    rows = [through(**{source: reader, target: followed}) for reader, followed in pairs]
+    through.objects.bulk_create(rows, ignore_conflicts=True)
+    counters.adjust_followers(through, rows)
+    SUBSCRIPTION_CHANGES.inc(len(rows), target=TARGETS[kind], action="subscribe")
+
+
+def _delete(kind, pairs):
+    through = RELATIONS[kind]
+    source, target, target_model = counters.FOLLOW_RELATIONS[through]
+    if not pairs:
+        return
+    through.objects.filter(_pairs_filter(source, target, pairs)).delete()
+    tally = defaultdict(int)
+    for _, followed in pairs:
+        tally[followed] -= 1
+    counters.adjust(target_model, "follower_count", tally)
+    SUBSCRIPTION_CHANGES.inc(len(pairs), target=TARGETS[kind], action="unsubscribe")
+
+
+def subscribe(kind, pairs):
+    """
+    Add the ``(reader, target)`` pairs that are not stored yet with one
+    batched insert. Returns the number added.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    with transaction.atomic():
+        _lock_readers({reader for reader, _ in pairs})
+        new = pairs - _existing(kind, pairs)
+        if new:
+            _insert(kind, new)
+    return len(new)
+
+
+def unsubscribe(kind, pairs):
+    """
+    Remove the stored ``(reader, target)`` pairs among ``pairs`` with one
+    DELETE. Returns the number removed.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    with transaction.atomic():
+        _lock_readers({reader for reader, _ in pairs})
+        stored = _existing(kind, pairs)
+        _delete(kind, stored)
+    return len(stored)
+
+
+def replace_subscriptions(kind, wanted):
+    """
+    Make ``wanted``, a dict of reader ID to target IDs, the complete
+    subscriptions of those readers: the set difference with the stored
+    rows is applied with one insert and one DELETE. Returns
+    ``(added, removed)``.
+    """
+    pairs = {
+        (reader, target) for reader, targets in wanted.items() for target in targets
+    }
+    with transaction.atomic():
+        _lock_readers(wanted)
+        current = _existing(kind, reader_ids=list(wanted))
+        added, removed = pairs - current, current - pairs
+        if added:
+            _insert(kind, added)
+        _delete(kind, removed)
+    return len(added), len(removed)
+
+
+def subscribed_ids(reader_id):
+    """The journalist and publisher IDs a reader is subscribed to, sorted."""
+    return {
+        kind: sorted(target for _, target in _existing(kind, reader_ids=[reader_id]))
+        for kind in RELATIONS
+    }
+
+
+def most_followed(kind, limit):
+    """
+    The journalists or publishers with the most followers, read in order
+    from the stored follower counts and their index.
+    """
+    if kind == JOURNALISTS:
+        ranked = CustomUser.objects.filter(role="journalist").only(
+            "username", "follower_count"
+        )
+    else:
+        ranked = Publisher.objects.only("name", "follower_count")
+    return list(ranked.order_by("-follower_count", "id")[:limit])
@@ -1,6 +1,26 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.urls import reverse
-from django.test import TestCase
-from .models import CustomUser, Article, Publisher
+from django.test import TestCase, TransactionTestCase, override_settings
+from .models import (
+    CustomUser,
+    Article,
+    Publisher,
+    PublisherRequest,
+    WebhookDelivery,
+    WebhookEndpoint,
+)
+from .webhooks import dispatcher, sign
 
 
 class ArticleHTMLTest(TestCase):
@@ -67,3 +87,1711 @@ class ArticleHTMLTest(TestCase):
         self.article.save()
         self.article.refresh_from_db()
         self.assertTrue(self.article.approved)
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+
+    # Every response reports its SQL and template timings
+    def test_server_timing_header(self):
+        self.client.login(username="reader", password="readerpass")
+        response = self.client.get(reverse("article-list"))
+        header = response["Server-Timing"]
+        self.assertIn("db;dur=", header)
+        self.assertIn("queries", header)
+        self.assertIn("tpl;dur=", header)
+        self.assertIn("total;dur=", header)
+
+    # Sampled requests are logged with the view name
+    @override_settings(SERVER_TIMING_LOG_SAMPLE_RATE=1.0)
+    def test_sampled_log_includes_view_name(self):
+        with self.assertLogs("news.timing", level="INFO") as logs:
+            self.client.get(reverse("article-list"))
+        self.assertIn('"view": "article-list"', logs.output[0])
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.editor = CustomUser.objects.create_user(
+            username="editor", password="editorpass", role="editor"
+        )
+        self.article = Article.objects.create(
+            title="Pending", content="Body", author=self.journalist
+        )
+
+    # Approvals and requests show up at /metrics
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_endpoint_reports_approvals(self):
+        self.client.login(username="editor", password="editorpass")
+        with mock.patch("news.signals.Tweet") as tweet:
+            tweet.return_value.make_tweet.side_effect = RuntimeError("X is down")
+            with self.assertLogs("news.signals", "WARNING"):
+                self.client.post(reverse("article-approve", args=[self.article.pk]))
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-secret"
+        )
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('news_articles_approved_total{channel="html"}', body)
+        self.assertIn('news_tweets_total{result="failure"}', body)
+        self.assertIn("news_http_request_seconds_bucket", body)
+
+    # Only the scraper's token and staff users can read /metrics
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_require_token_or_staff(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+
+        self.client.login(username="editor", password="editorpass")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.editor.is_staff = True
+        self.editor.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    # Approving over the API notifies subscribers once, through the signal
+    def test_api_approval_notifies_once(self):
+        from django.core import mail
+
+        reader = CustomUser.objects.create_user(
+            username="reader", email="reader@example.com", role="reader"
+        )
+        reader.subscriptions_journalists.add(self.journalist)
+        token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "editor", "password": "editorpass"},
+        ).json()["access"]
+        with mock.patch("news.signals.Tweet") as tweet:
+            response = self.client.post(
+                f"/api/articles/{self.article.pk}/approve/",
+                HTTP_AUTHORIZATION=f"Bearer {token}",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 1)
+        tweet.return_value.make_tweet.assert_called_once_with("Pending")
+
+    # Samples written by other workers are merged into the output
+    def test_metrics_merge_worker_files(self):
+        from .metrics import Registry
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                other = Registry()
+                other.counter("news_test_total", "Test counter.").inc(2)
+                other.flush()
+                os.rename(
+                    os.path.join(directory, f"metrics-{os.getpid()}.json"),
+                    os.path.join(directory, "metrics-other.json"),
+                )
+                local = Registry()
+                local.counter("news_test_total", "Test counter.").inc(3)
+                self.assertIn("news_test_total 5", local.render())
+
+    # Files of workers that have exited are removed rather than merged
+    def test_metrics_drop_dead_worker_files(self):
+        from .metrics import Registry
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                # Above the kernel's PID limit, so never a live process
+                dead = os.path.join(directory, f"metrics-{2**22 + 1}.json")
+                with open(dead, "w") as handle:
+                    json.dump({"counters": [["news_test_total", [], 7]]}, handle)
+                with open(f"{dead}.tmp", "w") as handle:
+                    handle.write("{")
+                local = Registry()
+                local.counter("news_test_total", "Test counter.").inc(3)
+                local.flush()
+                self.assertIn("news_test_total 3", local.render())
+                self.assertEqual(os.listdir(directory), [f"metrics-{os.getpid()}.json"])
+
+
+class BulkProvisioningTest(TestCase):
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.publisher = Publisher.objects.create(name="Tech Daily")
+
+    # Users get their role group and subscriptions without the signal
+    def test_provision_users(self):
+        from .provisioning import provision_users
+
+        rows = [
+            {
+                "username": f"reader{i}",
+                "email": f"reader{i}@example.com",
+                "role": "reader",
+                "password": "readerpass",
+                "journalists": ["journalist"],
+                "publishers": [self.publisher.pk],
+            }
+            for i in range(5)
+        ] + [{"username": "journalist", "role": "journalist", "password": "x"}]
+
+        summary = provision_users(rows, batch_size=2, workers=1)
+
+        self.assertEqual(summary, {"created": 5, "skipped": 1})
+        reader = CustomUser.objects.get(username="reader3")
+        self.assertTrue(reader.check_password("readerpass"))
+        self.assertEqual(list(reader.groups.values_list("name", flat=True)), ["Reader"])
+        self.assertIn(self.journalist, reader.subscriptions_journalists.all())
+        self.assertIn(self.publisher, reader.subscriptions_publishers.all())
+
+    # A username repeated within a batch keeps its first row
+    def test_repeated_usernames_are_skipped(self):
+        from .provisioning import provision_users
+
+        rows = [
+            {"username": "reader", "role": "reader", "password": "first"},
+            {"username": "reader", "role": "editor", "password": "second"},
+            {"username": "other", "role": "reader", "password": "other"},
+        ]
+        summary = provision_users(rows, batch_size=10, workers=1)
+
+        self.assertEqual(summary, {"created": 2, "skipped": 1})
+        reader = CustomUser.objects.get(username="reader")
+        self.assertEqual(reader.role, "reader")
+        self.assertTrue(reader.check_password("first"))
+
+    # Editors can provision users over the API; small requests are hashed
+    # without starting a process pool
+    def test_provision_api(self):
+        CustomUser.objects.create_user(
+            username="editor", password="editorpass", role="editor"
+        )
+        url = reverse("provision-users")
+        payload = {
+            "users": [
+                {
+                    "username": "newreader",
+                    "role": "reader",
+                    "password": "readerpass",
+                    "journalists": ["journalist"],
+                },
+                {"username": "journalist", "role": "journalist", "password": "x"},
+            ]
+        }
+
+        token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "journalist", "password": "journalistpass"},
+        ).json()["access"]
+        response = self.client.post(
+            url,
+            payload,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.status_code, 403)
+
+        token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "editor", "password": "editorpass"},
+        ).json()["access"]
+        with mock.patch("news.provisioning.process_pool") as pool:
+            response = self.client.post(
+                url,
+                payload,
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {token}",
+            )
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"created": 1, "skipped": 1})
+        reader = CustomUser.objects.get(username="newreader")
+        self.assertIn(self.journalist, reader.subscriptions_journalists.all())
+
+
+class ArticleRowCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.editor = CustomUser.objects.create_user(
+            username="editor", password="editorpass", role="editor"
+        )
+        self.article = Article.objects.create(
+            title="Cached Article", content="Body", author=self.journalist
+        )
+
+    # Cached rows are reused until the article changes
+    def test_rows_rerendered_only_after_change(self):
+        from .metrics import registry
+
+        def misses():
+            counters, _ = registry.collect()
+            key = ("news_article_row_cache_total", (("result", "miss"),))
+            return counters.get(key, 0)
+
+        self.client.login(username="editor", password="editorpass")
+        self.client.get(reverse("article-list"))
+        before = misses()
+        response = self.client.get(reverse("article-list"))
+        self.assertEqual(misses(), before)
+        self.assertContains(response, "Cached Article")
+
+        self.article.title = "Edited Article"
+        self.article.save()
+        response = self.client.get(reverse("article-list"))
+        self.assertEqual(misses(), before + 1)
+        self.assertContains(response, "Edited Article")
+
+        self.journalist.username = "renamed"
+        self.journalist.save()
+        response = self.client.get(reverse("article-list"))
+        self.assertContains(response, "renamed")
+
+    # Each user gets their own CSRF token in cached forms
+    def test_csrf_placeholder_replaced(self):
+        from .fragments import CSRF_PLACEHOLDER
+
+        self.client.login(username="editor", password="editorpass")
+        response = self.client.get(reverse("article-list"))
+        self.assertContains(response, "csrfmiddlewaretoken")
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+
+
+@override_settings(ARTICLE_VIEW_FLUSH_INTERVAL=0)
+class PrerenderTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            PRERENDERED_ARTICLES_DIR=self.directory.name
+        )
+        self.settings_override.enable()
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.article = Article.objects.create(
+            title="Static Article", content="Static content", author=self.journalist
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    # Approval writes the page and its gzip variant; unapproval removes them
+    def test_pages_follow_approval(self):
+        from .prerender import article_paths
+
+        html_path, gz_path = article_paths(self.article.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.approved = True
+            self.article.save()
+        self.assertTrue(html_path.exists())
+        self.assertTrue(gz_path.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.approved = False
+            self.article.save()
+        self.assertFalse(html_path.exists())
+        self.assertFalse(gz_path.exists())
+
+    # Anonymous readers are served from disk without touching the database
+    def test_anonymous_served_from_disk(self):
+        import gzip
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.approved = True
+            self.article.save()
+        url = reverse("article-detail", args=[self.article.pk])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertIn(b"Static content", body)
+
+
+class CounterTest(TestCase):
+    def setUp(self):
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.publisher = Publisher.objects.create(name="Tech Daily")
+
+    def counts(self):
+        from .counters import read
+        from .models import Counter
+
+        self.journalist.refresh_from_db()
+        self.publisher.refresh_from_db()
+        pending = read(Counter.PENDING_ARTICLES)[Counter.PENDING_ARTICLES]
+        return (
+            self.journalist.article_count,
+            self.journalist.follower_count,
+            self.publisher.follower_count,
+            pending,
+        )
+
+    # Saves, deletes and subscription changes keep the counters in step
+    def test_counters_follow_changes(self):
+        article = Article.objects.create(
+            title="Draft", content="Body", author=self.journalist
+        )
+        self.reader.subscriptions_journalists.add(self.journalist)
+        self.publisher.customuser_set.add(self.reader)
+        self.assertEqual(self.counts(), (1, 1, 1, 1))
+
+        article.approved = True
+        article.save()
+        self.reader.subscriptions_journalists.remove(self.journalist)
+        self.reader.subscriptions_publishers.clear()
+        self.assertEqual(self.counts(), (1, 0, 0, 0))
+
+        # A stale instance does not overwrite the stored count
+        stale = Publisher.objects.get(pk=self.publisher.pk)
+        self.reader.subscriptions_publishers.add(self.publisher)
+        stale.name = "Renamed"
+        stale.save()
+        article.delete()
+        self.assertEqual(self.counts(), (0, 0, 1, 0))
+
+    # The reconcile command repairs drifted counters
+    def test_reconcile_repairs_drift(self):
+        from django.core.management import call_command
+
+        Article.objects.create(title="Draft", content="Body", author=self.journalist)
+        self.reader.subscriptions_journalists.add(self.journalist)
+        CustomUser.objects.filter(pk=self.journalist.pk).update(
+            article_count=7, follower_count=-2
+        )
+        call_command("reconcile_counters", stdout=open(os.devnull, "w"))
+        self.assertEqual(self.counts(), (1, 1, 0, 1))
+
+    # The migration adding the counters is followed by one counting the
+    # rows that existed before them
+    def test_migration_seeds_counters(self):
+        from importlib import import_module
+
+        from django.apps import apps
+        from .models import Counter
+
+        Article.objects.create(title="Draft", content="Body", author=self.journalist)
+        self.reader.subscriptions_journalists.add(self.journalist)
+        self.reader.subscriptions_publishers.add(self.publisher)
+        CustomUser.objects.update(article_count=0, follower_count=0)
+        Publisher.objects.update(follower_count=0)
+        Counter.objects.all().delete()
+
+        migration = import_module("news.migrations.0019_seed_counters")
+        migration.seed_counters(apps, None)
+        self.assertEqual(self.counts(), (1, 1, 1, 1))
+
+
+class BulkAffiliationTest(TestCase):
+    def setUp(self):
+        self.editor = CustomUser.objects.create_user(
+            username="editor", password="editorpass", role="editor"
+        )
+        self.publisher = Publisher.objects.create(name="Tech Daily")
+        self.requests = [
+            PublisherRequest.objects.create(
+                journalist=CustomUser.objects.create_user(
+                    username=f"journalist{i}", password="pass", role="journalist"
+                ),
+                publisher=self.publisher,
+            )
+            for i in range(4)
+        ]
+        self.client.login(username="editor", password="editorpass")
+
+    # The pending queue loads related objects up front, one page at a time
+    @override_settings(PUBLISHER_REQUESTS_PAGE_SIZE=3)
+    def test_pending_queue_is_paginated(self):
+        response = self.client.get(reverse("publisher-requests-pending"))
+        self.assertEqual(len(response.context["requests"]), 3)
+        self.assertContains(response, "Page 1 of 2")
+
+    # Selected requests are approved or rejected together
+    def test_bulk_approve_and_reject(self):
+        from .counters import read
+        from .models import Counter
+
+        approve = [req.pk for req in self.requests[:3]]
+        self.client.post(
+            reverse("publisher-requests-bulk"),
+            {"action": "approve", "request_ids": approve},
+        )
+        self.assertEqual(self.publisher.journalists.count(), 3)
+        self.assertEqual(PublisherRequest.objects.filter(approved=True).count(), 3)
+
+        self.client.post(
+            reverse("publisher-requests-bulk"),
+            {"action": "reject", "request_ids": [self.requests[3].pk]},
+        )
+        self.assertFalse(PublisherRequest.objects.filter(approved=False).exists())
+        pending = Counter.PENDING_PUBLISHER_REQUESTS
+        self.assertEqual(read(pending)[pending], 0)
+
+
+class AffiliationCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.publisher = Publisher.objects.create(name="Tech Daily")
+        self.other = Publisher.objects.create(name="World News")
+
+    # The form reads affiliations from the cache after the first load
+    def test_form_uses_cached_affiliations(self):
+        from .forms import ArticleForm
+
+        self.publisher.journalists.add(self.journalist)
+        ArticleForm(user=self.journalist)
+        with self.assertNumQueries(0):
+            form = ArticleForm(user=self.journalist)
+        self.assertEqual(list(form.fields["publisher"].queryset), [self.publisher])
+
+    # Membership changes from either side drop the cached entry
+    def test_membership_changes_invalidate(self):
+        from .affiliations import affiliated_publisher_ids
+
+        self.assertEqual(affiliated_publisher_ids(self.journalist), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.publisher.journalists.add(self.journalist)
+        self.assertEqual(affiliated_publisher_ids(self.journalist), [self.publisher.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.journalist.publisher_journalists.clear()
+        self.assertEqual(affiliated_publisher_ids(self.journalist), [])
+
+
+class UserLookupTest(TestCase):
+    def setUp(self):
+        self.editor = CustomUser.objects.create_user(
+            username="editor", password="editorpass", role="editor"
+        )
+        for name in ("anna", "ann", "annabel", "bob"):
+            CustomUser.objects.create_user(
+                username=name, password="pass", role="journalist"
+            )
+        CustomUser.objects.create_user(username="anne", password="pass", role="reader")
+        self.publisher = Publisher.objects.create(name="Tech Daily")
+        self.client.login(username="editor", password="editorpass")
+
+    # Results are role-filtered, ranked with the exact match first and paged
+    @override_settings(LOOKUP_PAGE_SIZE=2)
+    def test_lookup_ranks_and_pages(self):
+        url = reverse("user-lookup")
+        data = self.client.get(url, {"role": "journalist", "q": "ann"}).json()
+        self.assertEqual([item["text"] for item in data["results"]], ["ann", "anna"])
+        self.assertTrue(data["has_more"])
+
+        data = self.client.get(url, {"role": "journalist", "q": "ann", "page": 2})
+        self.assertEqual([item["text"] for item in data.json()["results"]], ["annabel"])
+
+    # The form lists only current members and saves only the changes
+    def test_form_renders_members_and_saves_delta(self):
+        from .forms import PublisherForm
+
+        anna = CustomUser.objects.get(username="anna")
+        bob = CustomUser.objects.get(username="bob")
+        self.publisher.journalists.add(anna)
+
+        response = self.client.get(
+            reverse("publisher-update", args=[self.publisher.pk])
+        )
+        self.assertContains(response, "anna")
+        self.assertNotContains(response, "annabel")
+
+        form = PublisherForm(
+            {"name": "Tech Daily", "journalists": [bob.pk], "editors": []},
+            instance=self.publisher,
+        )
+        self.assertTrue(form.is_valid())
+        form.save()
+        self.assertEqual(list(self.publisher.journalists.all()), [bob])
+
+
+@override_settings(ARTICLE_VIEW_FLUSH_INTERVAL=0)
+class ArticleViewCountTest(TestCase):
+    def setUp(self):
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.article = Article.objects.create(
+            title="Popular", content="Body", author=self.journalist, approved=True
+        )
+
+    # Reads stay in memory until flushed, then land in one batched write
+    def test_reads_are_buffered_and_flushed(self):
+        from .models import ArticleViewCount
+        from .view_counts import buffer
+
+        self.client.login(username="reader", password="readerpass")
+        url = reverse("article-detail", args=[self.article.pk])
+        for _ in range(3):
+            self.client.get(url)
+        self.assertFalse(ArticleViewCount.objects.exists())
+
+        buffer.flush()
+        self.client.get(url)
+        buffer.flush()
+        self.assertEqual(ArticleViewCount.objects.get(pk=self.article.pk).views, 4)
+
+    # Missing, refused and pending articles are not counted as reads
+    def test_only_served_approved_articles_are_counted(self):
+        from .view_counts import buffer
+
+        pending = Article.objects.create(
+            title="Pending", content="Body", author=self.journalist
+        )
+        self.client.get(reverse("article-detail", args=[pending.pk]))
+        self.client.get(reverse("article-detail", args=[self.article.pk + 100]))
+        self.client.login(username="reader", password="readerpass")
+        self.client.get(reverse("article-detail", args=[pending.pk]))
+        self.client.login(username="journalist", password="journalistpass")
+        self.client.get(reverse("article-detail", args=[pending.pk]))
+        self.assertEqual(buffer.buffered(pending.pk), 0)
+        self.assertEqual(buffer.buffered(self.article.pk + 100), 0)
+
+        self.client.get(reverse("article-detail", args=[self.article.pk]))
+        self.assertEqual(buffer.buffered(self.article.pk), 1)
+        buffer.flush()
+
+    # Totals are exposed through the API
+    def test_view_count_api(self):
+        from .view_counts import buffer
+
+        buffer.record(self.article.pk)
+        buffer.record(self.article.pk)
+        buffer.flush()
+        buffer.record(self.article.pk)
+
+        token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "reader", "password": "readerpass"},
+        ).json()["access"]
+        response = self.client.get(
+            reverse("article-views", args=[self.article.pk]),
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.json(), {"article": self.article.pk, "views": 3})
+        buffer.flush()
+
+
+class TrendingTest(TestCase):
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.publisher = Publisher.objects.create(name="Daily")
+        self.first = Article.objects.create(
+            title="First", content="Body", author=self.journalist, approved=True
+        )
+        self.second = Article.objects.create(
+            title="Second",
+            content="Body",
+            author=self.journalist,
+            publisher=self.publisher,
+            approved=True,
+        )
+
+    # Only articles read since the last run are rescored
+    def test_incremental_update_and_ranking(self):
+        from .trending import trending_entries, update_trending
+        from .view_counts import write_counts
+
+        write_counts({self.first.pk: 50, self.second.pk: 10})
+        self.assertEqual(update_trending(), {"added": 2, "updated": 0})
+        ranked = [entry.article for entry in trending_entries()]
+        self.assertEqual(ranked, [self.first, self.second])
+
+        write_counts({self.second.pk: 100})
+        self.assertEqual(update_trending(), {"added": 0, "updated": 1})
+        ranked = [entry.article for entry in trending_entries()]
+        self.assertEqual(ranked, [self.second, self.first])
+        self.assertEqual(
+            [e.article for e in trending_entries(publisher=self.publisher)],
+            [self.second],
+        )
+
+    # After the first run, only view counts flushed since are read
+    def test_reads_recent_view_counts(self):
+        from datetime import timedelta
+
+        from django.db.models import F
+        from django.utils import timezone
+        from .models import ArticleViewCount
+        from .trending import update_trending
+        from .view_counts import write_counts
+
+        write_counts({self.first.pk: 5, self.second.pk: 5})
+        update_trending()
+        ArticleViewCount.objects.filter(pk=self.first.pk).update(
+            views=F("views") + 5, updated_at=timezone.now() - timedelta(days=1)
+        )
+        write_counts({self.second.pk: 5})
+        self.assertEqual(update_trending(), {"added": 0, "updated": 1})
+
+    # Unapproved articles leave the ranking
+    def test_unapproved_article_is_dropped(self):
+        from .models import TrendingEntry
+        from .trending import update_trending
+
+        update_trending()
+        self.first.approved = False
+        self.first.save()
+        self.assertFalse(TrendingEntry.objects.filter(article=self.first).exists())
+
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Trending now")
+        self.assertContains(response, "Second")
+        self.assertNotContains(response, "First")
+
+
+class RelatedArticlesTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            RELATED_INDEX_PATH=os.path.join(self.directory.name, "index.npz"),
+            PRERENDERED_ARTICLES_DIR=self.directory.name,
+            RELATED_ARTICLES_COUNT=2,
+        )
+        self.settings_override.enable()
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        texts = [
+            ("Election results", "Voters count ballots in the national election"),
+            ("Election turnout", "Turnout rose as voters cast election ballots"),
+            ("Football final", "The striker scored twice in the cup final"),
+            ("Cup final preview", "Both teams meet in the football cup final"),
+        ]
+        self.articles = [
+            Article.objects.create(
+                title=title, content=content, author=self.journalist, approved=True
+            )
+            for title, content in texts
+        ]
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    # Neighbours come from the precomputed table
+    def test_rebuild_finds_similar_articles(self):
+        from .related import rebuild, related_articles
+
+        self.assertEqual(rebuild(), {article.pk for article in self.articles})
+        self.assertEqual(rebuild(), set())
+        election, turnout, football, preview = self.articles
+        self.assertEqual(related_articles(election), [turnout])
+        self.assertEqual(related_articles(preview), [football])
+
+        self.client.login(username="journalist", password="journalistpass")
+        response = self.client.get(reverse("article-detail", args=[football.pk]))
+        self.assertContains(response, "Related articles")
+        self.assertContains(response, "Cup final preview")
+
+    # Approving an article queues it; the command adds it to its
+    # neighbours' lists
+    def test_approval_refreshes_incrementally(self):
+        from django.core.management import call_command
+        from .related import rebuild, related_articles
+
+        rebuild()
+        election, turnout, _, _ = self.articles
+        recount = Article.objects.create(
+            title="Election recount",
+            content="Ballots from the national election are counted again",
+            author=self.journalist,
+        )
+        recount.approved = True
+        recount.save()
+        self.assertEqual(related_articles(recount), [])
+
+        call_command("rebuild_related", "--pending", stdout=open(os.devnull, "w"))
+        self.assertEqual(set(related_articles(recount)), {election, turnout})
+        self.assertIn(recount, related_articles(election))
+
+    # An edit takes the article out of lists it no longer belongs in, and
+    # the pages of the changed lists are rendered again
+    def test_edit_leaves_old_neighbours(self):
+        from django.core.management import call_command
+        from .prerender import article_paths
+        from .related import related_articles
+
+        call_command("rebuild_related", stdout=open(os.devnull, "w"))
+        election, turnout, football, preview = self.articles
+        self.assertTrue(article_paths(turnout.pk)[0].exists())
+        self.assertIn(election, related_articles(turnout))
+
+        election.title = "Cup final replay"
+        election.content = "The striker and both teams meet again in the final"
+        election.save()
+        call_command("rebuild_related", "--pending", stdout=open(os.devnull, "w"))
+        self.assertNotIn(election, related_articles(turnout))
+        self.assertIn(football, related_articles(election))
+
+
+class DuplicateDetectionTest(TestCase):
+    WIRE_COPY = (
+        "The central bank raised interest rates by a quarter point on Tuesday, "
+        "citing persistent inflation in housing and services, and signalled "
+        "that further increases were possible if price growth did not slow "
+        "over the coming months according to officials familiar with the talks"
+    )
+
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.editor = CustomUser.objects.create_user(
+            username="editor", password="editorpass", role="editor"
+        )
+        self.original = Article.objects.create(
+            title="Rates rise", content=self.WIRE_COPY, author=self.journalist
+        )
+        Article.objects.create(
+            title="Local election",
+            content="Voters in the county chose a new mayor on Sunday",
+            author=self.journalist,
+        )
+
+    # Resubmitted copy is flagged to the journalist and in the pending queue
+    def test_near_duplicate_is_flagged(self):
+        self.client.login(username="journalist", password="journalistpass")
+        response = self.client.post(
+            reverse("article-create"),
+            {"title": "Rates rise", "content": self.WIRE_COPY + " on Tuesday."},
+            follow=True,
+        )
+        self.assertContains(response, "near-duplicate of &#x27;Rates rise&#x27;")
+
+        self.client.login(username="editor", password="editorpass")
+        response = self.client.get(reverse("editor-pending-articles"))
+        self.assertContains(response, "Possible duplicate of", count=2)
+
+    # Unrelated text does not collide
+    def test_distinct_articles_are_not_flagged(self):
+        from .duplicates import find_duplicates
+
+        results = find_duplicates(Article.objects.all())
+        self.assertEqual(results, {pk: [] for pk in results})
+
+    # Texts too short to sign are not indexed, so they can't all collide
+    def test_short_texts_are_not_indexed(self):
+        from .duplicates import find_duplicates
+        from .models import ArticleSignature
+
+        short = [
+            Article.objects.create(title="Update", content=text, author=self.journalist)
+            for text in ("TBC", "See above")
+        ]
+        self.assertFalse(ArticleSignature.objects.filter(article__in=short).exists())
+        self.assertEqual(find_duplicates(short), {article.pk: [] for article in short})
+
+
+class ThrottleTest(TestCase):
+    RATES = {"articles.reader": "2/min", "articles.journalist": "3/min"}
+
+    def setUp(self):
+        cache.clear()
+        for role in ("reader", "journalist"):
+            CustomUser.objects.create_user(
+                username=role, password=f"{role}pass", role=role
+            )
+
+    def get(self, username, url):
+        token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": username, "password": f"{username}pass"},
+        ).json()["access"]
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    # Each role has its own limit and rejected clients are told when to retry
+    def test_limits_per_role(self):
+        rest_framework = dict(
+            settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=self.RATES
+        )
+        url = reverse("trending-articles")
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            statuses = [self.get("reader", url).status_code for _ in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+            response = self.get("reader", url)
+            self.assertEqual(response.status_code, 429)
+            self.assertTrue(1 <= int(response["Retry-After"]) <= 120)
+
+            statuses = [self.get("journalist", url).status_code for _ in range(4)]
+            self.assertEqual(statuses, [200, 200, 200, 429])
+
+    # A zero rate blocks the role until the window ends
+    def test_zero_rate(self):
+        rest_framework = dict(
+            settings.REST_FRAMEWORK,
+            DEFAULT_THROTTLE_RATES={"articles.reader": "0/min"},
+        )
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            response = self.get("reader", reverse("trending-articles"))
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response["Retry-After"]) <= 60)
+
+
+class RoleClaimTokenTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.article = Article.objects.create(
+            title="Story", content="Body", author=self.user, approved=True
+        )
+        tokens = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "reader", "password": "readerpass"},
+        ).json()
+        self.access, self.refresh = tokens["access"], tokens["refresh"]
+
+    def get(self, url, token):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    # With a shared cache the role is cached, so no user query is made
+    def test_role_checks_skip_user_query(self):
+        url = reverse("article-views", args=[self.article.pk])
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory,
+                }
+            }
+            with override_settings(CACHES=shared):
+                self.assertEqual(self.get(url, self.access).status_code, 200)
+                with self.assertNumQueries(2):
+                    response = self.get(url, self.access)
+        self.assertEqual(response.status_code, 200)
+
+    # A per-process cache keeps roles only briefly: a change this worker
+    # was not told about revokes the token once the copy expires
+    def test_local_cache_expires_role(self):
+        url = reverse("article-views", args=[self.article.pk])
+        self.assertEqual(self.get(url, self.access).status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get(url, self.access).status_code, 200)
+        CustomUser.objects.filter(pk=self.user.pk).update(role="journalist")
+        self.assertEqual(self.get(url, self.access).status_code, 200)
+        cache.delete(f"jwt-role:{self.user.pk}")
+        self.assertEqual(self.get(url, self.access).status_code, 401)
+
+    # Changing the role revokes access and refresh tokens
+    def test_role_change_revokes_tokens(self):
+        url = reverse("article-views", args=[self.article.pk])
+        self.user.role = "journalist"
+        self.user.save()
+
+        self.assertEqual(self.get(url, self.access).status_code, 401)
+        response = self.client.post(reverse("token_refresh"), {"refresh": self.refresh})
+        self.assertEqual(response.status_code, 401)
+
+        access = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "reader", "password": "readerpass"},
+        ).json()["access"]
+        self.assertEqual(self.get(url, access).status_code, 200)
+
+
+class PartnerHandler(BaseHTTPRequestHandler):
+    """
+    A webhook receiver: records requests and answers 204, or for paths
+    ending in ``/slow`` trickles its status line a byte at a time until
+    the client gives up or the test ends.
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        partner = self.server.partner
+        if self.path.endswith("/slow"):
+            with partner.lock:
+                partner.slow_in_flight += 1
+            try:
+                while not partner.released.wait(0.2):
+                    self.wfile.write(b"H")
+                    self.wfile.flush()
+            except OSError:
+                pass
+            finally:
+                with partner.lock:
+                    partner.slow_in_flight -= 1
+            return
+        with partner.lock:
+            partner.received.append((self.path, self.headers, body))
+            partner.fast_during_slow.append(partner.slow_in_flight)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class Partner:
+    """A threaded HTTP server on localhost standing in for partners."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.received = []
+        self.fast_during_slow = []
+        self.slow_in_flight = 0
+        self.released = threading.Event()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PartnerHandler)
+        self.server.daemon_threads = True
+        self.server.partner = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def stop(self):
+        self.released.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(WEBHOOK_TIMEOUT=1, WEBHOOK_RETRY_DELAY=60)
+class WebhookTest(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            PRERENDERED_ARTICLES_DIR=directory.name,
+            RELATED_INDEX_PATH=os.path.join(directory.name, "index.npz"),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.partner = Partner()
+        self.addCleanup(self.partner.stop)
+
+        author = CustomUser.objects.create_user(
+            username="writer", password="writerpass", role="journalist"
+        )
+        publisher = Publisher.objects.create(name="Daily")
+        self.fast = WebhookEndpoint.objects.create(
+            publisher=publisher, url=self.partner.url("/")
+        )
+        self.slow = WebhookEndpoint.objects.create(
+            publisher=publisher, url=self.partner.url("/slow")
+        )
+        self.article = Article.objects.create(
+            title="Story", content="Body", author=author, publisher=publisher
+        )
+
+    def approve(self):
+        self.article.approved = True
+        self.article.save()
+        self.assertTrue(dispatcher.join(timeout=5))
+
+    # Approval sends a signed payload; a partner trickling its response is
+    # cut off at the deadline and retried
+    def test_approval_delivers_signed_payload(self):
+        start = time.monotonic()
+        self.approve()
+        self.assertLess(time.monotonic() - start, 3)
+
+        [(path, headers, body)] = self.partner.received
+        self.assertEqual(path, "/")
+        self.assertEqual(headers["X-News-Event"], "article.approved")
+        self.assertEqual(
+            headers["X-News-Signature"],
+            sign(self.fast.secret, headers["X-News-Timestamp"], body),
+        )
+        self.assertEqual(json.loads(body)["article"]["id"], self.article.pk)
+
+        delivered = WebhookDelivery.objects.get(endpoint=self.fast)
+        self.assertEqual(delivered.status, WebhookDelivery.DELIVERED)
+        retry = WebhookDelivery.objects.get(endpoint=self.slow)
+        self.assertEqual(retry.status, WebhookDelivery.PENDING)
+        self.assertEqual(retry.attempts, 1)
+        self.assertIn("Timeout", retry.last_error)
+
+    # A slow partner holds one worker; deliveries to the others go out
+    # while it is still being waited on
+    def test_slow_partner_does_not_delay_others(self):
+        slow = WebhookDelivery.objects.create(
+            endpoint=self.slow, event="article.approved", body="{}"
+        )
+        dispatcher.submit([slow.pk])
+        for _ in range(50):
+            if self.partner.slow_in_flight:
+                break
+            time.sleep(0.01)
+
+        start = time.time()
+        fast = WebhookDelivery.objects.create(
+            endpoint=self.fast, event="article.approved", body="{}"
+        )
+        dispatcher.submit([fast.pk])
+        self.assertTrue(dispatcher.join(timeout=5))
+
+        self.assertEqual(self.partner.fast_during_slow, [1])
+        fast.refresh_from_db()
+        self.assertEqual(fast.status, WebhookDelivery.DELIVERED)
+        self.assertLess(fast.delivered_at.timestamp(), start + 0.5)
+
+    # Edits of approved articles are sent too; failures end up dead-lettered
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=1)
+    def test_update_event_and_dead_letter(self):
+        self.approve()
+        self.article.title = "Story, updated"
+        self.article.save()
+        self.assertTrue(dispatcher.join(timeout=5))
+
+        events = [json.loads(body)["event"] for _, _, body in self.partner.received]
+        self.assertEqual(events, ["article.approved", "article.updated"])
+        self.assertEqual(
+            WebhookDelivery.objects.filter(
+                endpoint=self.slow, status=WebhookDelivery.DEAD
+            ).count(),
+            2,
+        )
+
+
+class FeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(
+            username="writer", password="writerpass", role="journalist"
+        )
+        self.publisher = Publisher.objects.create(name="Daily")
+        self.other = Publisher.objects.create(name="Weekly")
+        Article.objects.create(
+            title="First story",
+            content="Body",
+            author=self.author,
+            publisher=self.publisher,
+            approved=True,
+        )
+
+    # With a shared cache, repeated and conditional polls skip the database
+    def test_polls_skip_database(self):
+        url = reverse("article-feed-atom")
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory,
+                }
+            }
+            with override_settings(CACHES=shared):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("application/atom+xml", response["Content-Type"])
+                self.assertContains(response, "First story")
+
+                with self.assertNumQueries(0):
+                    cached = self.client.get(url)
+                    conditional = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response["ETag"]
+                    )
+                self.assertEqual(cached.content, response.content)
+                self.assertEqual(conditional.status_code, 304)
+
+        # A worker with a cache of its own reads the stamp and agrees on the
+        # ETag
+        with self.assertNumQueries(1):
+            conditional = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(conditional.status_code, 304)
+
+    # Approving an article refreshes only the feeds that show it
+    def test_approval_invalidates_feeds(self):
+        feeds = [
+            reverse("article-feed"),
+            reverse("publisher-feed", args=[self.publisher.pk]),
+            reverse("journalist-feed", args=[self.author.pk]),
+        ]
+        other_feed = reverse("publisher-feed", args=[self.other.pk])
+        etags = {url: self.client.get(url)["ETag"] for url in feeds + [other_feed]}
+
+        article = Article.objects.create(
+            title="Second story",
+            content="Body",
+            author=self.author,
+            publisher=self.publisher,
+        )
+        article.approved = True
+        article.save()
+
+        for url in feeds:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertContains(response, "Second story")
+        response = self.client.get(other_feed, HTTP_IF_NONE_MATCH=etags[other_feed])
+        self.assertEqual(response.status_code, 304)
+
+    # Renaming a journalist refreshes every feed that shows their name
+    def test_rename_invalidates_feeds(self):
+        feeds = [
+            reverse("article-feed"),
+            reverse("publisher-feed", args=[self.publisher.pk]),
+            reverse("journalist-feed", args=[self.author.pk]),
+        ]
+        etags = {url: self.client.get(url)["ETag"] for url in feeds}
+
+        self.author.username = "renamed"
+        self.author.save(update_fields=["username"])
+
+        for url in feeds:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertContains(response, "renamed")
+
+
+class ArticleEventsTest(TestCase):
+    def setUp(self):
+        from . import events
+
+        events._broker = None
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PRERENDERED_ARTICLES_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.followed = CustomUser.objects.create_user(
+            username="followed", password="writerpass", role="journalist"
+        )
+        self.other = CustomUser.objects.create_user(
+            username="other", password="writerpass", role="journalist"
+        )
+        self.reader.subscriptions_journalists.add(self.followed)
+
+    async def open_stream(self, last_event_id=None):
+        await self.async_client.aforce_login(self.reader)
+        headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+        response = await self.async_client.get(
+            reverse("article-events"), headers=headers
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return aiter(response.streaming_content)
+
+    async def next_chunk(self, stream):
+        return (await asyncio.wait_for(anext(stream), 2)).decode()
+
+    def approve(self, author, title):
+        article = Article.objects.create(title=title, content="Body", author=author)
+        article.approved = True
+        with self.captureOnCommitCallbacks(execute=True):
+            article.save()
+
+    # Only approvals from followed journalists reach the stream
+    async def test_streams_followed_approvals(self):
+        stream = await self.open_stream()
+        self.assertEqual(await self.next_chunk(stream), "retry: 5000\n\n")
+
+        await sync_to_async(self.approve)(self.other, "Elsewhere")
+        await sync_to_async(self.approve)(self.followed, "Followed story")
+        chunk = await self.next_chunk(stream)
+        self.assertIn("event: article\n", chunk)
+        self.assertIn('"title":"Followed story"', chunk)
+        await stream.aclose()
+
+    # Reconnecting clients get what they missed, or a resync when it is gone
+    async def test_resume_from_last_event_id(self):
+        from .events import broker
+
+        data = {"id": 1, "title": "Story", "author": self.followed.pk}
+        broker().publish("article", {**data, "publisher": None})
+        first = broker().events[-1][0]
+        broker().publish("article", {**data, "id": 2, "publisher": None})
+
+        stream = await self.open_stream(str(first))
+        await self.next_chunk(stream)
+        self.assertIn('"id":2', await self.next_chunk(stream))
+        await stream.aclose()
+
+        # The resync carries the newest ID, so the next reconnect resumes
+        stream = await self.open_stream("1")
+        await self.next_chunk(stream)
+        resync = await self.next_chunk(stream)
+        self.assertIn("event: resync\n", resync)
+        self.assertTrue(resync.startswith(f"id: {broker().events[-1][0]}\n"))
+        await stream.aclose()
+
+
+class ArticleRevisionTest(TestCase):
+    def setUp(self):
+        self.editor = CustomUser.objects.create_user(
+            username="editor", password="editorpass", role="editor"
+        )
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.article = Article.objects.create(
+            title="Story", content="The first draft of the story.", author=self.editor
+        )
+
+    # Every version rebuilds exactly from snapshots and deltas
+    @override_settings(REVISION_SNAPSHOT_INTERVAL=3)
+    def test_rebuild_every_version(self):
+        from .models import ArticleRevision
+        from .revisions import revision
+
+        texts = {self.article.version: self.article.content}
+        for number in range(7):
+            self.article.content += f" Paragraph {number} was added."
+            self.article.save()
+            texts[self.article.version] = self.article.content
+        # Saves that leave the text alone are not recorded
+        self.article.approved = True
+        self.article.save()
+
+        revisions = ArticleRevision.objects.filter(article=self.article)
+        self.assertEqual(revisions.count(), 8)
+        self.assertEqual(revisions.filter(snapshot=True).count(), 3)
+        for version, content in texts.items():
+            self.assertEqual(revision(self.article.pk, version)[2], content)
+        self.assertEqual(revision(self.article.pk)[0], max(texts))
+
+    # Editors see what changed between two versions; readers are turned away
+    def test_history_shows_changes(self):
+        self.article.content = "The final version of the story."
+        self.article.save()
+        url = reverse("article-history", args=[self.article.pk])
+
+        self.client.login(username="reader", password="readerpass")
+        self.assertRedirects(self.client.get(url), reverse("article-list"))
+
+        self.client.login(username="editor", password="editorpass")
+        response = self.client.get(url, {"from": 1, "to": 2})
+        self.assertContains(response, '<del class="text-danger">first draft </del>')
+        self.assertContains(response, '<ins class="text-success">final version </ins>')
+
+
+@override_settings(ARTICLE_VIEW_FLUSH_INTERVAL=0)
+class ArchiveTest(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from .models import ArticleViewCount, Newsletter
+
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.old, recent, pending, featured = (
+            Article.objects.create(
+                title=title, content="Body", author=self.journalist, approved=approved
+            )
+            for title, approved in (
+                ("Old", True),
+                ("Recent", True),
+                ("Pending", False),
+                ("Featured", True),
+            )
+        )
+        long_ago = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS + 1)
+        Article.objects.exclude(pk=recent.pk).update(created_at=long_ago)
+        ArticleViewCount.objects.create(article=self.old, views=7)
+        newsletter = Newsletter.objects.create(
+            title="Weekly", description="Picks", author=self.journalist
+        )
+        newsletter.articles.add(featured)
+
+    # Only old approved articles outside newsletters move, with their data
+    def test_archive_moves_old_articles(self):
+        from .archive import archive_articles
+        from .models import ArchivedArticle, ArticleRevision
+
+        self.assertEqual(archive_articles(batch_size=1), 1)
+
+        self.assertFalse(Article.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(Article.objects.count(), 3)
+        archived = ArchivedArticle.objects.get(pk=self.old.pk)
+        self.assertEqual((archived.title, archived.views), ("Old", 7))
+        self.assertTrue(ArticleRevision.objects.filter(article_id=self.old.pk).exists())
+        self.journalist.refresh_from_db()
+        self.assertEqual(self.journalist.article_count, 4)
+
+    # Archived articles stay readable on the site and through the API
+    def test_archived_articles_stay_readable(self):
+        from .archive import archive_articles
+        from .view_counts import buffer
+
+        self.addCleanup(buffer.flush)
+
+        archive_articles()
+        self.client.login(username="reader", password="readerpass")
+        response = self.client.get(reverse("article-detail", args=[self.old.pk]))
+        self.assertContains(response, "Old")
+
+        token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "reader", "password": "readerpass"},
+        ).json()["access"]
+        response = self.client.get(
+            reverse("article-views", args=[self.old.pk]),
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.json(), {"article": self.old.pk, "views": 8})
+
+    # Reads buffered before the article moved are added to the archive
+    def test_buffered_reads_follow_archived_article(self):
+        from .archive import archive_articles
+        from .models import ArchivedArticle
+        from .view_counts import buffer
+
+        for _ in range(3):
+            buffer.record(self.old.pk)
+        archive_articles()
+        buffer.flush()
+        self.assertEqual(ArchivedArticle.objects.get(pk=self.old.pk).views, 10)
+
+    # Archived pages survive a rebuild; deleting the archived article
+    # removes its page and uncounts it
+    def test_delete_archived_article(self):
+        from django.core.management import call_command
+
+        from .archive import archive_articles
+        from .models import ArchivedArticle
+        from .prerender import article_paths, write_article
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PRERENDERED_ARTICLES_DIR=directory):
+                write_article(self.old)
+                archive_articles()
+                call_command(
+                    "prerender_articles", workers=1, stdout=open(os.devnull, "w")
+                )
+                html_path, _ = article_paths(self.old.pk)
+                self.assertTrue(html_path.exists())
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    ArchivedArticle.objects.get(pk=self.old.pk).delete()
+                self.assertFalse(html_path.exists())
+        self.journalist.refresh_from_db()
+        self.assertEqual(self.journalist.article_count, 3)
+
+
+class NewsletterArticlePickerTest(TestCase):
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        other = CustomUser.objects.create_user(
+            username="other", password="otherpass", role="journalist"
+        )
+        self.own, self.draft, self.foreign, self.second = (
+            Article.objects.create(
+                title=title, content="Body", author=author, approved=approved
+            )
+            for title, author, approved in (
+                ("Budget news", self.journalist, True),
+                ("Budget draft", self.journalist, False),
+                ("Budget elsewhere", other, True),
+                ("Weather", self.journalist, True),
+            )
+        )
+        self.client.login(username="journalist", password="journalistpass")
+
+    # Journalists find only approved articles they may include
+    def test_lookup_offers_allowed_articles(self):
+        data = self.client.get(reverse("article-lookup"), {"q": "budget"}).json()
+        self.assertEqual([item["id"] for item in data["results"]], [self.own.pk])
+        self.assertFalse(data["has_more"])
+        # Titles are matched by prefix
+        data = self.client.get(reverse("article-lookup"), {"q": "news"}).json()
+        self.assertEqual(data["results"], [])
+
+    # The form lists only chosen articles and saves only the changes
+    def test_form_renders_selection_and_saves_delta(self):
+        from .forms import NewsletterForm
+        from .models import Newsletter
+
+        newsletter = Newsletter.objects.create(
+            title="Weekly", description="Picks", author=self.journalist
+        )
+        newsletter.articles.add(self.own)
+        response = self.client.get(reverse("newsletter-update", args=[newsletter.pk]))
+        self.assertContains(response, "Budget news")
+        self.assertNotContains(response, "Weather")
+
+        data = {"title": "Weekly", "description": "Picks"}
+        form = NewsletterForm(
+            {**data, "articles": [self.draft.pk]},
+            instance=newsletter,
+            user=self.journalist,
+        )
+        self.assertFalse(form.is_valid())
+
+        form = NewsletterForm(
+            {**data, "articles": [self.own.pk, self.second.pk]},
+            instance=newsletter,
+            user=self.journalist,
+        )
+        self.assertTrue(form.is_valid())
+        # The newsletter row itself is unchanged and not written
+        with self.assertNumQueries(2):
+            form.save()
+        self.assertEqual(set(newsletter.articles.all()), {self.own, self.second})
+
+
+class NewsletterAPITest(TestCase):
+    def setUp(self):
+        cache.clear()
+        from .models import Newsletter
+
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        self.articles = [
+            Article.objects.create(
+                title=f"Story {i}", content="Body", author=self.journalist
+            )
+            for i in range(3)
+        ]
+        for i in range(5):
+            newsletter = Newsletter.objects.create(
+                title=f"Weekly {i}", description="Picks", author=self.journalist
+            )
+            newsletter.articles.set(self.articles)
+        self.token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "journalist", "password": "journalistpass"},
+        ).json()["access"]
+
+    def get(self, **params):
+        return self.client.get(
+            reverse("api-newsletter-list"),
+            params,
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    # Expanded pages take the same queries whatever their size
+    @override_settings(NEWSLETTER_PAGE_SIZE=2)
+    def test_expanded_pages_use_fixed_queries(self):
+        data = self.get().json()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(data["results"][0]["title"], "Weekly 4")
+        self.assertEqual(
+            data["results"][0]["articles"], [article.pk for article in self.articles]
+        )
+
+        # The stored count, the page and its articles; the role comes from
+        # the cache
+        with self.assertNumQueries(3) as queries:
+            small = self.get(expand="articles").json()
+        self.assertNotIn("COUNT(", " ".join(q["sql"] for q in queries.captured_queries))
+        with self.assertNumQueries(3):
+            large = self.get(expand="articles", page_size=5).json()
+        self.assertEqual(len(large["results"]), 5)
+        summary = small["results"][0]["articles"][0]
+        self.assertEqual(summary["title"], "Story 0")
+        self.assertEqual(summary["author_username"], "journalist")
+
+
+class DirtyFieldsTest(TestCase):
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username="journalist", password="journalistpass", role="journalist"
+        )
+        Article.objects.create(title="Story", content="Body", author=self.journalist)
+
+    # Approval writes only the changed columns and keeps counters right
+    def test_save_writes_changed_columns(self):
+        from django.db import connection
+        from django.db.models.signals import post_save
+        from django.test.utils import CaptureQueriesContext
+        from .models import Counter
+
+        article = Article.objects.get()
+        seen = []
+
+        def receiver(sender, update_fields, **kwargs):
+            seen.append(update_fields)
+
+        post_save.connect(receiver, sender=Article)
+        self.addCleanup(post_save.disconnect, receiver, sender=Article)
+
+        article.approved = True
+        with CaptureQueriesContext(connection) as queries:
+            article.save()
+        self.assertEqual(seen, [{"approved", "version"}])
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertIn('UPDATE "news_article"', updates[0])
+        self.assertNotIn('"content"', updates[0])
+        self.assertFalse(
+            [
+                q
+                for q in queries
+                if 'FROM "news_article"' in q["sql"] and '"approved"' in q["sql"]
+            ],
+            "stored values were looked up again",
+        )
+        self.assertEqual(Counter.objects.get(name=Counter.PENDING_ARTICLES).value, 0)
+
+    # Saves from copies loaded at the same time take consecutive versions
+    def test_concurrent_saves_take_new_versions(self):
+        from .models import ArticleRevision
+
+        approval, edit = Article.objects.get(), Article.objects.get()
+        approval.approved = True
+        approval.save()
+        edit.content = "Edited body"
+        edit.save()
+        self.assertEqual((approval.version, edit.version), (2, 3))
+        self.assertEqual(Article.objects.get().version, 3)
+        self.assertEqual(
+            list(ArticleRevision.objects.values_list("version", flat=True)), [1, 3]
+        )
+
+    # Saving an unchanged article does nothing
+    def test_unchanged_save_is_skipped(self):
+        article = Article.objects.get()
+        with self.assertNumQueries(0):
+            article.save()
+        self.assertEqual(article.version, 1)
+
+        article.refresh_from_db()
+        article.title = "Renamed"
+        article.save()
+        self.assertEqual(Article.objects.get().version, 2)
+        self.assertEqual(article.changed_fields(), [])
+
+
+class BulkSubscriptionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.journalists = [
+            CustomUser.objects.create_user(
+                username=f"journalist{i}", password="pass", role="journalist"
+            )
+            for i in range(3)
+        ]
+        self.publisher = Publisher.objects.create(name="Daily")
+        self.token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "reader", "password": "readerpass"},
+        ).json()["access"]
+
+    def send(self, method, **data):
+        return getattr(self.client, method)(
+            reverse("bulk-subscriptions"),
+            data,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    # Bulk changes are idempotent, keep follower counts and check roles
+    def test_bulk_endpoint(self):
+        ids = [journalist.pk for journalist in self.journalists]
+        for _ in range(2):
+            response = self.send(
+                "post", journalists=ids[:2], publishers=[self.publisher.pk]
+            )
+            self.assertEqual(
+                response.json(),
+                {"journalists": ids[:2], "publishers": [self.publisher.pk]},
+            )
+        self.assertEqual(CustomUser.objects.get(pk=ids[0]).follower_count, 1)
+
+        response = self.send("put", journalists=ids[1:])
+        self.assertEqual(response.json(), {"journalists": ids[1:], "publishers": []})
+        self.assertEqual(CustomUser.objects.get(pk=ids[0]).follower_count, 0)
+        self.assertEqual(Publisher.objects.get().follower_count, 0)
+
+        response = self.send("delete", journalists=ids)
+        self.assertEqual(response.json(), {"journalists": [], "publishers": []})
+
+        response = self.send("post", journalists=[ids[0], self.reader.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.reader.pk), response.json()["journalists"][0])
+        self.assertFalse(self.reader.subscriptions_journalists.exists())
+
+    # The import command adds, or with --replace sets, subscriptions
+    def test_import_command(self):
+        from django.core.management import call_command
+
+        self.reader.subscriptions_journalists.add(self.journalists[2])
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write("username,journalists,publishers\n")
+            handle.write(f"reader,journalist0;journalist1;nobody,{self.publisher.pk}\n")
+            handle.write("ghost,journalist0,\n")
+        self.addCleanup(os.remove, handle.name)
+
+        call_command("import_subscriptions", handle.name, stdout=open(os.devnull, "w"))
+        self.assertEqual(self.reader.subscriptions_journalists.count(), 3)
+
+        call_command(
+            "import_subscriptions",
+            handle.name,
+            "--replace",
+            stdout=open(os.devnull, "w"),
+        )
+        self.assertEqual(
+            set(self.reader.subscriptions_journalists.all()), set(self.journalists[:2])
+        )
+        self.assertEqual(
+            CustomUser.objects.get(pk=self.journalists[2].pk).follower_count, 0
+        )
+        self.assertEqual(Publisher.objects.get().follower_count, 1)
+
+
+class MostFollowedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(
+            username="reader", password="readerpass", role="reader"
+        )
+        self.quiet, self.popular = (
+            CustomUser.objects.create_user(
+                username=name, password="pass", role="journalist"
+            )
+            for name in ("quiet", "popular")
+        )
+        self.publisher = Publisher.objects.create(name="Daily")
+        self.reader.subscriptions_journalists.add(self.popular)
+        self.reader.subscriptions_publishers.add(self.publisher)
+        self.token = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "reader", "password": "readerpass"},
+        ).json()["access"]
+
+    # The ranking reads stored counts, without counting subscriptions
+    def test_ranking_uses_stored_counts(self):
+        url = reverse("most-followed")
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {self.token}"}
+        self.client.get(url, **auth)
+        # One query per ranking; the role comes from the cache
+        with self.assertNumQueries(2) as queries:
+            data = self.client.get(url, {"limit": 1}, **auth).json()
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+        self.assertEqual(
+            data["journalists"],
+            [{"id": self.popular.pk, "username": "popular", "follower_count": 1}],
+        )
+        self.assertEqual(data["publishers"][0]["follower_count"], 1)
+
+    # The subscriptions page shows counts without a query per row
+    def test_subscriptions_page_shows_counts(self):
+        self.client.login(username="reader", password="readerpass")
+        self.client.get(reverse("manage-subscriptions"))
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("manage-subscriptions"))
+        self.assertContains(response, "1 follower", count=2)
+        self.assertContains(response, "0 followers", count=1)
+        self.assertContains(response, "Unsubscribe", count=2)
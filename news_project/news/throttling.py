@@ -0,0 +1,101 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+# Seconds per rate period, by the first letter of the period
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Turn ``"120/min"`` into ``(120, 60)``."""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class RoleRateThrottle(BaseThrottle):
+    """
+    Sliding-window rate limit per client, role and endpoint class.
+
+    Views name their endpoint class with ``throttle_scope`` (``"api"`` by
+    default). The limit is read from ``DEFAULT_THROTTLE_RATES`` under
+    ``"<scope>.<role>"``, falling back to ``"api.<role>"``, where the role
+    is ``anonymous`` for unauthenticated clients. Without a rate the
+    request is not limited.
+
+    Each client uses one integer counter per window in the shared cache,
+    raised with an atomic ``incr``. The request count over the last window
+    length is estimated from the current counter and the previous window's
+    counter, weighted by how much of it still overlaps. This smooths out
+    the bursts a fixed window allows at its edges.
+    """
+
+    cache = cache
+    default_scope = "api"
+
+    def get_rate(self, scope, role):
+        rates = settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {})
+        return rates.get(f"{scope}.{role}") or rates.get(f"{self.default_scope}.{role}")
+
+    def get_role(self, request):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return "anonymous"
+        return user.role
+
+    def get_client(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return f"user{user.pk}"
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", self.default_scope)
+        rate = self.get_rate(scope, self.get_role(request))
+        if rate is None:
+            return True
+        self.limit, self.duration = parse_rate(rate)
+
+        self.now = time.time()
+        window = int(self.now // self.duration)
+        prefix = f"throttle:{scope}:{self.get_client(request)}:"
+        key = f"{prefix}{window}"
+
+        self.current = self._increment(key)
+        self.previous = self.cache.get(f"{prefix}{window - 1}", 0)
+        self.elapsed = self.now - window * self.duration
+        if self._estimate(self.previous, self.current, self.elapsed) <= self.limit:
+            return True
+
+        # Rejected requests don't count against the client
+        self.cache.decr(key)
+        self.current -= 1
+        return False
+
+    def _increment(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Counters outlive the window after theirs, which still reads them
+            if self.cache.add(key, 1, timeout=self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def _estimate(self, previous, current, elapsed):
+        return previous * (1 - elapsed / self.duration) + current
+
+    def wait(self):
+        """Seconds until one more request fits in the window."""
+        previous, current = self.previous, self.current
+        if current + 1 <= self.limit and previous:
+            # Wait for enough of the previous window to slide out
+            overlap = (self.limit - current - 1) / previous
+            return max(0.0, self.duration * (1 - overlap) - self.elapsed)
+        # Wait for the current window to become the previous one
+        remaining = self.duration - self.elapsed
+        if not current:
+            # Nothing of this window to slide out (a limit of zero)
+            return remaining
+        overlap = (self.limit - 1) / current
+        return remaining + self.duration * (1 - overlap)
@@ -0,0 +1,132 @@
+import math
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Article, Counter, TrendingEntry
+
+# Scores are rescaled onto a new landmark once the weights of fresh reads
+# grow past 2 ** RESCALE_AFTER, long before floats lose precision.
+RESCALE_AFTER = 40
+
+# Seconds before the previous run that view counts are read from again,
+# covering flushes that were still committing when it read
+READ_OVERLAP = 300
+
+
+def _rate():
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def weight(timestamp, landmark):
+    """
+    Forward-decay weight of an event at ``timestamp``. Later events weigh
+    exponentially more, so scores never have to be decayed in place: the
+    relative order of ``sum(weight)`` is the order of the decayed scores.
+    """
+    return math.exp(_rate() * (timestamp - landmark))
+
+
+def _lock_landmark(now):
+    """Return the landmark, holding its row until the transaction ends."""
+    counter, _ = Counter.objects.select_for_update().get_or_create(
+        name=Counter.TRENDING_LANDMARK, defaults={"value": int(now)}
+    )
+    return counter
+
+
+def update_trending(now=None, batch_size=500):
+    """
+    Bring the trending table up to date.
+
+    Approved articles without an entry are added with a recency score, and
+    only entries whose article has been read since the last run are
+    rewritten, each gaining its new reads at the current weight. Only view
+    counts flushed since the last run are read. Entries
+    of unapproved articles are removed by a signal when the article is
+    saved.
+
+    Returns a dict with the number of entries ``added`` and ``updated``.
+    """
+    read_at = time.time()
+    now = read_at if now is None else now
+    publish_weight = settings.TRENDING_PUBLISH_WEIGHT
+
+    with transaction.atomic():
+        counter = _lock_landmark(now)
+        landmark = counter.value
+        if _rate() * (now - landmark) > RESCALE_AFTER * math.log(2):
+            TrendingEntry.objects.update(score=F("score") * weight(landmark, now))
+            landmark = counter.value = int(now)
+            counter.save(update_fields=["value"])
+        current = weight(now, landmark)
+
+        new_articles = Article.objects.filter(
+            approved=True, trending__isnull=True
+        ).values_list("pk", "publisher_id", "created_at", "view_counter__views")
+        entries = [
+            TrendingEntry(
+                article_id=pk,
+                publisher_id=publisher_id,
+                score=publish_weight * weight(created_at.timestamp(), landmark)
+                + (views or 0) * current,
+                views_seen=views or 0,
+            )
+            for pk, publisher_id, created_at, views in new_articles.iterator()
+        ]
+        TrendingEntry.objects.bulk_create(
+            entries, batch_size=batch_size, ignore_conflicts=True
+        )
+
+        read = TrendingEntry.objects.filter(
+            article__view_counter__views__gt=F("views_seen")
+        )
+        last_read, created = Counter.objects.get_or_create(
+            name=Counter.TRENDING_READ_AT, defaults={"value": int(read_at)}
+        )
+        if not created:
+            since = datetime.fromtimestamp(last_read.value - READ_OVERLAP, timezone.utc)
+            read = read.filter(article__view_counter__updated_at__gte=since)
+            last_read.value = int(read_at)
+            last_read.save(update_fields=["value"])
+        read = read.annotate(views=F("article__view_counter__views")).only(
+            "pk", "score", "views_seen"
+        )
+        updated = []
+        for entry in read.iterator():
+            entry.score += (entry.views - entry.views_seen) * current
+            entry.views_seen = entry.views
+            updated.append(entry)
+        TrendingEntry.objects.bulk_update(
+            updated, ["score", "views_seen"], batch_size=batch_size
+        )
+
+    return {"added": len(entries), "updated": len(updated)}
+
+
+def trending_entries(publisher=None, limit=None):
+    """
+    Return the top trending entries, overall or for one publisher, with
+    their articles loaded and ``current_score`` set to the decayed score
+    as of now (roughly reads per half-life).
+    """
+    queryset = TrendingEntry.objects.select_related(
+        "article__author", "article__publisher", "article__view_counter"
+    ).order_by("-score")
+    if publisher is not None:
+        queryset = queryset.filter(publisher=publisher)
+    entries = list(queryset[: limit or settings.TRENDING_SIZE])
+
+    landmark = (
+        Counter.objects.filter(name=Counter.TRENDING_LANDMARK)
+        .values_list("value", flat=True)
+        .first()
+    )
+    if entries and landmark is not None:
+        factor = weight(landmark, time.time())
+        for entry in entries:
+            entry.current_score = entry.score * factor
+    return entries
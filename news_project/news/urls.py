@@ -35,6 +35,28 @@ from .views import (
     request_publisher_affiliation,
     publisher_requests_pending,
     approve_publisher_request,
+    bulk_publisher_requests,
+    user_lookup,
+    ArticleViewCountView,
+    TrendingArticlesView,
+    RelatedArticlesView,
+    article_events,
+    article_history,
+    article_lookup,
+    bulk_subscriptions,
+    MostFollowedView,
+    bulk_provision_users,
+)
+from .feeds import (
+    ArticleFeed,
+    AtomArticleFeed,
+    AtomJournalistArticleFeed,
+    AtomPublisherArticleFeed,
+    JournalistArticleFeed,
+    PublisherArticleFeed,
+    cached_feed,
+    journalist_scope,
+    publisher_scope,
 )
 
 urlpatterns = [
@@ -45,10 +67,26 @@ urlpatterns = [
         "login/", auth_views.LoginView.as_view(template_name="login.html"), name="login"
     ),
     path("logout/", auth_views.LogoutView.as_view(next_page="/"), name="logout"),
+    path("users/provision/", bulk_provision_users, name="provision-users"),
     # Articles
     path("articles/", article_list, name="article-list"),
     path("articles/subscribed/", subscribed_articles, name="subscribed-articles"),
+    path(
+        "articles/trending/", TrendingArticlesView.as_view(), name="trending-articles"
+    ),
+    path("articles/events/", article_events, name="article-events"),
     path("articles/<int:pk>/", article_detail, name="article-detail"),
+    path(
+        "articles/<int:pk>/views/",
+        ArticleViewCountView.as_view(),
+        name="article-views",
+    ),
+    path(
+        "articles/<int:pk>/related/",
+        RelatedArticlesView.as_view(),
+        name="article-related",
+    ),
+    path("articles/<int:pk>/history/", article_history, name="article-history"),
     path("articles/create/", ArticleCreateView.as_view(), name="article-create"),
     path(
         "articles/<int:pk>/update/", ArticleUpdateView.as_view(), name="article-update"
@@ -83,6 +121,12 @@ urlpatterns = [
         name="unsubscribe-publisher-html",
     ),
     path("subscriptions/", manage_subscriptions, name="manage-subscriptions"),
+    path("subscriptions/bulk/", bulk_subscriptions, name="bulk-subscriptions"),
+    path(
+        "subscriptions/most-followed/",
+        MostFollowedView.as_view(),
+        name="most-followed",
+    ),
     # Editor
     path(
         "editor/articles/pending/",
@@ -91,6 +135,7 @@ urlpatterns = [
     ),
     # Newsletters
     path("newsletters/", NewsletterListView.as_view(), name="newsletter-list"),
+    path("newsletters/articles/lookup/", article_lookup, name="article-lookup"),
     path(
         "newsletters/create/", NewsletterCreateView.as_view(), name="newsletter-create"
     ),
@@ -126,6 +171,7 @@ urlpatterns = [
         PublisherDeleteView.as_view(),
         name="publisher-delete",
     ),
+    path("publishers/users/lookup/", user_lookup, name="user-lookup"),
     # Publisher affiliation (Journalists)
     path(
         "publishers/request/",
@@ -148,4 +194,36 @@ urlpatterns = [
         approve_publisher_request,
         name="publisher-request-approve",
     ),
+    path(
+        "editor/publisher-requests/bulk/",
+        bulk_publisher_requests,
+        name="publisher-requests-bulk",
+    ),
+    # Syndication feeds
+    path("feeds/articles/rss/", cached_feed(ArticleFeed()), name="article-feed"),
+    path(
+        "feeds/articles/atom/",
+        cached_feed(AtomArticleFeed()),
+        name="article-feed-atom",
+    ),
+    path(
+        "feeds/publishers/<int:pk>/rss/",
+        cached_feed(PublisherArticleFeed(), publisher_scope),
+        name="publisher-feed",
+    ),
+    path(
+        "feeds/publishers/<int:pk>/atom/",
+        cached_feed(AtomPublisherArticleFeed(), publisher_scope),
+        name="publisher-feed-atom",
+    ),
+    path(
+        "feeds/journalists/<int:pk>/rss/",
+        cached_feed(JournalistArticleFeed(), journalist_scope),
+        name="journalist-feed",
+    ),
+    path(
+        "feeds/journalists/<int:pk>/atom/",
+        cached_feed(AtomJournalistArticleFeed(), journalist_scope),
+        name="journalist-feed-atom",
+    ),
 ]
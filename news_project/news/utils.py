@@ -1,5 +1,14 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
 from requests_oauthlib import OAuth1Session
 from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .instrumentation import track
 
 
 class Tweet:
@@ -29,7 +38,8 @@ class Tweet:
         url = "https://api.twitter.com/2/tweets"
         payload = {"text": tweet_text}
 
-        response = self.oauth.post(url, json=payload)
+        with track("tweet"):
+            response = self.oauth.post(url, json=payload)
 
         if response.status_code != 201:
             raise Exception(
@@ -37,3 +47,26 @@ class Tweet:
             )
 
         return response.json()
+
+
+def process_pool(workers=None):
+    """
+    Return a process pool whose workers have Django set up, for spreading
+    CPU-bound work (password hashing, rendering) across cores.
+
+    Workers are spawned rather than forked so they never share the parent's
+    open database connections.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
+
+
+def shared_cache():
+    """
+    Whether the default cache is seen by every worker, so a value dropped
+    from it by one worker is dropped for all.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
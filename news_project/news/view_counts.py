@@ -0,0 +1,136 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter as Tally
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import counters
+from .models import ArchivedArticle, Article, ArticleViewCount
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    """
+    Per-process buffer of article reads.
+
+    ``record()`` only touches memory. A background thread merges the
+    buffered counts into ``ArticleViewCount`` every
+    ``ARTICLE_VIEW_FLUSH_INTERVAL`` seconds, or sooner once
+    ``ARTICLE_VIEW_BUFFER_MAX`` reads are waiting, and the buffer is flushed
+    once more when the process exits. A crashed worker loses at most one
+    interval of reads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Tally()
+        self.pending = 0
+        self.pid = None
+        self.wakeup = threading.Event()
+        atexit.register(self.flush)
+
+    def record(self, article_id):
+        with self.lock:
+            if self.pid != os.getpid():
+                # First read in this process (or in a forked worker)
+                self.pid = os.getpid()
+                self.counts = Tally()
+                self.pending = 0
+                self._start_flusher()
+            self.counts[article_id] += 1
+            self.pending += 1
+            if self.pending >= settings.ARTICLE_VIEW_BUFFER_MAX:
+                self.wakeup.set()
+
+    def buffered(self, article_id):
+        """Reads of an article recorded here but not yet flushed."""
+        with self.lock:
+            return self.counts.get(article_id, 0)
+
+    def _start_flusher(self):
+        if settings.ARTICLE_VIEW_FLUSH_INTERVAL <= 0:
+            return
+        thread = threading.Thread(
+            target=self._run, name="article-view-flusher", daemon=True
+        )
+        thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(settings.ARTICLE_VIEW_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+    def flush(self):
+        """Merge the buffered counts into the database."""
+        with self.lock:
+            counts, self.counts = self.counts, Tally()
+            self.pending = 0
+        if not counts:
+            return
+
+        try:
+            write_counts(counts)
+        except Exception:
+            logger.exception("Could not flush %d article view counts", len(counts))
+            with self.lock:
+                self.counts.update(counts)
+                self.pending += sum(counts.values())
+
+
+def write_counts(counts):
+    """
+    Add ``{article_id: reads}`` to the stored totals: missing rows are
+    inserted in one batch, then totals are raised with one UPDATE per
+    distinct increment, marking the rows as updated for the trending
+    update. Reads of archived articles are added to the archive and reads
+    of deleted articles are dropped.
+    """
+    with transaction.atomic():
+        # Locking the articles waits out an archive batch moving them, so
+        # their reads are added to whichever table holds them afterwards
+        article_ids = set(
+            Article.objects.select_for_update()
+            .filter(pk__in=counts)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        archived = {pk: n for pk, n in counts.items() if pk not in article_ids}
+        ArticleViewCount.objects.bulk_create(
+            [ArticleViewCount(article_id=pk) for pk in article_ids],
+            ignore_conflicts=True,
+        )
+        counters.adjust(
+            ArticleViewCount,
+            "views",
+            {pk: n for pk, n in counts.items() if pk in article_ids},
+            updated_at=timezone.now(),
+        )
+        counters.adjust(ArchivedArticle, "views", archived)
+
+
+buffer = ViewCountBuffer()
+
+
+def record_view(article_id):
+    buffer.record(article_id)
+
+
+def total_views(article):
+    """Stored reads of an article plus those still buffered in this process."""
+    article_id = article.pk
+    if isinstance(article, ArchivedArticle):
+        stored = article.views
+    else:
+        stored = (
+            ArticleViewCount.objects.filter(pk=article_id)
+            .values_list("views", flat=True)
+            .first()
+        )
+    return (stored or 0) + buffer.buffered(article_id)
@@ -1,6 +1,5 @@
-from django.http import HttpResponse
-from django.db.models import Q
-from django.core.mail import send_mail
+from django.http import Http404, HttpResponse, JsonResponse
+from django.db.models import Prefetch, Q
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
@@ -13,27 +12,80 @@ from django.views.generic import (
     DeleteView,
     View,
 )
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.views.decorators.http import require_POST
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
 
+import logging
+
 import requests
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 
 from rest_framework import viewsets, generics, status
-from rest_framework.permissions import IsAuthenticated, BasePermission
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated, BasePermission
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 
-from .models import Article, Newsletter, CustomUser, Publisher, PublisherRequest
-from .serializers import ArticleSerializer, NewsletterSerializer
+from .models import (
+    Article,
+    ArticleRevision,
+    Newsletter,
+    CustomUser,
+    Publisher,
+    PublisherRequest,
+    RelatedArticle,
+)
+from .serializers import (
+    ArticleSerializer,
+    FollowedJournalistSerializer,
+    FollowedPublisherSerializer,
+    NewsletterSerializer,
+    ProvisionSerializer,
+    RelatedArticleSerializer,
+    SubscriptionSetSerializer,
+    TrendingEntrySerializer,
+)
+from .pagination import NewsletterPagination
 from .permissions import IsJournalist, IsEditor, IsReader
-from .forms import CustomUserCreationForm, ArticleForm, PublisherForm
-from .utils import Tweet
+from .authentication import RoleClaimJWTAuthentication
+from .events import followed_ids, stream_events
+from .forms import CustomUserCreationForm, ArticleForm, NewsletterForm, PublisherForm
+from .fragments import render_article_rows
+from .prerender import serve_prerendered
+from .lookups import search_articles, search_users
+from .provisioning import provision_users
+from . import subscriptions
+from .view_counts import record_view, total_views
+from .trending import trending_entries
+from .related import related_articles
+from .duplicates import find_duplicates
+from .revisions import diff_segments, revision
+from .archive import get_article_or_404
+from .affiliations import (
+    affiliated_publisher_ids,
+    approve_requests,
+    reject_requests,
+)
+from .metrics import (
+    ARTICLES_APPROVED,
+    ARTICLES_SUBMITTED,
+    PUBLISHER_REQUESTS,
+    SUBSCRIPTION_CHANGES,
+)
+
+logger = logging.getLogger(__name__)
 
 
 # Home View
 def home(request):
-    return render(request, "home.html")
+    trending = trending_entries(limit=settings.TRENDING_HOME_SIZE)
+    return render(request, "home.html", {"trending": trending})
 
 
 # Register
@@ -93,7 +145,7 @@ def article_list(request):
         request,
         "articles.html",
         {
-            "articles": articles,
+            "rows": render_article_rows(request, articles),
             "mode": mode,
         },
     )
@@ -116,7 +168,15 @@ def subscribed_articles(request):
 
 # Article page
 def article_detail(request, pk):
-    article = get_object_or_404(Article, pk=pk)
+    # Anonymous readers get the pre-rendered page straight from disk; only
+    # approved articles are pre-rendered
+    if not request.user.is_authenticated:
+        response = serve_prerendered(request, pk)
+        if response is not None:
+            record_view(pk)
+            return response
+
+    article = get_article_or_404(pk)
 
     # Unapproved article access control
     if not article.approved:
@@ -129,7 +189,57 @@ def article_detail(request, pk):
         if request.user.role == "journalist" and article.author != request.user:
             return redirect("article-list")
 
-    return render(request, "article_detail.html", {"article": article})
+    # Archived articles drop out of the related-article lists
+    related = related_articles(article) if isinstance(article, Article) else []
+    response = render(
+        request,
+        "article_detail.html",
+        {"article": article, "related": related},
+    )
+    # Reviews of pending articles are not reads
+    if article.approved:
+        record_view(article.pk)
+    return response
+
+
+# Article revision history
+@login_required
+def article_history(request, pk):
+    """
+    List the revisions of an article and, given ``?from=<version>&to=<version>``,
+    show what changed between them. Editors and the article's author only.
+    """
+    article = get_article_or_404(pk)
+    if request.user.role != "editor" and article.author != request.user:
+        return redirect("article-list")
+
+    revisions = list(
+        ArticleRevision.objects.filter(article_id=article.pk)
+        .order_by("-version")
+        .values("version", "title", "size", "snapshot", "created_at")
+    )
+    for older, newer in zip(revisions[1:], revisions):
+        newer["previous"] = older["version"]
+
+    diff = None
+    try:
+        versions = int(request.GET["from"]), int(request.GET["to"])
+    except (KeyError, ValueError):
+        versions = None
+    if versions:
+        old, new = (revision(article.pk, version) for version in versions)
+        if old and new:
+            diff = {
+                "old": old,
+                "new": new,
+                "segments": diff_segments(old[2], new[2]),
+            }
+
+    return render(
+        request,
+        "article_history.html",
+        {"article": article, "revisions": revisions, "diff": diff},
+    )
 
 
 # Article list
@@ -140,9 +250,10 @@ class ArticleListView(generics.ListAPIView):
     Returns approved articles (readers only).
     """
 
-    queryset = Article.objects.filter(approved=True)
+    queryset = Article.objects.filter(approved=True).select_related("view_counter")
     serializer_class = ArticleSerializer
     permission_classes = [IsAuthenticated, IsReader]
+    throttle_scope = "articles"
 
 
 # Subscribed article
@@ -155,26 +266,47 @@ class SubscribedArticleView(generics.ListAPIView):
 
     serializer_class = ArticleSerializer
     permission_classes = [IsAuthenticated, IsReader]
+    throttle_scope = "articles"
 
     def get_queryset(self):
         user = self.request.user
-        return Article.objects.filter(approved=True).filter(
-            Q(author__in=user.subscriptions_journalists.all())
-            | Q(publisher__in=user.subscriptions_publishers.all())
+        return (
+            Article.objects.filter(approved=True)
+            .filter(
+                Q(author__in=user.subscriptions_journalists.all())
+                | Q(publisher__in=user.subscriptions_publishers.all())
+            )
+            .select_related("view_counter")
         )
 
 
+class ArchiveFallbackMixin:
+    """
+    Serves reads of an article that is no longer in the hot table from
+    the archive. Writes to archived articles still get a 404.
+    """
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method not in SAFE_METHODS:
+                raise
+            return get_article_or_404(self.kwargs["pk"], Article.objects.none())
+
+
 # Article detail
-class ArticleDetailView(generics.RetrieveAPIView):
+class ArticleDetailView(ArchiveFallbackMixin, generics.RetrieveAPIView):
     """
     API endpoint:
     GET /api/articles/<id>/
     Retrieve a single approved article.
     """
 
-    queryset = Article.objects.filter(approved=True)
+    queryset = Article.objects.filter(approved=True).select_related("view_counter")
     serializer_class = ArticleSerializer
     permission_classes = [IsAuthenticated, IsReader]
+    throttle_scope = "articles"
 
 
 # Article Create
@@ -197,7 +329,18 @@ class ArticleCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        ARTICLES_SUBMITTED.inc(channel="html")
+        response = super().form_valid(form)
+
+        duplicates = find_duplicates([self.object])[self.object.pk]
+        if duplicates:
+            titles = ", ".join(f"'{article.title}'" for article, _ in duplicates)
+            messages.warning(
+                self.request,
+                f"This article looks like a near-duplicate of {titles}. "
+                "Editors will see it flagged for review.",
+            )
+        return response
 
     def test_func(self):
         return self.request.user.role == "journalist"
@@ -265,6 +408,7 @@ class ArticleApproveViewHTML(View):
         else:
             article.approved = True
             article.save()
+            ARTICLES_APPROVED.inc(channel="html")
             messages.success(
                 request, f"Article '{article.title}' approved successfully."
             )
@@ -300,38 +444,160 @@ class ArticleApproveView(generics.GenericAPIView):
         # Approve the article
         article.approved = True
         article.save()
+        ARTICLES_APPROVED.inc(channel="api")
+
+        # The post_save signal emails subscribers and posts the tweet
+        return Response(
+            {"message": "Article approved and distributed."},
+            status=status.HTTP_200_OK,
+        )
 
-        # Notify subscribers via email
-        recipient_emails = [
-            user.email
-            for user in CustomUser.objects.filter(
-                subscriptions_journalists=article.author
-            )
-            if user.email
-        ]
-
-        if recipient_emails:
-            send_mail(
-                subject=f"New Article Published: {article.title}",
-                message=article.content,
-                from_email="news@app.com",
-                recipient_list=recipient_emails,
-                fail_silently=True,
-            )
 
-        # Post to X/Twitter using OAuth1
+# Article read count (API)
+class ArticleViewCountView(ArchiveFallbackMixin, generics.GenericAPIView):
+    """
+    API endpoint:
+    GET /api/articles/<id>/views/
+    Returns the total number of reads of an approved article.
+    """
+
+    queryset = Article.objects.filter(approved=True)
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "articles"
+
+    def get(self, request, pk):
+        article = self.get_object()
+        return Response({"article": article.pk, "views": total_views(article)})
+
+
+# Related articles (API)
+class RelatedArticlesView(generics.GenericAPIView):
+    """
+    API endpoint:
+    GET /api/articles/<id>/related/
+    Returns the precomputed related articles of an approved article.
+    """
+
+    queryset = Article.objects.filter(approved=True)
+    serializer_class = RelatedArticleSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "articles"
+
+    def get(self, request, pk):
+        article = self.get_object()
+        entries = (
+            RelatedArticle.objects.filter(article=article, related__approved=True)
+            .select_related("related__view_counter")
+            .order_by("-score")[: settings.RELATED_ARTICLES_COUNT]
+        )
+        return Response(self.get_serializer(entries, many=True).data)
+
+
+# Trending articles (API)
+class TrendingArticlesView(generics.GenericAPIView):
+    """
+    API endpoint:
+    GET /api/articles/trending/?publisher=<id>&limit=<n>
+    Returns the top trending approved articles, overall or for one publisher.
+    """
+
+    serializer_class = TrendingEntrySerializer
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "articles"
+
+    def get(self, request):
         try:
-            Tweet().make_tweet(article.title)
-        except Exception:
-            # Don't fail approval just because X failed
-            pass
+            publisher = request.query_params.get("publisher")
+            publisher = int(publisher) if publisher else None
+            limit = int(request.query_params.get("limit", settings.TRENDING_SIZE))
+        except ValueError:
+            return Response(
+                {"error": "publisher and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.TRENDING_SIZE))
+        entries = trending_entries(publisher=publisher, limit=limit)
+        return Response(self.get_serializer(entries, many=True).data)
+
 
+# Most followed journalists and publishers (API)
+class MostFollowedView(generics.GenericAPIView):
+    """
+    API endpoint:
+    GET /api/subscriptions/most-followed/?limit=<n>
+    Returns the journalists and publishers with the most followers.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", settings.MOST_FOLLOWED_SIZE))
+        except ValueError:
+            return Response(
+                {"error": "limit must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.MOST_FOLLOWED_SIZE))
+        journalists = subscriptions.most_followed(subscriptions.JOURNALISTS, limit)
+        publishers = subscriptions.most_followed(subscriptions.PUBLISHERS, limit)
         return Response(
-            {"message": "Article approved and distributed."},
-            status=status.HTTP_200_OK,
+            {
+                "journalists": FollowedJournalistSerializer(
+                    journalists, many=True
+                ).data,
+                "publishers": FollowedPublisherSerializer(publishers, many=True).data,
+            }
         )
 
 
+# New subscribed articles (server-sent events)
+async def article_events(request):
+    """
+    API endpoint:
+    GET /api/articles/events/
+    Streams an ``article`` event whenever an article by a journalist or
+    publisher the reader follows is approved. Clients resume with the
+    ``Last-Event-ID`` header. Needs an ASGI server.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "The event stream is only served over ASGI."}, status=501
+        )
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        try:
+            result = await sync_to_async(RoleClaimJWTAuthentication().authenticate)(
+                request
+            )
+        except APIException as e:
+            return JsonResponse({"detail": str(e.detail)}, status=401)
+        if result is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=401,
+            )
+        user = result[0]
+    if user.role != "reader":
+        return JsonResponse({"error": "Only readers can follow articles."}, status=403)
+
+    last_id = request.headers.get("Last-Event-ID")
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    user_id = user.pk
+
+    async def follows():
+        return await sync_to_async(followed_ids)(user_id)
+
+    response = StreamingHttpResponse(
+        stream_events(last_id, follows), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 class IsEditorOrOwner(BasePermission):
     """
     Custom permission: editors can delete any article,
@@ -341,22 +607,24 @@ class IsEditorOrOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.role == "editor":
             return True
-        if request.user.role == "journalist" and obj.author == request.user:
+        if request.user.role == "journalist" and obj.author_id == request.user.pk:
             return True
         return False
 
 
 # Article ViewSet
-class ArticleViewSet(viewsets.ModelViewSet):
+class ArticleViewSet(ArchiveFallbackMixin, viewsets.ModelViewSet):
     """Handles CRUD operations for articles via REST API."""
 
     serializer_class = ArticleSerializer
+    throttle_scope = "articles"
 
     def get_queryset(self):
         user = self.request.user
+        articles = Article.objects.select_related("view_counter")
         if user.role == "reader":
-            return Article.objects.filter(approved=True)
-        return Article.objects.all()
+            return articles.filter(approved=True)
+        return articles
 
     def get_permissions(self):
         if self.action == "create":
@@ -370,7 +638,9 @@ class ArticleViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        # request.user may be a token user, so set the author by ID
+        serializer.save(author_id=self.request.user.pk)
+        ARTICLES_SUBMITTED.inc(channel="api")
 
     @action(detail=True, methods=["post"], permission_classes=[IsEditor])
     def approve(self, request, pk=None):
@@ -382,6 +652,7 @@ class ArticleViewSet(viewsets.ModelViewSet):
             )
         article.approved = True
         article.save()
+        ARTICLES_APPROVED.inc(channel="api")
         return Response(
             {"status": "Article approved and distributed"}, status=status.HTTP_200_OK
         )
@@ -398,9 +669,31 @@ class ArticleViewSet(viewsets.ModelViewSet):
 
 
 class NewsletterViewSet(viewsets.ModelViewSet):
-    queryset = Newsletter.objects.all()
+    """
+    Newsletters via REST API, newest first and paginated. Pass
+    ``?expand=articles`` to embed article summaries instead of IDs; either
+    way the articles of a whole page are loaded in one query.
+    """
+
     serializer_class = NewsletterSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NewsletterPagination
+
+    def expanded(self):
+        return set(self.request.query_params.get("expand", "").split(","))
+
+    def get_queryset(self):
+        articles = Article.objects.order_by("pk")
+        if "articles" in self.expanded():
+            articles = articles.select_related("author")
+        else:
+            articles = articles.only("pk")
+        return Newsletter.objects.prefetch_related(
+            Prefetch("articles", queryset=articles)
+        ).order_by("-created_at", "-pk")
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "expand": self.expanded()}
 
 
 # Subscribe to journalist
@@ -409,6 +702,7 @@ class NewsletterViewSet(viewsets.ModelViewSet):
 def subscribe_journalist(request, pk):
     journalist = CustomUser.objects.get(pk=pk, role="journalist")
     request.user.subscriptions_journalists.add(journalist)
+    SUBSCRIPTION_CHANGES.inc(target="journalist", action="subscribe")
     return Response({"status": "subscribed"})
 
 
@@ -418,9 +712,57 @@ def subscribe_journalist(request, pk):
 def subscribe_publisher(request, pk):
     publisher = CustomUser.objects.get(pk=pk, role="publisher")
     request.user.subscriptions_publishers.add(publisher)
+    SUBSCRIPTION_CHANGES.inc(target="publisher", action="subscribe")
     return Response({"status": "subscribed"})
 
 
+# Bulk subscriptions
+@api_view(["GET", "POST", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated, IsReader])
+def bulk_subscriptions(request):
+    """
+    Read or change many subscriptions of the reader at once, given
+    ``{"journalists": [...], "publishers": [...]}``: POST subscribes,
+    DELETE unsubscribes and PUT makes the lists the reader's complete
+    subscriptions. Every method is idempotent and answers with the
+    resulting subscriptions.
+    """
+    reader_id = request.user.pk
+    if request.method != "GET":
+        serializer = SubscriptionSetSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        for kind, ids in serializer.validated_data.items():
+            if request.method == "POST":
+                subscriptions.subscribe(kind, {(reader_id, pk) for pk in ids})
+            elif request.method == "DELETE":
+                subscriptions.unsubscribe(kind, {(reader_id, pk) for pk in ids})
+            else:
+                subscriptions.replace_subscriptions(kind, {reader_id: ids})
+    return Response(subscriptions.subscribed_ids(reader_id))
+
+
+# Bulk user provisioning
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsEditor])
+def bulk_provision_users(request):
+    """
+    Create the users in ``{"users": [...]}`` with their role groups and
+    subscriptions in batched inserts, like the ``provision_users`` command.
+    Usernames that exist or repeat are skipped. Editors only.
+
+    Small requests are hashed in this process; larger ones use a pool of at
+    most ``PROVISION_WORKERS`` processes.
+    """
+    serializer = ProvisionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    users = serializer.validated_data["users"]
+    workers = 1
+    if len(users) > settings.PROVISION_INLINE_USERS:
+        workers = max(1, settings.PROVISION_WORKERS)
+    summary = provision_users(users, workers=workers)
+    return Response(summary, status=status.HTTP_201_CREATED)
+
+
 def is_editor(user):
     return user.is_authenticated and user.role == "editor"
 
@@ -428,7 +770,14 @@ def is_editor(user):
 @login_required
 @user_passes_test(is_editor)
 def editor_pending_articles(request):
-    articles = Article.objects.filter(approved=False).order_by("-created_at")
+    articles = list(
+        Article.objects.filter(approved=False)
+        .select_related("author")
+        .order_by("-created_at")
+    )
+    duplicates = find_duplicates(articles)
+    for article in articles:
+        article.duplicates = duplicates[article.pk]
     return render(
         request,
         "pending_articles.html",
@@ -443,8 +792,12 @@ def is_reader(user):
 @login_required
 @user_passes_test(is_reader)
 def manage_subscriptions(request):
-    journalists = CustomUser.objects.filter(role="journalist")
-    publishers = Publisher.objects.all()
+    # Most followed first, in index order
+    journalists = CustomUser.objects.filter(role="journalist").order_by(
+        "-follower_count", "id"
+    )
+    publishers = Publisher.objects.order_by("-follower_count", "id")
+    followed_journalists, followed_publishers = followed_ids(request.user.pk)
 
     return render(
         request,
@@ -452,6 +805,8 @@ def manage_subscriptions(request):
         {
             "journalists": journalists,
             "publishers": publishers,
+            "followed_journalists": followed_journalists,
+            "followed_publishers": followed_publishers,
         },
     )
 
@@ -461,6 +816,7 @@ def manage_subscriptions(request):
 def unsubscribe_journalist(request, pk):
     journalist = CustomUser.objects.get(pk=pk, role="journalist")
     request.user.subscriptions_journalists.remove(journalist)
+    SUBSCRIPTION_CHANGES.inc(target="journalist", action="unsubscribe")
     return Response({"status": "unsubscribed"})
 
 
@@ -469,6 +825,7 @@ def unsubscribe_journalist(request, pk):
 def unsubscribe_publisher(request, pk):
     publisher = CustomUser.objects.get(pk=pk, role="publisher")
     request.user.subscriptions_publishers.remove(publisher)
+    SUBSCRIPTION_CHANGES.inc(target="publisher", action="unsubscribe")
     return Response({"status": "unsubscribed"})
 
 
@@ -489,14 +846,22 @@ class NewsletterDetailView(DetailView):
     context_object_name = "newsletter"
 
 
-class NewsletterCreateView(CreateView):
+class NewsletterCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     """Journalists and editors create newsletters."""
 
     model = Newsletter
-    fields = ["title", "description", "articles"]
+    form_class = NewsletterForm
     template_name = "newsletter_form.html"
     success_url = reverse_lazy("newsletter-list")
 
+    def test_func(self):
+        return self.request.user.role in ("journalist", "editor")
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        return kwargs
+
     def form_valid(self, form):
         form.instance.author = self.request.user
         return super().form_valid(form)
@@ -506,10 +871,15 @@ class NewsletterUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """Allow journalists to update their own newsletters, editors can update any newsletter."""
 
     model = Newsletter
-    fields = ["title", "description", "articles"]
+    form_class = NewsletterForm
     template_name = "newsletter_form.html"
     success_url = reverse_lazy("newsletter-list")
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        return kwargs
+
     def test_func(self):
         # Editors can edit any newsletter
         if self.request.user.role == "editor":
@@ -554,6 +924,7 @@ def subscribe_journalist_html(request, pk):
         messages.info(request, f"Already subscribed to {journalist.username}.")
     else:
         request.user.subscriptions_journalists.add(journalist)
+        SUBSCRIPTION_CHANGES.inc(target="journalist", action="subscribe")
         messages.success(request, f"Subscribed to {journalist.username}!")
     return redirect("manage-subscriptions")
 
@@ -566,6 +937,7 @@ def subscribe_publisher_html(request, pk):
     subscription management page."""
     publisher = get_object_or_404(Publisher, pk=pk)
     request.user.subscriptions_publishers.add(publisher)
+    SUBSCRIPTION_CHANGES.inc(target="publisher", action="subscribe")
     messages.success(request, f"Subscribed to {publisher.name} successfully.")
     return redirect("manage-subscriptions")
 
@@ -579,6 +951,7 @@ def unsubscribe_journalist_html(request, pk):
     journalist = get_object_or_404(CustomUser, pk=pk, role="journalist")
     if journalist in request.user.subscriptions_journalists.all():
         request.user.subscriptions_journalists.remove(journalist)
+        SUBSCRIPTION_CHANGES.inc(target="journalist", action="unsubscribe")
         messages.success(
             request, f"Unsubscribed from {journalist.username} successfully."
         )
@@ -595,6 +968,7 @@ def unsubscribe_publisher_html(request, pk):
     to the subscription management page."""
     publisher = get_object_or_404(Publisher, pk=pk)
     request.user.subscriptions_publishers.remove(publisher)
+    SUBSCRIPTION_CHANGES.inc(target="publisher", action="unsubscribe")
     messages.success(request, f"Unsubscribed from {publisher.name} successfully.")
     return redirect("manage-subscriptions")
 
@@ -661,6 +1035,42 @@ class PublisherDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return self.request.user.role == "editor"
 
 
+@login_required
+@user_passes_test(is_editor)
+def user_lookup(request):
+    """
+    Return a page of journalists or editors whose username starts with
+    ``q``, for the publisher membership pickers.
+    """
+    role = request.GET.get("role")
+    if role not in ("journalist", "editor"):
+        return JsonResponse({"error": "Unknown role."}, status=400)
+
+    page = request.GET.get("page", "1")
+    return JsonResponse(
+        search_users(role, request.GET.get("q", ""), int(page) if page.isdigit() else 1)
+    )
+
+
+@login_required
+def article_lookup(request):
+    """
+    Return a page of articles whose title starts with ``q`` that the user may
+    put in a newsletter, for the newsletter article picker.
+    """
+    if request.user.role not in ("journalist", "editor"):
+        return JsonResponse({"error": "Not allowed."}, status=403)
+
+    page = request.GET.get("page", "1")
+    return JsonResponse(
+        search_articles(
+            request.user,
+            request.GET.get("q", ""),
+            int(page) if page.isdigit() else 1,
+        )
+    )
+
+
 @login_required
 def publisher_request_list(request):
     """
@@ -669,7 +1079,9 @@ def publisher_request_list(request):
     if request.user.role != "journalist":
         return redirect("home")
 
-    publishers = Publisher.objects.exclude(journalists=request.user)
+    publishers = Publisher.objects.exclude(
+        pk__in=affiliated_publisher_ids(request.user)
+    )
     return render(
         request,
         "publisher_request_list.html",
@@ -686,7 +1098,11 @@ def request_publisher_affiliation(request, pk):
         return redirect("home")
 
     publisher = get_object_or_404(Publisher, pk=pk)
-    PublisherRequest.objects.get_or_create(journalist=request.user, publisher=publisher)
+    _, created = PublisherRequest.objects.get_or_create(
+        journalist=request.user, publisher=publisher
+    )
+    if created:
+        PUBLISHER_REQUESTS.inc(action="created")
     messages.success(request, "Affiliation request sent.")
     return redirect("publisher-request-list")
 
@@ -695,16 +1111,51 @@ def request_publisher_affiliation(request, pk):
 @user_passes_test(is_editor)
 def publisher_requests_pending(request):
     """
-    Editor view to see all pending publisher affiliation requests.
+    Editor view to see pending publisher affiliation requests, one page
+    at a time, oldest first.
     """
-    requests = PublisherRequest.objects.filter(approved=False)
+    requests = (
+        PublisherRequest.objects.filter(approved=False)
+        .select_related("journalist", "publisher")
+        .order_by("created_at", "pk")
+    )
+    page = Paginator(requests, settings.PUBLISHER_REQUESTS_PAGE_SIZE).get_page(
+        request.GET.get("page")
+    )
     return render(
         request,
         "publisher_requests_pending.html",
-        {"requests": requests},
+        {"requests": page.object_list, "page_obj": page},
     )
 
 
+@login_required
+@user_passes_test(is_editor)
+@require_POST
+def bulk_publisher_requests(request):
+    """
+    Editor action to approve or reject all selected affiliation requests
+    at once.
+    """
+    request_ids = [pk for pk in request.POST.getlist("request_ids") if pk.isdigit()]
+    action = request.POST.get("action")
+
+    if not request_ids:
+        messages.warning(request, "No requests selected.")
+    elif action == "approve":
+        count = approve_requests(request_ids)
+        messages.success(request, f"Approved {count} affiliation requests.")
+    elif action == "reject":
+        count = reject_requests(request_ids)
+        messages.success(request, f"Rejected {count} affiliation requests.")
+    else:
+        messages.error(request, "Unknown action.")
+
+    url = reverse("publisher-requests-pending")
+    page = request.POST.get("page", "")
+    return redirect(f"{url}?page={page}" if page.isdigit() else url)
+
+
 @login_required
 @user_passes_test(is_editor)
 def approve_publisher_request(request, pk):
@@ -716,5 +1167,6 @@ def approve_publisher_request(request, pk):
     req.publisher.journalists.add(req.journalist)
     req.approved = True
     req.save()
+    PUBLISHER_REQUESTS.inc(action="approved")
     messages.success(request, "Journalist added to publisher.")
     return redirect("publisher-requests-pending")
@@ -0,0 +1,371 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .models import WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+APPROVED = "article.approved"
+UPDATED = "article.updated"
+
+SIGNATURE_HEADER = "X-News-Signature"
+TIMESTAMP_HEADER = "X-News-Timestamp"
+
+
+def sign(secret, timestamp, body):
+    """
+    Return the signature header value for a body sent at ``timestamp``:
+    ``sha256=`` and the hex HMAC-SHA256 of ``"<timestamp>.<body>"``.
+    Receivers should recompute it and reject stale timestamps.
+    """
+    message = f"{timestamp}.{body}".encode()
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def article_payload(event, article):
+    return {
+        "event": event,
+        "article": {
+            "id": article.pk,
+            "title": article.title,
+            "content": article.content,
+            "author": article.author_id,
+            "publisher": article.publisher_id,
+            "version": article.version,
+            "created_at": article.created_at.isoformat(),
+            "url": reverse("article-detail", args=[article.pk]),
+        },
+    }
+
+
+def enqueue_article_event(event, article):
+    """
+    Record a delivery of ``event`` for every active endpoint of the
+    article's publisher and hand them to the dispatcher once the current
+    transaction commits. Nothing is sent from the caller's thread.
+    """
+    if article.publisher_id is None:
+        return
+    endpoints = list(
+        WebhookEndpoint.objects.filter(
+            publisher_id=article.publisher_id, active=True
+        ).values_list("pk", flat=True)
+    )
+    if not endpoints:
+        return
+    body = json.dumps(article_payload(event, article), separators=(",", ":"))
+    deliveries = WebhookDelivery.objects.bulk_create(
+        WebhookDelivery(endpoint_id=pk, event=event, body=body) for pk in endpoints
+    )
+    # Not every backend returns primary keys from bulk_create
+    if deliveries[0].pk is None:
+        deliveries = WebhookDelivery.objects.filter(
+            endpoint_id__in=endpoints,
+            event=event,
+            body=body,
+            status=WebhookDelivery.PENDING,
+            attempts=0,
+        )
+    ids = [delivery.pk for delivery in deliveries]
+    transaction.on_commit(lambda: dispatcher.submit(ids))
+
+
+def _retry_delay(attempts):
+    """Exponential backoff with jitter after the given number of attempts."""
+    delay = settings.WEBHOOK_RETRY_DELAY * 2 ** (attempts - 1)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _claim(delivery_id):
+    """
+    Mark a due delivery as being sent and return it, or None when another
+    worker claimed it first or it is not due.
+    """
+    now = timezone.now()
+    claimed = WebhookDelivery.objects.filter(
+        pk=delivery_id, status=WebhookDelivery.PENDING, next_attempt_at__lte=now
+    ).update(status=WebhookDelivery.SENDING, next_attempt_at=now)
+    if not claimed:
+        return None
+    return WebhookDelivery.objects.select_related("endpoint").get(pk=delivery_id)
+
+
+def deliver(delivery_id, session=None):
+    """
+    Make one attempt at a delivery and record the outcome. The whole
+    attempt, from connecting to the last byte of the response headers, is
+    bounded by ``WEBHOOK_TIMEOUT`` seconds, so a partner trickling its
+    response cannot hold a worker longer; the response body is never read.
+    """
+    delivery = _claim(delivery_id)
+    if delivery is None:
+        return None
+
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "news-webhooks/1",
+        "X-News-Event": delivery.event,
+        "X-News-Delivery": str(delivery.pk),
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: sign(delivery.endpoint.secret, timestamp, delivery.body),
+    }
+    budget = settings.WEBHOOK_TIMEOUT / 2
+    delivery.attempts += 1
+    deadline = _deadlines.current = _Deadline(settings.WEBHOOK_TIMEOUT)
+    try:
+        with (session or _session()).post(
+            delivery.endpoint.url,
+            data=delivery.body.encode(),
+            headers=headers,
+            timeout=(budget, budget),
+            stream=True,
+            allow_redirects=False,
+        ) as response:
+            delivery.response_status = response.status_code
+            error = "" if response.ok else f"HTTP {response.status_code}"
+    except requests.RequestException as exc:
+        delivery.response_status = None
+        error = f"{type(exc).__name__}: {exc}"
+        if deadline.expired:
+            error = f"Timeout: no response within {settings.WEBHOOK_TIMEOUT}s"
+    finally:
+        deadline.cancel()
+        _deadlines.current = None
+
+    delivery.last_error = error[:1000]
+    if not error:
+        delivery.status = WebhookDelivery.DELIVERED
+        delivery.delivered_at = timezone.now()
+    elif delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+        delivery.status = WebhookDelivery.DEAD
+        logger.warning(
+            "Webhook delivery %s to %s dead-lettered: %s",
+            delivery.pk,
+            delivery.endpoint.url,
+            error,
+        )
+    else:
+        delivery.status = WebhookDelivery.PENDING
+        delivery.next_attempt_at = timezone.now() + timedelta(
+            seconds=_retry_delay(delivery.attempts)
+        )
+    delivery.save(
+        update_fields=[
+            "status",
+            "attempts",
+            "next_attempt_at",
+            "response_status",
+            "last_error",
+            "delivered_at",
+        ]
+    )
+    return delivery
+
+
+_deadlines = threading.local()
+
+
+class _Deadline:
+    """
+    Aborts the connection of the current attempt once ``seconds`` have
+    passed, however the time was spent. Socket timeouts only bound each
+    read, so a partner sending a byte at a time would never trip them.
+    """
+
+    def __init__(self, seconds):
+        self.lock = threading.Lock()
+        self.connection = None
+        self.expired = False
+        self.timer = threading.Timer(seconds, self.expire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def attach(self, connection):
+        with self.lock:
+            self.connection = connection
+            expired = self.expired
+        if expired:
+            self.abort(connection)
+
+    def expire(self):
+        with self.lock:
+            self.expired = True
+            connection = self.connection
+        if connection is not None:
+            self.abort(connection)
+
+    def cancel(self):
+        self.timer.cancel()
+
+    @staticmethod
+    def abort(connection):
+        sock = connection.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _DeadlineConnectionMixin:
+    """Hands the connection to the deadline of the attempt using it."""
+
+    def _attach(self):
+        deadline = getattr(_deadlines, "current", None)
+        if deadline is not None:
+            deadline.attach(self)
+
+    def connect(self):
+        super().connect()
+        self._attach()
+
+    def request(self, *args, **kwargs):
+        self._attach()
+        return super().request(*args, **kwargs)
+
+
+class _DeadlineHTTPConnection(_DeadlineConnectionMixin, HTTPConnection):
+    pass
+
+
+class _DeadlineHTTPSConnection(_DeadlineConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _DeadlineHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _DeadlineHTTPConnection
+
+
+class _DeadlineHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _DeadlineHTTPSConnection
+
+
+class _DeadlineAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _DeadlineHTTPConnectionPool,
+            "https": _DeadlineHTTPSConnectionPool,
+        }
+
+
+_sessions = threading.local()
+
+
+def _session():
+    """A pooled HTTP session per worker thread."""
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, _DeadlineAdapter(pool_connections=32, pool_maxsize=4))
+    return session
+
+
+class WebhookDispatcher:
+    """
+    Sends deliveries from a pool of ``WEBHOOK_WORKERS`` threads.
+
+    Each endpoint has its own queue and at most one delivery in flight,
+    so a slow or failing partner only ever occupies one worker. A worker
+    sends a single delivery and then puts the endpoint at the back of the
+    pool's queue, so endpoints take turns.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.pid = None
+        self.executor = None
+        self.queues = {}
+        self.scheduled = 0
+
+    def _pool(self):
+        if self.pid != os.getpid():
+            # First use in this process (or in a forked worker)
+            self.pid = os.getpid()
+            self.queues = {}
+            self.scheduled = 0
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.WEBHOOK_WORKERS,
+                thread_name_prefix="webhook",
+            )
+        return self.executor
+
+    def submit(self, delivery_ids):
+        rows = WebhookDelivery.objects.filter(pk__in=delivery_ids).values_list(
+            "pk", "endpoint_id"
+        )
+        with self.lock:
+            executor = self._pool()
+            for pk, endpoint_id in rows:
+                queue = self.queues.get(endpoint_id)
+                if queue is None:
+                    queue = self.queues[endpoint_id] = deque()
+                    self.scheduled += 1
+                    executor.submit(self._work, endpoint_id)
+                queue.append(pk)
+
+    def _work(self, endpoint_id):
+        with self.lock:
+            delivery_id = self.queues[endpoint_id].popleft()
+        try:
+            deliver(delivery_id)
+        except Exception:
+            logger.exception("Webhook delivery %s failed", delivery_id)
+        finally:
+            connection.close()
+            with self.lock:
+                if self.queues[endpoint_id]:
+                    self.executor.submit(self._work, endpoint_id)
+                else:
+                    del self.queues[endpoint_id]
+                    self.scheduled -= 1
+                    self.idle.notify_all()
+
+    def join(self, timeout=None):
+        """Wait until every submitted delivery has been attempted."""
+        with self.lock:
+            return self.idle.wait_for(lambda: self.scheduled == 0, timeout)
+
+
+dispatcher = WebhookDispatcher()
+
+
+def due_deliveries(limit=1000):
+    """IDs of deliveries waiting for an attempt, including stalled sends."""
+    now = timezone.now()
+    stalled = now - timedelta(seconds=settings.WEBHOOK_TIMEOUT * 10)
+    # Sends interrupted by a crash are put back in the queue
+    WebhookDelivery.objects.filter(
+        status=WebhookDelivery.SENDING, next_attempt_at__lt=stalled
+    ).update(status=WebhookDelivery.PENDING)
+    return list(
+        WebhookDelivery.objects.filter(
+            Q(status=WebhookDelivery.PENDING) & Q(next_attempt_at__lte=now)
+        )
+        .order_by("next_attempt_at")
+        .values_list("pk", flat=True)[:limit]
+    )
@@ -2,6 +2,8 @@
 ASGI config for news_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (for example ``uvicorn news_project.asgi:application``)
+to enable the long-lived /api/articles/events/ stream.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -47,15 +47,56 @@ AUTH_USER_MODEL = "news.CustomUser"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Reads the role from the token instead of loading the user
+        "news.authentication.RoleClaimJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # Requests per client by "<endpoint class>.<role>"; see news/throttling.py
+    "DEFAULT_THROTTLE_CLASSES": ("news.throttling.RoleRateThrottle",),
+    "DEFAULT_THROTTLE_RATES": {
+        "api.anonymous": "60/min",
+        "api.reader": "300/min",
+        "api.journalist": "600/min",
+        "api.editor": "1200/min",
+        "articles.anonymous": "30/min",
+        "articles.reader": "120/min",
+        "articles.journalist": "300/min",
+        "articles.editor": "600/min",
+    },
+}
+
+# Seconds a user's role is cached for checking the role claim of API
+# tokens, in a shared cache (REDIS_URL) and in the per-process default.
+# A role change clears the shared cache at once, but a per-process cache
+# only in the worker that made it, so other workers may accept a revoked
+# token for up to ROLE_CLAIM_LOCAL_CACHE_TIMEOUT seconds.
+ROLE_CLAIM_CACHE_TIMEOUT = 5 * 60
+ROLE_CLAIM_LOCAL_CACHE_TIMEOUT = 30
+
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "news.authentication.RoleTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "news.authentication.RoleTokenRefreshSerializer",
+}
+
+# Throttle counters and cached fragments must be shared by all workers in
+# production: set REDIS_URL to use Redis instead of per-process memory.
+REDIS_URL = os.getenv("REDIS_URL")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
 }
+if REDIS_URL:
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "news@app.com"
 
 MIDDLEWARE = [
+    "news.instrumentation.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -88,7 +129,7 @@ MESSAGE_TAGS = {
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "news.instrumentation.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -97,6 +138,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "news.context_processors.dashboard_counters",
             ],
         },
     },
@@ -104,6 +146,36 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "news_project.wsgi.application"
 
+# Request instrumentation
+
+# Send per-request timings back in a Server-Timing response header
+SERVER_TIMING_HEADER = True
+
+# Fraction of requests whose timings are logged to the news.timing logger
+SERVER_TIMING_LOG_SAMPLE_RATE = 0.01
+
+# Directory shared by all worker processes for merging /metrics output.
+# Leave unset when running a single process.
+METRICS_DIR = os.getenv("METRICS_DIR")
+
+# Seconds between writes of a worker's metrics to METRICS_DIR
+METRICS_FLUSH_INTERVAL = 5
+
+# Bearer token a Prometheus scraper sends to read /metrics. Without it only
+# logged-in staff users can read the metrics.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "news": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -143,6 +215,112 @@ USE_TZ = True
 STATIC_URL = "static/"
 
 
+# News app
+
+# Seconds a rendered article list row stays cached. Rows are keyed by the
+# article version, so edits never serve stale rows.
+ARTICLE_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Pre-rendered pages of approved articles served to anonymous readers
+PRERENDERED_ARTICLES_DIR = BASE_DIR / "prerendered"
+
+# Article reads are buffered in memory by each worker and written to the
+# database every ARTICLE_VIEW_FLUSH_INTERVAL seconds (0 disables the
+# background flusher), or sooner once ARTICLE_VIEW_BUFFER_MAX reads wait.
+ARTICLE_VIEW_FLUSH_INTERVAL = 10
+ARTICLE_VIEW_BUFFER_MAX = 10000
+
+# Trending articles: every read counts for less as it ages, halving every
+# TRENDING_HALF_LIFE seconds. A newly approved article starts with the
+# score of TRENDING_PUBLISH_WEIGHT reads at its creation time.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_PUBLISH_WEIGHT = 5
+# Articles returned by the trending endpoint and shown on the home page
+TRENDING_SIZE = 10
+TRENDING_HOME_SIZE = 5
+
+# Related articles: TF-IDF vectors of approved articles are kept in
+# RELATED_INDEX_PATH and RELATED_ARTICLES_COUNT neighbours are stored per
+# article. Terms used by more than RELATED_MAX_DF of the articles are
+# ignored, and only the RELATED_MAX_FEATURES most common others are kept.
+# The index is only read and written by the rebuild_related command, so it
+# only needs to exist on the host that runs it.
+RELATED_INDEX_PATH = BASE_DIR / "related_index.npz"
+RELATED_ARTICLES_COUNT = 5
+RELATED_MAX_FEATURES = 50000
+RELATED_MAX_DF = 0.5
+
+# Estimated share of common word 4-grams above which a submitted article
+# is flagged as a likely near-duplicate of another
+DUPLICATE_THRESHOLD = 0.8
+
+# Seconds a journalist's cached publisher affiliations are kept. Entries
+# are also dropped whenever the journalist's memberships change.
+AFFILIATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Results per page returned by the search-as-you-type pickers
+LOOKUP_PAGE_SIZE = 20
+
+# Newsletters per page in the API, and the most a client may ask for
+NEWSLETTER_PAGE_SIZE = 20
+NEWSLETTER_MAX_PAGE_SIZE = 100
+
+# Most journalist and publisher IDs accepted by one bulk subscription
+# request
+SUBSCRIPTION_BULK_LIMIT = 1000
+
+# Most users accepted by one bulk provisioning request. Requests of up to
+# PROVISION_INLINE_USERS users hash their passwords in the request process,
+# larger ones across at most PROVISION_WORKERS processes; bigger imports
+# belong in the provision_users command, which uses all cores
+PROVISION_BULK_LIMIT = 1000
+PROVISION_INLINE_USERS = 50
+PROVISION_WORKERS = 2
+
+# Journalists and publishers returned by the most-followed endpoint
+MOST_FOLLOWED_SIZE = 20
+
+# Pending affiliation requests shown per page to editors
+PUBLISHER_REQUESTS_PAGE_SIZE = 50
+
+# Syndication feeds: articles per feed, words of each article shown, and
+# seconds a rendered feed stays cached. Feeds are keyed by the time their
+# articles last changed, so they never go stale.
+FEED_SIZE = 50
+FEED_SUMMARY_WORDS = 60
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Article revisions are stored as deltas against the previous revision,
+# with a full copy every REVISION_SNAPSHOT_INTERVAL revisions. Rebuilding
+# any version applies at most REVISION_SNAPSHOT_INTERVAL - 1 deltas.
+REVISION_SNAPSHOT_INTERVAL = 20
+
+# Approved articles older than ARCHIVE_AFTER_DAYS are moved to the archive
+# table by the archive_articles command, ARCHIVE_BATCH_SIZE per transaction
+ARCHIVE_AFTER_DAYS = 365 * 2
+ARCHIVE_BATCH_SIZE = 500
+
+# Live article events: the broker passing approvals to open streams (Redis
+# when REDIS_URL is set, so every process sees every approval), events kept
+# for reconnecting clients, events a slow client may fall behind by before
+# it is disconnected, seconds between keep-alive comments, and the
+# reconnect delay suggested to clients in milliseconds
+EVENT_BROKER = "news.events.RedisBroker" if REDIS_URL else "news.events.InProcessBroker"
+EVENT_BUFFER_SIZE = 1000
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT = 15
+EVENT_RETRY_MS = 5000
+
+# Partner webhooks: threads sending deliveries, seconds allowed per attempt
+# (from connecting to the end of the response headers), attempts before a delivery
+# is dead-lettered, and the first retry delay in seconds (doubling after
+# each failure)
+WEBHOOK_WORKERS = 8
+WEBHOOK_TIMEOUT = 5
+WEBHOOK_MAX_ATTEMPTS = 6
+WEBHOOK_RETRY_DELAY = 30
+
+
 TWITTER_API_KEY = os.getenv("TWITTER_API_KEY")
 TWITTER_API_SECRET = os.getenv("TWITTER_API_SECRET")
 TWITTER_ACCESS_TOKEN = os.getenv("TWITTER_ACCESS_TOKEN")
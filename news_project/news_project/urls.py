@@ -1,7 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
+from rest_framework.routers import SimpleRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from news.metrics import metrics_view
+from news.views import NewsletterViewSet
+
+router = SimpleRouter()
+router.register("newsletters", NewsletterViewSet, basename="api-newsletter")
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     # Frontend / normal views
@@ -9,8 +16,11 @@ urlpatterns = [
         "", include("news.urls")
     ),  # all news app frontend routes like /articles/, /register/
     # API routes
+    path("api/", include(router.urls)),
     path("api/", include("news.urls")),  # only DRF router URLs will work here
     # JWT auth
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    # Metrics for the scraper
+    path("metrics", metrics_view, name="metrics"),
 ]